@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from "react";
-import { Form, Button, Alert, Spinner } from "react-bootstrap";
+import { Form, Button, Alert, Spinner, ListGroup } from "react-bootstrap";
 import { useQuizContext } from "../../../context/QuizContext";
 import { useNavigate } from "react-router-dom";
 import {
@@ -12,7 +12,7 @@ import {
 import { LoadingSpinner } from "../../common";
 import { QuizOutput } from "../../quiz/display";
 import {
-  generateQuiz,
+  generateQuizStream,
   uploadFiles,
   fetchUrlContent,
 } from "../../../services/api";
@@ -164,6 +164,9 @@ const QuizForm = () => {
   // Local state for form validation
   const [validated, setValidated] = useState(false);
 
+  // Questions received so far while the quiz is being generated
+  const [streamedQuestions, setStreamedQuestions] = useState([]);
+
   // Check if form is valid for submission
   const isFormValid = () => {
     switch (formData.inputType) {
@@ -194,6 +197,7 @@ const QuizForm = () => {
 
     setLoading(true);
     setError(null);
+    setStreamedQuestions([]);
 
     try {
       // If using sample quiz, load it directly
@@ -269,8 +273,11 @@ const QuizForm = () => {
         quizTitle: formData.quizTitle || "Quiz",
       };
 
-      // Send to backend for quiz generation
-      const generatedQuizData = await generateQuiz(quizRequestData);
+      // Send to backend for quiz generation, showing each question as it arrives
+      const generatedQuizData = await generateQuizStream(
+        quizRequestData,
+        (question) => setStreamedQuestions((questions) => [...questions, question])
+      );
 
       // Check if the request was canceled
       if (generatedQuizData && generatedQuizData.canceled) {
@@ -448,6 +455,23 @@ const QuizForm = () => {
 
                   {/* Loading spinner */}
                   <LoadingSpinner loading={loading} />
+
+                  {/* Questions generated so far */}
+                  {loading && streamedQuestions.length > 0 && (
+                    <div className="mb-4">
+                      <p className="fw-bold mb-2">
+                        Genererede spørgsmål ({streamedQuestions.length} af {formData.numQuestions})
+                      </p>
+                      <ListGroup>
+                        {streamedQuestions.map((question, index) => (
+                          <ListGroup.Item key={question.id || index}>
+                            <span className="text-muted me-2">{index + 1}.</span>
+                            {question.question}
+                          </ListGroup.Item>
+                        ))}
+                      </ListGroup>
+                    </div>
+                  )}
                 </Form>
               )}
             </div>
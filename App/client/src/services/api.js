@@ -6,6 +6,9 @@ const API_BASE_URL = "/api";
 // Create a source for cancellation tokens
 let cancelTokenSource = null;
 
+// Controller of an ongoing streamed quiz generation
+let streamAbortController = null;
+
 // Function to create a new cancel token source
 export const createCancelToken = () => {
   // Cancel any existing requests
@@ -23,6 +26,10 @@ export const cancelRequests = () => {
     cancelTokenSource.cancel("Operation canceled by the user.");
     cancelTokenSource = null;
   }
+  if (streamAbortController) {
+    streamAbortController.abort();
+    streamAbortController = null;
+  }
 };
 
 // Function to generate quiz based on inputs
@@ -68,6 +75,129 @@ export const generateQuiz = async (quizData) => {
   }
 };
 
+// Read the Server-Sent Events of a fetch response, calling onEvent(event, data)
+// for each message until the stream ends or onEvent returns false
+const readServerSentEvents = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) {
+      return;
+    }
+    buffer += decoder.decode(value, { stream: true });
+
+    // Each message ends with a blank line
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = "message";
+      const dataLines = [];
+      message.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+          dataLines.push(line.slice(5).trimStart());
+        }
+      });
+
+      if (dataLines.length > 0 && onEvent(event, JSON.parse(dataLines.join("\n"))) === false) {
+        await reader.cancel();
+        return;
+      }
+    }
+  }
+};
+
+// Function to generate a quiz, calling onQuestion with each question as soon
+// as the LLM has written it; resolves to the whole quiz, which replaces the
+// streamed questions
+export const generateQuizStream = async (quizData, onQuestion) => {
+  // Browsers that can't read a response as it arrives wait for the whole quiz
+  if (typeof ReadableStream === "undefined" || typeof TextDecoder === "undefined") {
+    return generateQuiz(quizData);
+  }
+
+  // Cancel any existing requests
+  cancelRequests();
+  const controller = new AbortController();
+  streamAbortController = controller;
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/generate-quiz/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(quizData),
+      signal: controller.signal,
+    });
+
+    // Refused before the stream started (e.g. the LLM is busy)
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.message || "Failed to generate quiz");
+    }
+
+    let quiz = null;
+    await readServerSentEvents(response, (event, data) => {
+      if (event === "question") {
+        onQuestion(data);
+      } else if (event === "done") {
+        quiz = data;
+        return false;
+      } else if (event === "error") {
+        throw new Error(data.message || "Failed to generate quiz");
+      }
+      return true;
+    });
+
+    if (!quiz) {
+      throw new Error("The quiz stream ended before the quiz was complete");
+    }
+    console.log("Quiz generated successfully:", quiz);
+    return quiz;
+  } catch (error) {
+    if (error.name === "AbortError") {
+      console.log("Request canceled:", error.message);
+      // Return a specific object to indicate cancellation
+      return { canceled: true };
+    }
+
+    console.error("Error generating quiz:", error);
+    // Stop reading a stream that failed midway
+    controller.abort();
+    throw error;
+  } finally {
+    if (streamAbortController === controller) {
+      streamAbortController = null;
+    }
+  }
+};
+
+// How often to ask the server whether an upload has been processed
+const UPLOAD_POLL_INTERVAL_MS = 1000;
+
+// Poll a background job until it has finished
+const waitForJob = async (statusUrl) => {
+  while (true) {
+    const response = await fetch(statusUrl);
+    const job = await response.json();
+
+    if (!response.ok) {
+      throw new Error(job.error || "Failed to get upload status");
+    }
+    if (job.status === "completed" || job.status === "failed") {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, UPLOAD_POLL_INTERVAL_MS));
+  }
+};
+
 // Function to upload files to the server
 export const uploadFiles = async (files) => {
   try {
@@ -96,8 +226,8 @@ export const uploadFiles = async (files) => {
       formData.append("youtubeUrls", youtubeUrls);
     }
 
-    // Upload to the server
-    const response = await fetch("/api/upload-files", {
+    // Upload to the server, which processes the files in the background
+    const response = await fetch("/api/upload-files/jobs", {
       method: "POST",
       body: formData,
     });
@@ -108,10 +238,20 @@ export const uploadFiles = async (files) => {
       throw new Error(data.error || "Failed to upload files");
     }
 
+    // Wait for the files to be processed (transcriptions can take minutes)
+    const job = await waitForJob(data.statusUrl);
+    if (job.status === "failed") {
+      throw new Error(job.error || "Failed to process files");
+    }
+    // A failed transcription fails the whole upload
+    if (job.failure) {
+      throw new Error(job.failure.message || job.failure.error);
+    }
+
     return {
       success: true,
-      files: data.files,
-      combinedContent: data.combinedContent,
+      files: job.result.files,
+      combinedContent: job.result.combinedContent,
     };
   } catch (error) {
     console.error("Error uploading files:", error);
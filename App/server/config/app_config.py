@@ -11,6 +11,12 @@ SEND_FILE_MAX_AGE_DEFAULT = 0  # Disable file caching
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
 TEMPLATES_AUTO_RELOAD = False  # Disable template auto-reload
 
+# Server configuration for "python app.py"; the debugger and reloader are
+# only enabled with FLASK_DEBUG=1 (see gunicorn.conf.py for production)
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", 5001))
+SERVER_DEBUG = os.environ.get("FLASK_DEBUG", "false").lower() in ("1", "true", "yes")
+
 # Paths configuration
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
@@ -18,6 +24,9 @@ DATABASE_FOLDER = os.path.join(BASE_DIR, "database")
 QUIZ_FOLDER = os.path.join(DATABASE_FOLDER, "quizzes")
 ACTIVITIES_FOLDER = os.path.join(DATABASE_FOLDER, "activities")
 MODULES_FOLDER = os.path.join(DATABASE_FOLDER, "modules")
+FORUM_FOLDER = os.path.join(DATABASE_FOLDER, "forum")
+JOBS_FOLDER = os.path.join(BASE_DIR, "jobs")
+CACHE_FOLDER = os.path.join(DATABASE_FOLDER, "cache")
 
 
 # Create directories if they don't exist
@@ -26,6 +35,8 @@ os.makedirs(DATABASE_FOLDER, exist_ok=True)
 os.makedirs(QUIZ_FOLDER, exist_ok=True)
 os.makedirs(ACTIVITIES_FOLDER, exist_ok=True)
 os.makedirs(MODULES_FOLDER, exist_ok=True)
+os.makedirs(FORUM_FOLDER, exist_ok=True)
+os.makedirs(JOBS_FOLDER, exist_ok=True)
 
 # File handling configuration
 ALLOWED_EXTENSIONS = {
@@ -50,8 +61,136 @@ ALLOWED_EXTENSIONS = {
     "m4a",
 }
 
+# Storage configuration ("json" files or "sqlite")
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json").lower()
+SQLITE_DATABASE_PATH = os.environ.get(
+    "SQLITE_DATABASE_PATH", os.path.join(DATABASE_FOLDER, "thesis_app.sqlite3")
+)
+
+# JSON write configuration: seconds to wait for a file lock, and how often a
+# failed read-modify-write cycle is retried
+FILE_LOCK_TIMEOUT = float(os.environ.get("FILE_LOCK_TIMEOUT", 10))
+JSON_WRITE_RETRIES = int(os.environ.get("JSON_WRITE_RETRIES", 3))
+
+# JSON document cache configuration
+JSON_CACHE_MAX_ENTRIES = int(os.environ.get("JSON_CACHE_MAX_ENTRIES", 64))
+
+# Event log configuration for append-heavy documents (quiz results and
+# completions): events logged before compacting into the JSON snapshot, and
+# whether every appended event is flushed to disk
+EVENT_LOG_COMPACT_EVERY = int(os.environ.get("EVENT_LOG_COMPACT_EVERY", 500))
+EVENT_LOG_FSYNC = os.environ.get("EVENT_LOG_FSYNC", "true").lower() in ("1", "true", "yes")
+
+# Batch badge recomputation (/api/check-all-badges): worker processes, and
+# students handed to a worker at a time. Batches with a single chunk of
+# students are evaluated in the server process.
+BADGE_RECHECK_WORKERS = int(os.environ.get("BADGE_RECHECK_WORKERS", min(4, os.cpu_count() or 1)))
+BADGE_RECHECK_CHUNK_SIZE = int(os.environ.get("BADGE_RECHECK_CHUNK_SIZE", 1000))
+
+# Students kept on each quiz and module leaderboard (see services/quiz_stats.py)
+STATS_LEADERBOARD_SIZE = int(os.environ.get("STATS_LEADERBOARD_SIZE", 10))
+
+# Whisper transcription configuration: default model size, loaded instances
+# kept per size (each can transcribe one file at a time), device ("cpu",
+# "cuda" or unset to pick automatically), language, and whether to load the
+# default model at startup instead of on the first upload
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base")
+WHISPER_POOL_SIZE = int(os.environ.get("WHISPER_POOL_SIZE", 1))
+WHISPER_DEVICE = os.environ.get("WHISPER_DEVICE") or None
+WHISPER_LANGUAGE = os.environ.get("WHISPER_LANGUAGE", "en")
+WHISPER_PRELOAD = os.environ.get("WHISPER_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+# Where transcription runs: "local" (in the web process) or "worker" (in
+# separate processes started with "python -m services.transcription_worker",
+# listening on TRANSCRIPTION_WORKER_ADDRESSES, e.g. "127.0.0.1:6001,127.0.0.1:6002")
+TRANSCRIPTION_MODE = os.environ.get("TRANSCRIPTION_MODE", "local").lower()
+TRANSCRIPTION_WORKER_ADDRESSES = [
+    (host, int(port))
+    for host, _, port in (
+        address.strip().rpartition(":")
+        for address in os.environ.get("TRANSCRIPTION_WORKER_ADDRESSES", "127.0.0.1:6001").split(",")
+        if address.strip()
+    )
+]
+# Shared secret between the server and the workers. Workers unpickle what
+# they receive, so there is no default: workers and the server in worker
+# mode refuse to start without it
+TRANSCRIPTION_WORKER_AUTHKEY = os.environ.get("TRANSCRIPTION_WORKER_AUTHKEY", "").encode()
+TRANSCRIPTION_WORKER_TIMEOUT = float(os.environ.get("TRANSCRIPTION_WORKER_TIMEOUT", 3600))
+
+# Background job configuration for uploads: files processed at the same
+# time, files that may be queued before new uploads are refused, and seconds
+# a finished job stays available for polling
+UPLOAD_JOB_WORKERS = int(os.environ.get("UPLOAD_JOB_WORKERS", 4))
+UPLOAD_JOB_MAX_PENDING = int(os.environ.get("UPLOAD_JOB_MAX_PENDING", 32))
+UPLOAD_JOB_TTL = int(os.environ.get("UPLOAD_JOB_TTL", 3600))
+
+# PDF extraction configuration: maximum pages read from an upload (0 reads
+# them all), worker processes for large PDFs, and the page count from which
+# pages are extracted in parallel
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 0))
+PDF_EXTRACTION_WORKERS = int(
+    os.environ.get("PDF_EXTRACTION_WORKERS", min(4, os.cpu_count() or 1))
+)
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 40))
+
+# Cache of text extracted from uploads, keyed by file contents and extractor
+# settings, and the disk space it may use before old entries are evicted
+EXTRACTION_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "extractions")
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+# Quiz generation configuration: content longer than the model's content
+# token budget (below) is split into chunks that are turned into questions in
+# parallel (up to QUIZ_GENERATION_CONCURRENCY requests to Ollama at once); no
+# single prompt carries more than QUIZ_MAX_CONTENT_CHARS of content
+QUIZ_GENERATION_CONCURRENCY = int(os.environ.get("QUIZ_GENERATION_CONCURRENCY", 2))
+QUIZ_MAX_CONTENT_CHARS = int(os.environ.get("QUIZ_MAX_CONTENT_CHARS", 128000))
+
+# Content token budget per prompt, by default and for specific models (e.g.
+# QUIZ_MODEL_CONTENT_TOKENS="mistral=8000,llama3.1:8b-instruct-q4_0=16000");
+# longer content is cut down to its most informative sections. Tokens are
+# counted with this tiktoken encoding, or estimated if it isn't available
+QUIZ_CONTENT_TOKENS = int(os.environ.get("QUIZ_CONTENT_TOKENS", 8000))
+QUIZ_MODEL_CONTENT_TOKENS = {
+    model.strip(): int(tokens)
+    for model, _, tokens in (
+        entry.rpartition("=")
+        for entry in os.environ.get("QUIZ_MODEL_CONTENT_TOKENS", "").split(",")
+        if "=" in entry
+    )
+}
+TOKENIZER_ENCODING = os.environ.get("TOKENIZER_ENCODING", "cl100k_base")
+
+# Cache of LLM responses to quiz prompts, so regenerating a quiz from the same
+# content and settings doesn't run the model again; entries expire after
+# QUIZ_CACHE_TTL seconds (0 keeps them until evicted for space)
+QUIZ_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "llm_responses")
+QUIZ_CACHE_MAX_BYTES = int(os.environ.get("QUIZ_CACHE_MAX_MB", 64)) * 1024 * 1024
+QUIZ_CACHE_TTL = int(os.environ.get("QUIZ_CACHE_TTL", 7 * 24 * 3600))
+
 # API configuration
-OLLAMA_API = "http://localhost:11434/api/generate"
+OLLAMA_API = os.environ.get("OLLAMA_API", "http://localhost:11434/api/generate")
+
+# Ollama client configuration: connections kept open to Ollama, retries
+# (with exponential backoff from OLLAMA_RETRY_BACKOFF seconds) when it can't
+# be reached or is busy, and timeouts in seconds
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", 8))
+OLLAMA_MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", 2))
+OLLAMA_RETRY_BACKOFF = float(os.environ.get("OLLAMA_RETRY_BACKOFF", 0.5))
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 10))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", 300))
+
+# Admission control for Ollama: generations run at once across all server
+# processes on the machine (one lock file per slot in OLLAMA_SLOT_FOLDER),
+# requests allowed to wait for one in each server process (more are refused
+# with 429; by default half a gunicorn worker's threads, so the rest can
+# still answer), and seconds a request may wait before it is refused with 503
+OLLAMA_MAX_CONCURRENT = int(os.environ.get("OLLAMA_MAX_CONCURRENT", 2))
+OLLAMA_MAX_QUEUE = int(
+    os.environ.get("OLLAMA_MAX_QUEUE", max(1, int(os.environ.get("GUNICORN_THREADS", 8)) // 2))
+)
+OLLAMA_SLOT_FOLDER = os.path.join(CACHE_FOLDER, "ollama_slots")
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", 120))
 
 
 def allowed_file(filename):
@@ -183,9 +183,10 @@ def test_speed_demon_badge():
                 break
         
         if speed_demon_badge:
-            print(f"  Badge criteria:")
-            print(f"    - Max seconds: {speed_demon_badge.get('criteria', {}).get('max_seconds', 'N/A')}")
-            print(f"    - Min score percent: {speed_demon_badge.get('criteria', {}).get('min_score_percent', 'N/A')}%")
+            rule = speed_demon_badge.get('rule', {})
+            print(f"  Badge rule:")
+            print(f"    - Max seconds: {rule.get('at_most', 'N/A')}")
+            print(f"    - Min score percent: {rule.get('min_score_percent', 'N/A')}%")
         
         newly_earned_badges = check_and_award_badges(
             candidate["student_id"], 
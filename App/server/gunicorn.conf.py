@@ -0,0 +1,42 @@
+# Gunicorn configuration, used with: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every setting can be overridden with an environment variable. Each worker
+# process has its own Whisper models and in-memory caches, so a few workers
+# with several threads each suit this app better than many workers: requests
+# mostly wait on Ollama or Whisper rather than use the CPU.
+import os
+
+from config.app_config import OLLAMA_READ_TIMEOUT, SERVER_HOST, SERVER_PORT
+
+bind = os.environ.get("GUNICORN_BIND", f"{SERVER_HOST}:{SERVER_PORT}")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Seconds a worker may go without checking in with the master before it is
+# killed. gthread workers check in while their threads handle requests, so
+# this does not limit how long a request may take; calls to Ollama are
+# bounded by OLLAMA_READ_TIMEOUT and the queue by OLLAMA_QUEUE_TIMEOUT
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", OLLAMA_READ_TIMEOUT + 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Import the app (Flask and the routes) once in the master process so
+# workers share those pages and start quickly. PyMuPDF, NumPy and Whisper
+# are imported lazily, in each worker on first use
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Restart workers now and then to bound memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    # Models are loaded in each worker after the fork; loading them in the
+    # master would share threads and GPU state that don't survive fork()
+    from app import warm_up
+
+    warm_up()
@@ -4,7 +4,9 @@ import json
 from datetime import datetime
 
 from config.app_config import DATABASE_FOLDER, logger
-from utils.file_helpers import load_json_file, save_json_file
+from services import quiz_stats
+from storage.factory import get_storage
+from utils.file_helpers import load_json_file, update_json_file
 
 # Create blueprint for activity-related routes
 activity_routes = Blueprint("activity_routes", __name__)
@@ -36,18 +38,16 @@ def store_activity():
         if "isHomework" not in activity_data:
             activity_data["isHomework"] = False
 
-        # Load existing activities
         activities_file = os.path.join(DATABASE_FOLDER, "activities.json")
-        activities = load_json_file(activities_file, [])
 
         # Special handling for quiz activities to prevent duplication across modules
-        if (activity_data.get("type") == "quiz" or 
+        is_quiz_activity = (activity_data.get("type") == "quiz" or 
             activity_data.get("type") == "flashcards" or
             activity_data.get("type") == "multiple_choice" or
-            activity_data.get("type") == "flashcard") and activity_data.get("quizId"):
-            
+            activity_data.get("type") == "flashcard") and activity_data.get("quizId")
+
+        if is_quiz_activity:
             quiz_id = activity_data.get("quizId")
-            module_id = activity_data.get("moduleId")
             
             # Automatically determine the correct type based on the quiz type
             try:
@@ -79,19 +79,23 @@ def store_activity():
                     logger.info(f"Set activity type for quiz {quiz_id} to {activity_data['type']}")
             except Exception as e:
                 logger.error(f"Error determining quiz type: {str(e)}")
-            
-            # Check if this quiz already exists in any module
-            existing_quiz_indices = []
-            for i, activity in enumerate(activities):
-                if ((activity.get("type") == "quiz" or 
-                     activity.get("type") == "flashcards" or
-                     activity.get("type") == "multiple_choice" or
-                     activity.get("type") == "flashcard") and 
-                    activity.get("quizId") == quiz_id):
-                    existing_quiz_indices.append(i)
-                    
-            # If quiz exists in other modules, log a warning but continue
-            if existing_quiz_indices:
+
+        def upsert_activity(activities):
+            if is_quiz_activity:
+                quiz_id = activity_data.get("quizId")
+                module_id = activity_data.get("moduleId")
+
+                # Check if this quiz already exists in any module
+                existing_quiz_indices = []
+                for i, activity in enumerate(activities):
+                    if ((activity.get("type") == "quiz" or 
+                         activity.get("type") == "flashcards" or
+                         activity.get("type") == "multiple_choice" or
+                         activity.get("type") == "flashcard") and 
+                        activity.get("quizId") == quiz_id):
+                        existing_quiz_indices.append(i)
+                        
+                # If quiz exists in other modules, log a warning but continue
                 for idx in existing_quiz_indices:
                     existing_module = activities[idx].get("moduleId")
                     if existing_module != module_id:
@@ -104,52 +108,36 @@ def store_activity():
                 for idx in existing_quiz_indices:
                     if activities[idx].get("moduleId") == module_id:
                         activities[idx] = activity_data
-                        
-                        # Save activities back to file
-                        if save_json_file(activities_file, activities):
-                            return jsonify(
-                                {
-                                    "success": True,
-                                    "message": "Quiz activity updated successfully",
-                                    "activityId": activity_data.get("id")
-                                }
-                            )
-                        else:
-                            return (
-                                jsonify({"success": False, "message": "Failed to save activity data"}),
-                                500,
-                            )
-
-        # Check if activity with same ID already exists
-        existing_index = None
-        for i, activity in enumerate(activities):
-            if activity.get("id") == activity_data.get("id") and activity.get(
-                "moduleId"
-            ) == activity_data.get("moduleId"):
-                existing_index = i
-                break
-
-        # Update or add the activity
-        if existing_index is not None:
-            activities[existing_index] = activity_data
-        else:
+                        return "Quiz activity updated successfully"
+
+            # Check if activity with same ID already exists
+            for i, activity in enumerate(activities):
+                if activity.get("id") == activity_data.get("id") and activity.get(
+                    "moduleId"
+                ) == activity_data.get("moduleId"):
+                    activities[i] = activity_data
+                    return "Activity saved successfully"
+
             activities.append(activity_data)
+            return "Activity saved successfully"
 
-        # Save activities back to file
-        if save_json_file(activities_file, activities):
-            return jsonify(
-                {
-                    "success": True,
-                    "message": "Activity saved successfully",
-                    "activityId": activity_data.get("id")
-                }
-            )
-        else:
+        # Update or add the activity while holding the activities file lock
+        try:
+            message = update_json_file(activities_file, upsert_activity, [])
+        except OSError:
             return (
                 jsonify({"success": False, "message": "Failed to save activity data"}),
                 500,
             )
 
+        return jsonify(
+            {
+                "success": True,
+                "message": message,
+                "activityId": activity_data.get("id")
+            }
+        )
+
     except Exception as e:
         logger.error(f"Error storing activity: {str(e)}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -215,40 +203,48 @@ def delete_activity():
         activity_id = data.get("id")
         module_id = data.get("moduleId")
 
-        # Load existing activities
         activities_file = os.path.join(DATABASE_FOLDER, "activities.json")
-        activities = load_json_file(activities_file, [])
-
-        # Find the activity before removing it to check if it's a quiz
-        activity_to_delete = None
-        for activity in activities:
-            if (activity.get("id") == activity_id and 
-                activity.get("moduleId") == module_id):
-                activity_to_delete = activity
-                break
-
-        # Filter out the activity to delete
-        updated_activities = [
-            activity
-            for activity in activities
-            if not (
-                activity.get("id") == activity_id
-                and activity.get("moduleId") == module_id
-            )
-        ]
-        
-        # Also remove from completions
         completions_file = os.path.join(DATABASE_FOLDER, "activity_completions.json")
-        completions_data = load_json_file(completions_file, {"completions": []})
-        
-        # Filter out completions for this activity
-        updated_completions = [
-            completion 
-            for completion in completions_data.get("completions", [])
-            if completion.get("activity_id") != activity_id
-        ]
-        
-        completions_data["completions"] = updated_completions
+
+        def remove_activity(activities):
+            # Find the activity before removing it to check if it's a quiz
+            activity_to_delete = None
+            for activity in activities:
+                if (activity.get("id") == activity_id and 
+                    activity.get("moduleId") == module_id):
+                    activity_to_delete = activity
+                    break
+
+            # Filter out the activity to delete
+            activities[:] = [
+                activity
+                for activity in activities
+                if not (
+                    activity.get("id") == activity_id
+                    and activity.get("moduleId") == module_id
+                )
+            ]
+            return activity_to_delete
+
+        def remove_completions(completions_data):
+            # Filter out completions for this activity
+            completions_data["completions"] = [
+                completion 
+                for completion in completions_data.get("completions", [])
+                if completion.get("activity_id") != activity_id
+            ]
+
+        # Each file is updated under its own lock
+        try:
+            activity_to_delete = update_json_file(activities_file, remove_activity, [])
+            update_json_file(completions_file, remove_completions, {"completions": []})
+        except OSError:
+            return (
+                jsonify(
+                    {"success": False, "message": "Failed to save updated activities"}
+                ),
+                500,
+            )
         
         # Variables to track if quiz data was deleted
         quiz_deleted = False
@@ -261,56 +257,55 @@ def delete_activity():
             
             # Remove from quizzes.json
             quizzes_file = os.path.join(DATABASE_FOLDER, "quizzes.json")
-            quizzes = load_json_file(quizzes_file, [])
-            
-            # Filter out the quiz with the matching ID
-            updated_quizzes = [
-                quiz for quiz in quizzes if quiz.get("id") != quiz_id
-            ]
-            
-            # Save the updated quizzes list if there was a change
-            if len(quizzes) != len(updated_quizzes):
-                quiz_deleted = save_json_file(quizzes_file, updated_quizzes)
-                logger.info(f"Quiz {quiz_id} deleted from quizzes.json")
+
+            def remove_quiz(quizzes):
+                # Filter out the quiz with the matching ID
+                count = len(quizzes)
+                quizzes[:] = [quiz for quiz in quizzes if quiz.get("id") != quiz_id]
+                return count - len(quizzes)
+
+            try:
+                if update_json_file(quizzes_file, remove_quiz, []):
+                    quiz_deleted = True
+                    logger.info(f"Quiz {quiz_id} deleted from quizzes.json")
+            except OSError as e:
+                logger.error(f"Failed to delete quiz {quiz_id}: {str(e)}")
             
             # Also remove corresponding quiz results from student_results.json
             results_file = os.path.join(DATABASE_FOLDER, "student_results.json")
-            results_data = load_json_file(results_file, {"quiz_history": []})
-            
-            # Filter out quiz results for this quiz
-            quiz_history = results_data.get("quiz_history", [])
-            updated_quiz_history = [
-                result for result in quiz_history if result.get("quiz_id") != quiz_id
-            ]
-            
-            # Check if any results were removed
-            if len(quiz_history) != len(updated_quiz_history):
-                results_data["quiz_history"] = updated_quiz_history
-                quiz_results_deleted = save_json_file(results_file, results_data)
-                logger.info(f"Removed {len(quiz_history) - len(updated_quiz_history)} quiz results for quiz {quiz_id} from student_results.json")
-        
-        # Save both files
-        activities_saved = save_json_file(activities_file, updated_activities)
-        completions_saved = save_json_file(completions_file, completions_data)
-
-        if activities_saved and completions_saved:
-            return jsonify(
-                {
-                    "success": True,
-                    "message": "Activity deleted successfully",
-                    "deleted": len(activities) - len(updated_activities) > 0,
-                    "quiz_deleted": quiz_deleted,
-                    "quiz_results_deleted": quiz_results_deleted,
-                    "quiz_id": quiz_id
-                }
-            )
-        else:
-            return (
-                jsonify(
-                    {"success": False, "message": "Failed to save updated activities"}
-                ),
-                500,
-            )
+
+            def remove_results(results_data):
+                # Filter out quiz results for this quiz
+                quiz_history = results_data.get("quiz_history", [])
+                results_data["quiz_history"] = [
+                    result for result in quiz_history if result.get("quiz_id") != quiz_id
+                ]
+                return len(quiz_history) - len(results_data["quiz_history"])
+
+            try:
+                removed = update_json_file(results_file, remove_results, {"quiz_history": []})
+                if removed:
+                    quiz_results_deleted = True
+                    logger.info(f"Removed {removed} quiz results for quiz {quiz_id} from student_results.json")
+            except OSError as e:
+                logger.error(f"Failed to delete results for quiz {quiz_id}: {str(e)}")
+
+            # Drop the quiz's statistics and merge its module's again
+            try:
+                quiz_stats.forget_quiz(quiz_id, activity_to_delete.get("moduleId"))
+            except OSError as e:
+                logger.error(f"Failed to delete statistics for quiz {quiz_id}: {str(e)}")
+
+        return jsonify(
+            {
+                "success": True,
+                "message": "Activity deleted successfully",
+                "deleted": activity_to_delete is not None,
+                "quiz_deleted": quiz_deleted,
+                "quiz_results_deleted": quiz_results_deleted,
+                "quiz_id": quiz_id
+            }
+        )
 
     except Exception as e:
         logger.error(f"Error deleting activity: {str(e)}")
@@ -364,23 +359,25 @@ def update_quiz_activity_title():
         if not quiz_id or not new_title:
             return jsonify({"success": False, "message": "Quiz ID and new title are required"}), 400
             
-        # Load all activities
         activities_file = os.path.join(DATABASE_FOLDER, "activities.json")
-        all_activities = load_json_file(activities_file, [])
         
         # Update activities that reference this quiz
-        updated = False
-        for activity in all_activities:
-            if activity.get("type") == "quiz" and activity.get("quizId") == quiz_id:
-                activity["title"] = new_title
-                updated = True
+        def rename_activities(all_activities):
+            updated = False
+            for activity in all_activities:
+                if activity.get("type") == "quiz" and activity.get("quizId") == quiz_id:
+                    activity["title"] = new_title
+                    updated = True
+            return updated
         
         # Save the updated activities
+        try:
+            updated = update_json_file(activities_file, rename_activities, [])
+        except OSError:
+            return jsonify({"success": False, "message": "Failed to save activities file"}), 500
+
         if updated:
-            if save_json_file(activities_file, all_activities):
-                return jsonify({"success": True, "message": "Activity titles updated successfully"})
-            else:
-                return jsonify({"success": False, "message": "Failed to save activities file"}), 500
+            return jsonify({"success": True, "message": "Activity titles updated successfully"})
         else:
             return jsonify({"success": True, "message": "No activities found with the specified quiz ID"})
             
@@ -408,25 +405,15 @@ def complete_activity():
         # Path to store completions
         completions_file = os.path.join(DATABASE_FOLDER, "activity_completions.json")
         
-        # Load existing completions
-        completions = load_json_file(completions_file, {"completions": []})
-        
-        # Check if this completion already exists
-        completion_exists = False
-        for completion in completions["completions"]:
-            if (completion.get("activity_id") == activity_id and 
-                completion.get("student_id") == student_id):
-                # If record exists and we have a quiz score, update it
-                if quiz_score is not None:
-                    completion["quiz_score"] = quiz_score
-                    completion_exists = True
-                    break
-                else:
-                    completion_exists = True
-                    break
-                
-        # Add completion if it doesn't exist
-        if not completion_exists:
+        def record_completion(existing):
+            # If record exists and we have a quiz score, update it
+            if existing is not None:
+                if quiz_score is None:
+                    return None
+                existing["quiz_score"] = quiz_score
+                return existing
+
+            # Add completion if it doesn't exist
             new_completion = {
                 "activity_id": activity_id,
                 "module_id": module_id,
@@ -439,15 +426,18 @@ def complete_activity():
             if quiz_score is not None:
                 new_completion["quiz_score"] = quiz_score
                 
-            completions["completions"].append(new_completion)
-            
-            # Save completions back to file
-            if not save_json_file(completions_file, completions):
-                return jsonify({"success": False, "message": "Failed to save completion"}), 500
-        else:
-            # Save any updates made to existing completions
-            if not save_json_file(completions_file, completions):
-                return jsonify({"success": False, "message": "Failed to update completion"}), 500
+            return new_completion
+        
+        # Record the completion as a single event rather than rewriting the file
+        try:
+            get_storage().upsert_record(
+                completions_file,
+                "completions",
+                {"activity_id": activity_id, "student_id": student_id},
+                record_completion,
+            )
+        except OSError:
+            return jsonify({"success": False, "message": "Failed to save completion"}), 500
         
         return jsonify({"success": True, "message": "Activity marked as completed"})
         
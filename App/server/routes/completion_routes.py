@@ -1,36 +1,27 @@
 import os
-import json
 from datetime import datetime
 from flask import Blueprint, request, jsonify
-from config.app_config import logger
+from config.app_config import logger, DATABASE_FOLDER
+from storage.factory import get_storage
+from utils.file_helpers import load_json_file, save_json_file
 
 # Create a Blueprint for completions
 completion_routes = Blueprint('completion_routes', __name__)
 
 # Path to store completions data
-COMPLETIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'completions.json')
-
-def ensure_completions_file_exists():
-    """Ensure the completions.json file exists, create if not"""
-    os.makedirs(os.path.dirname(COMPLETIONS_PATH), exist_ok=True)
-    if not os.path.exists(COMPLETIONS_PATH):
-        with open(COMPLETIONS_PATH, 'w') as f:
-            json.dump({"completions": []}, f)
+COMPLETIONS_PATH = os.path.join(DATABASE_FOLDER, 'completions.json')
 
 def load_completions():
-    """Load the completions data from the JSON file"""
-    ensure_completions_file_exists()
-    try:
-        with open(COMPLETIONS_PATH, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+    """Load the completions data from storage"""
+    data = load_json_file(COMPLETIONS_PATH, {"completions": []})
+    if not isinstance(data, dict):
         return {"completions": []}
+    data.setdefault("completions", [])
+    return data
 
 def save_completions(data):
-    """Save the completions data to the JSON file"""
-    ensure_completions_file_exists()
-    with open(COMPLETIONS_PATH, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Save the completions data to storage"""
+    return save_json_file(COMPLETIONS_PATH, data)
 
 @completion_routes.route('/completion', methods=['POST'])
 def record_completion():
@@ -45,12 +36,11 @@ def record_completion():
             "message": "Missing required fields"
         }), 400
     
-    # Load existing completions
-    completions_data = load_completions()
+    storage = get_storage()
     
     # Create a new completion record
     completion = {
-        "id": len(completions_data["completions"]) + 1,
+        "id": storage.count_records(COMPLETIONS_PATH, "completions") + 1,
         "studentId": data["studentId"],
         "moduleId": data["moduleId"],
         "activityId": data["activityId"],
@@ -58,11 +48,12 @@ def record_completion():
         "score": data.get("score", None)
     }
     
-    # Add to completions list
-    completions_data["completions"].append(completion)
-    
-    # Save updated completions
-    save_completions(completions_data)
+    # Append to the completions list without rewriting earlier records
+    if not storage.append_record(COMPLETIONS_PATH, "completions", completion):
+        return jsonify({
+            "success": False,
+            "message": "Failed to save completion"
+        }), 500
     
     return jsonify({
         "success": True,
@@ -1,221 +1,208 @@
 from flask import Blueprint, request, jsonify, send_from_directory
 import os
+from functools import partial
 from werkzeug.utils import secure_filename
 
-from config.app_config import UPLOAD_FOLDER, allowed_file, logger
-from services.text_extraction import extract_text_from_pdf, extract_text_from_file
-from services.transcription import transcribe_video
-from utils.file_helpers import save_file
+from config.app_config import ALLOWED_EXTENSIONS, UPLOAD_FOLDER, allowed_file, logger
+from services.content_preparation import normalize_content
+from services.inference_scheduler import inference_scheduler
+from services.job_queue import JobQueueFull, job_queue
+from services.ollama_client import ollama_client
+from services.quiz_generation import in_flight_quizzes, quiz_cache
+from services.upload_processing import (
+    extract_youtube_video_id,
+    process_uploaded_file,
+    extraction_cache,
+    process_youtube_url,
+    summarize_content,
+)
+from services.transcription_worker import transcription_workers
+from services.whisper_pool import whisper_pool
+from utils.file_helpers import save_file, get_json_cache_stats
+from utils.lazy_import import import_report
 
 # Create blueprint for file-related routes
 file_routes = Blueprint("file_routes", __name__)
 
 
+def _queue_upload_job():
+    """
+    Save the files of an upload request and queue their processing
+
+    Every file and YouTube URL becomes one item of a background job, so they
+    are processed concurrently.
+
+    Returns:
+        tuple: (job, None), or (None, error response) if the request is invalid
+    """
+    # Check if files are in request - either as file uploads or YouTube URLs
+    has_files = 'files' in request.files
+    has_youtube = request.form.get('youtubeUrls')
+    
+    if not has_files and not has_youtube:
+        return None, (jsonify({"error": "No files or YouTube URLs provided"}), 400)
+
+    items = []
+
+    # YouTube URLs are fetched by the job
+    if has_youtube:
+        youtube_urls = [url for url in request.form.get('youtubeUrls').split(',') if url.strip()]
+        logger.info(f"Processing {len(youtube_urls)} YouTube URLs")
+
+        for url in youtube_urls:
+            if not extract_youtube_video_id(url):
+                logger.error(f"Could not extract video ID from YouTube URL: {url}")
+                continue
+            items.append((url, partial(process_youtube_url, url)))
+
+    # Uploaded files have to be saved while the request is still open
+    if has_files:
+        files = request.files.getlist("files")
+        if not files or all(file.filename == "" for file in files):
+            if not has_youtube:  # Only return error if no YouTube URLs were processed
+                return None, (jsonify({"error": "No files selected"}), 400)
+        else:
+            for file in files:
+                if not (file and allowed_file(file.filename)):
+                    return None, (
+                        jsonify(
+                            {
+                                "error": f"File type not allowed. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+                            }
+                        ),
+                        400,
+                    )
+
+            for file in files:
+                # Saved under a unique name, so a queued job never reads a
+                # file that a later upload of the same name replaced
+                filename = secure_filename(file.filename)
+                file_path, _ = save_file(file)
+                items.append((filename, partial(process_uploaded_file, file_path, filename)))
+
+    return job_queue.submit("upload", items, _combine_upload_results), None
+
+
+def _combine_upload_results(items):
+    """Join the content of all processed files, in upload order"""
+    results = [item["result"] for item in items if item["status"] == "completed"]
+    return {
+        "files": [summarize_content(info) for info in results],
+        "combinedContent": "\n\n".join(
+            normalize_content(info["content"]) for info in results if "message" not in info
+        ),
+    }
+
+
+def _first_failed_upload(job_status):
+    """Get the first file whose processing failed, if any"""
+    for item in job_status["items"]:
+        if item["status"] == "failed":
+            return {"error": "File processing failed", "message": item["error"], "filename": item["name"]}
+        if item["result"] and "message" in item["result"]:
+            return {
+                "error": item["result"]["error"],
+                "message": item["result"]["message"],
+                "filename": item["result"]["filename"],
+            }
+    return None
+
+
 @file_routes.route("/upload-files", methods=["POST"])
 def upload_files():
     """
     Handle uploading of multiple files
+
+    Processes the files in the background job queue and waits for the
+    result, holding a server thread meanwhile. Kept for API clients; the
+    web client uses /upload-files/jobs, which returns a job ID immediately.
     """
     try:
         logger.info("Received upload request for 1 or more files")
 
-        # Check if files are in request - either as file uploads or YouTube URLs
-        has_files = 'files' in request.files
-        has_youtube = request.form.get('youtubeUrls')
-        
-        if not has_files and not has_youtube:
-            return jsonify({"error": "No files or YouTube URLs provided"}), 400
-
-        combined_content = []
-        file_info = []
-
-        # Process YouTube URLs if present
-        if has_youtube:
-            youtube_urls = request.form.get('youtubeUrls').split(',')
-            logger.info(f"Processing {len(youtube_urls)} YouTube URLs")
-            
-            for url in youtube_urls:
-                if not url.strip():
-                    continue
-                    
-                try:
-                    # Extract video ID from URL
-                    import re
-                    video_id = None
-                    patterns = [
-                        r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/watch\?v=([^&]+)',
-                        r'(?:https?:\/\/)?(?:www\.)?youtu\.be\/([^?]+)'
-                    ]
-                    
-                    for pattern in patterns:
-                        match = re.search(pattern, url)
-                        if match:
-                            video_id = match.group(1)
-                            break
-                    
-                    if not video_id:
-                        logger.error(f"Could not extract video ID from YouTube URL: {url}")
-                        continue
-                        
-                    logger.info(f"Processing YouTube video: {video_id}")
-                    
-                    # Here you would integrate with YouTube API to get transcripts
-                    # This is a simplified demonstration - you'll need to implement
-                    # actual transcript fetching from YouTube API
-                    
-                    # Attempt to get transcript (mock implementation)
-                    try:
-                        # Example implementation - this should be replaced with actual API calls
-                        from youtube_transcript_api import YouTubeTranscriptApi
-                        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-                        
-                        # Format the transcript
-                        transcript_text = f"YouTube Video Transcript (ID: {video_id}):\n\n"
-                        for item in transcript_list:
-                            transcript_text += f"{item['text']} "
-                            
-                        # Add to combined content
-                        combined_content.append(transcript_text)
-                        
-                        # Add to file info
-                        file_info.append({
-                            "filename": f"youtube_{video_id}.txt",
-                            "type": "youtube",
-                            "videoId": video_id,
-                            "url": url,
-                            "content": transcript_text[:200] + "..." if len(transcript_text) > 200 else transcript_text
-                        })
-                        
-                        logger.info(f"Successfully processed YouTube transcript for video {video_id}")
-                        
-                    except Exception as e:
-                        logger.error(f"Error fetching YouTube transcript: {str(e)}")
-                        # Fallback message when transcript can't be fetched
-                        fallback_text = f"[YouTube video content from: {url}] - Transcript unavailable. The quiz generator will consider the video title and description only."
-                        combined_content.append(fallback_text)
-                        
-                        file_info.append({
-                            "filename": f"youtube_{video_id}.txt",
-                            "type": "youtube",
-                            "videoId": video_id,
-                            "url": url,
-                            "content": fallback_text,
-                            "error": str(e)
-                        })
-                        
-                except Exception as youtube_error:
-                    logger.error(f"Error processing YouTube URL {url}: {str(youtube_error)}")
-                    
-        # Process file uploads if present
-        if has_files:
-            files = request.files.getlist("files")
-            if not files or all(file.filename == "" for file in files):
-                if not has_youtube:  # Only return error if no YouTube URLs were processed
-                    return jsonify({"error": "No files selected"}), 400
-            else:
-                for file in files:
-                    if file and allowed_file(file.filename):
-                        filename = secure_filename(file.filename)
-                        file_path = os.path.join(UPLOAD_FOLDER, filename)
-                        logger.info(f"Saving file to: {file_path}")
-                        file.save(file_path)
-
-                        # Process file based on its type
-                        file_extension = (
-                            filename.rsplit(".", 1)[1].lower() if "." in filename else ""
-                        )
-                        content = ""
-
-                        if file_extension in ["mp4", "mov", "avi", "webm"]:
-                            # This is a video file, transcribe it
-                            logger.info(f"Starting video transcription for: {filename}")
-                            content = transcribe_video(file_path)
-                            logger.info(
-                                f"Transcribed {len(content)} characters from video: {filename}"
-                            )
-
-                            # Check if transcription failed and contains an error message
-                            if content.startswith("[VIDEO TRANSCRIPTION ERROR]"):
-                                return (
-                                    jsonify(
-                                        {
-                                            "error": "Video transcription failed",
-                                            "message": content,
-                                            "filename": filename,
-                                        }
-                                    ),
-                                    400,
-                                )
-                        elif file_extension in ["mp3", "wav", "ogg", "m4a"]:
-                            # This is an audio file, handle it similar to video (transcribe)
-                            logger.info(f"Starting audio transcription for: {filename}")
-                            content = transcribe_video(file_path)  # reuse the same function for audio
-                            logger.info(
-                                f"Transcribed {len(content)} characters from audio: {filename}"
-                            )
-                            
-                            # Check if transcription failed
-                            if content.startswith("[VIDEO TRANSCRIPTION ERROR]") or content.startswith("[AUDIO TRANSCRIPTION ERROR]"):
-                                return (
-                                    jsonify(
-                                        {
-                                            "error": "Audio transcription failed",
-                                            "message": content,
-                                            "filename": filename,
-                                        }
-                                    ),
-                                    400,
-                                )
-                        elif file_extension == "pdf":
-                            # Process PDF
-                            content = extract_text_from_pdf(file_path)
-                        elif file_extension in ["doc", "docx"]:
-                            # For simplicity, assuming .doc/.docx files are handled elsewhere or by a library
-                            content = "Document content (processing not shown in this example)"
-                        else:
-                            # For text files, read directly
-                            try:
-                                content = extract_text_from_file(file_path)
-                            except:
-                                content = f"Failed to extract content from {filename}"
-
-                        combined_content.append(content)
-                        file_info.append(
-                            {
-                                "filename": filename,
-                                "path": file_path,
-                                "content": (
-                                    content[:200] + "..." if len(content) > 200 else content
-                                ),
-                            }
-                        )
-                    else:
-                        return (
-                            jsonify(
-                                {
-                                    "error": f"File type not allowed. Allowed types: {', '.join(allowed_file.__defaults__[0])}"
-                                }
-                            ),
-                            400,
-                        )
-
-        # Join all content
-        all_content = "\n\n".join(combined_content)
+        job, error_response = _queue_upload_job()
+        if error_response:
+            return error_response
+
+        job.wait()
+        status = job.to_dict()
+        if status["status"] == "failed":
+            return jsonify({"error": status["error"]}), 500
+
+        # A failed transcription fails the whole upload
+        failure = _first_failed_upload(status)
+        if failure:
+            return jsonify(failure), 400
         
         return (
             jsonify({
                 "message": "Files and YouTube URLs processed successfully", 
-                "files": file_info,
-                "combinedContent": all_content
+                "files": status["result"]["files"],
+                "combinedContent": status["result"]["combinedContent"]
             }),
             200,
         )
 
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         logger.error(f"Error in upload_files: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@file_routes.route("/upload-files/jobs", methods=["POST"])
+def upload_files_job():
+    """
+    Queue uploaded files for processing and return a job ID right away
+
+    Poll GET /jobs/<job_id> for progress and results.
+    """
+    try:
+        logger.info("Received background upload request for 1 or more files")
+
+        job, error_response = _queue_upload_job()
+        if error_response:
+            return error_response
+
+        return (
+            jsonify({
+                "success": True,
+                "jobId": job.id,
+                "statusUrl": f"/api/jobs/{job.id}",
+                "total": len(job.items),
+            }),
+            202,
+        )
+
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error in upload_files_job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@file_routes.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Report the progress of a background job
+
+    Each file is listed with its status and, once processed, a preview of
+    its content. The combined content is included when the job is done.
+    """
+    status = job_queue.get(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    # Only previews per file; the full text is in the combined result
+    for item in status["items"]:
+        if item["result"]:
+            item["result"] = summarize_content(item["result"])
+    if status["status"] == "completed" and status["kind"] == "upload":
+        status["failure"] = _first_failed_upload(status)
+
+    return jsonify(status)
+
+
 @file_routes.route("/upload", methods=["POST"])
 def upload_file():
     """
@@ -536,3 +523,83 @@ def list_uploads():
     except Exception as e:
         logger.error(f"Error listing uploads: {str(e)}")
         return jsonify({"error": str(e)}), 500
+
+
+@file_routes.route("/debug/json-cache", methods=["GET"])
+def json_cache_stats():
+    """
+    Report hit/miss counters for the shared JSON document cache (for debugging)
+    """
+    return jsonify(get_json_cache_stats())
+
+
+@file_routes.route("/debug/whisper-pool", methods=["GET"])
+def whisper_pool_stats():
+    """
+    Report load times and reuse counters of the loaded Whisper models (for debugging)
+    """
+    return jsonify(whisper_pool.stats())
+
+
+@file_routes.route("/debug/extraction-cache", methods=["GET"])
+def extraction_cache_stats():
+    """
+    Report hit/miss counters and disk usage of the extraction cache (for debugging)
+    """
+    return jsonify(extraction_cache.stats())
+
+
+@file_routes.route("/debug/jobs", methods=["GET"])
+def job_queue_stats():
+    """
+    Report worker and queue occupancy of the background job queue (for debugging)
+    """
+    return jsonify(job_queue.stats())
+
+
+@file_routes.route("/debug/ollama", methods=["GET"])
+def ollama_client_stats():
+    """
+    Report call counts and latencies of requests to Ollama (for debugging)
+    """
+    return jsonify(ollama_client.stats())
+
+
+@file_routes.route("/debug/quiz-cache", methods=["GET"])
+def quiz_cache_stats():
+    """
+    Report hit/miss counters and disk usage of the LLM response cache (for debugging)
+    """
+    return jsonify(quiz_cache.stats())
+
+
+@file_routes.route("/debug/quiz-coalescing", methods=["GET"])
+def quiz_coalescing_stats():
+    """
+    Report how many identical quiz generations were collapsed into one (for debugging)
+    """
+    return jsonify(in_flight_quizzes.stats())
+
+
+@file_routes.route("/debug/llm-scheduler", methods=["GET"])
+def llm_scheduler_stats():
+    """
+    Report running, queued and refused LLM generations (for debugging)
+    """
+    return jsonify(inference_scheduler.stats())
+
+
+@file_routes.route("/debug/imports", methods=["GET"])
+def import_stats():
+    """
+    Report import times and which heavy modules are loaded (for debugging)
+    """
+    return jsonify(import_report())
+
+
+@file_routes.route("/debug/transcription-workers", methods=["GET"])
+def transcription_worker_stats():
+    """
+    Get the status of the transcription worker processes (for debugging)
+    """
+    return jsonify(transcription_workers.stats())
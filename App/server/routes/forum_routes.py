@@ -6,11 +6,15 @@ import base64
 from datetime import datetime
 import re
 
+from config.app_config import FORUM_FOLDER
+from storage.factory import get_storage
+from utils.file_helpers import load_json_file, save_json_file, update_json_file
+
 # Create blueprint
 forum_routes = Blueprint('forum_routes', __name__)
 
 # Define path to forum data
-FORUM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'forum')
+FORUM_DIR = FORUM_FOLDER
 os.makedirs(FORUM_DIR, exist_ok=True)
 
 # Define path for forum images
@@ -49,15 +53,8 @@ def save_image_from_base64(base64_data, module_id):
 def get_forum_posts(module_id):
     file_path = os.path.join(FORUM_DIR, f'{module_id}.json')
     
-    if not os.path.exists(file_path):
-        # Create empty file if it doesn't exist
-        with open(file_path, 'w') as f:
-            json.dump([], f)
-        return []
-    
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        return load_json_file(file_path, [])
     except Exception as e:
         print(f"Error loading forum posts: {str(e)}")
         return []
@@ -67,9 +64,7 @@ def save_forum_posts(module_id, posts):
     file_path = os.path.join(FORUM_DIR, f'{module_id}.json')
     
     try:
-        with open(file_path, 'w') as f:
-            json.dump(posts, f, indent=2)
-        return True
+        return save_json_file(file_path, posts)
     except Exception as e:
         print(f"Error saving forum posts: {str(e)}")
         return False
@@ -79,16 +74,10 @@ def get_forum_status(module_id=None):
     # Use a global status file
     status_file_path = os.path.join(FORUM_DIR, 'global_forum_status.json')
     
-    if not os.path.exists(status_file_path):
-        # Default status is enabled
-        with open(status_file_path, 'w') as f:
-            json.dump({"status": "enabled"}, f)
-        return "enabled"
-    
     try:
-        with open(status_file_path, 'r') as f:
-            data = json.load(f)
-            return data.get("status", "enabled")
+        # Default status is enabled
+        data = load_json_file(status_file_path, {"status": "enabled"})
+        return data.get("status", "enabled")
     except Exception as e:
         print(f"Error loading forum status: {str(e)}")
         return "enabled"
@@ -99,9 +88,7 @@ def save_forum_status(status, module_id=None):
     status_file_path = os.path.join(FORUM_DIR, 'global_forum_status.json')
     
     try:
-        with open(status_file_path, 'w') as f:
-            json.dump({"status": status}, f, indent=2)
-        return True
+        return save_json_file(status_file_path, {"status": status})
     except Exception as e:
         print(f"Error saving forum status: {str(e)}")
         return False
@@ -154,12 +141,8 @@ def create_forum_post(module_id):
         if image_url:
             new_post['imageAttachment'] = image_url
         
-        # Get existing posts and add the new one
-        posts = get_forum_posts(module_id)
-        posts.append(new_post)
-        
-        # Save updated posts
-        if save_forum_posts(module_id, posts):
+        # Add the new post without rewriting the existing ones
+        if get_storage().add_forum_post(module_id, new_post):
             return jsonify(new_post), 201
         else:
             return jsonify({'error': 'Failed to save post'}), 500
@@ -197,22 +180,13 @@ def add_comment(module_id, post_id):
         if image_url:
             new_comment['imageAttachment'] = image_url
         
-        # Get existing posts
-        posts = get_forum_posts(module_id)
-        
-        # Find the post and add the comment
-        post_found = False
-        for post in posts:
-            if post['id'] == post_id:
-                post.setdefault('comments', []).append(new_comment)
-                post_found = True
-                break
+        # Add the comment to the post it belongs to
+        saved = get_storage().add_forum_comment(module_id, post_id, new_comment)
         
-        if not post_found:
+        if saved is None:
             return jsonify({'error': 'Post not found'}), 404
         
-        # Save updated posts
-        if save_forum_posts(module_id, posts):
+        if saved:
             return jsonify(new_comment), 201
         else:
             return jsonify({'error': 'Failed to save comment'}), 500
@@ -224,26 +198,23 @@ def add_comment(module_id, post_id):
 @forum_routes.route('/forum/<module_id>/post/<post_id>', methods=['DELETE'])
 def delete_forum_post(module_id, post_id):
     try:
-        # Get existing posts
-        posts = get_forum_posts(module_id)
+        file_path = os.path.join(FORUM_DIR, f'{module_id}.json')
         
-        # Find and remove the post
-        post_found = False
-        filtered_posts = []
-        for post in posts:
-            if post['id'] == post_id:
-                post_found = True
-            else:
-                filtered_posts.append(post)
+        # Find and remove the post while holding the forum file's lock
+        def remove_post(posts):
+            remaining = [post for post in posts if post.get('id') != post_id]
+            if len(remaining) == len(posts):
+                raise LookupError(post_id)
+            posts[:] = remaining
         
-        if not post_found:
+        try:
+            update_json_file(file_path, remove_post, [])
+        except LookupError:
             return jsonify({'error': 'Post not found'}), 404
-        
-        # Save updated posts
-        if save_forum_posts(module_id, filtered_posts):
-            return jsonify({'message': 'Post deleted successfully'}), 200
-        else:
+        except OSError:
             return jsonify({'error': 'Failed to save changes'}), 500
+        
+        return jsonify({'message': 'Post deleted successfully'}), 200
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
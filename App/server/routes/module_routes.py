@@ -3,7 +3,7 @@ import os
 import json
 
 from config.app_config import DATABASE_FOLDER, DATABASE_FOLDER, logger
-from utils.file_helpers import load_json_file, save_json_file
+from utils.file_helpers import load_json_file, save_json_file, update_json_file
 
 # Create blueprint for module-related routes
 module_routes = Blueprint("module_routes", __name__)
@@ -17,11 +17,10 @@ def get_topics():
     try:
         topics_file = os.path.join(DATABASE_FOLDER, "topics.json")
         
-        # Explicitly read with UTF-8 encoding
+        # Read through the shared loader (UTF-8, cached)
         if os.path.exists(topics_file):
-            with open(topics_file, 'r', encoding='utf-8') as f:
-                topics = json.load(f)
-                logger.info(f"Successfully loaded {len(topics)} topics")
+            topics = load_json_file(topics_file, [])
+            logger.info(f"Successfully loaded {len(topics)} topics")
         else:
             logger.warning(f"Topics file not found at {topics_file}")
             topics = []
@@ -100,36 +99,35 @@ def update_module():
         
         module_id = module_data.get("id")
         
-        # Load existing modules
         modules_file = os.path.join(DATABASE_FOLDER, "modules.json")
-        modules = load_json_file(modules_file, [])
-        
-        # Find the module to update
-        module_index = None
-        for i, module in enumerate(modules):
-            if module.get("id") == module_id:
-                module_index = i
-                break
         
-        if module_index is None:
+        def apply_update(modules):
+            # Find the module to update
+            module = next((m for m in modules if m.get("id") == module_id), None)
+            if module is None:
+                raise LookupError(module_id)
+            
+            # Update module properties, preserving any that aren't in the request
+            updatable_fields = ["title", "date", "description", "subtitle", "icon", "topicId"]
+            for field in updatable_fields:
+                if field in module_data:
+                    module[field] = module_data[field]
+            return module
+        
+        # Load, update and save the modules under the file lock
+        try:
+            updated_module = update_json_file(modules_file, apply_update, [])
+        except LookupError:
             return jsonify({"success": False, "message": f"Module with ID {module_id} not found"}), 404
-        
-        # Update module properties, preserving any that aren't in the request
-        updatable_fields = ["title", "date", "description", "subtitle", "icon", "topicId"]
-        for field in updatable_fields:
-            if field in module_data:
-                modules[module_index][field] = module_data[field]
-        
-        # Save the updated modules back to file
-        if save_json_file(modules_file, modules):
-            return jsonify({
-                "success": True,
-                "message": "Module updated successfully",
-                "module": modules[module_index]
-            })
-        else:
+        except OSError:
             return jsonify({"success": False, "message": "Failed to save module data"}), 500
         
+        return jsonify({
+            "success": True,
+            "message": "Module updated successfully",
+            "module": updated_module
+        })
+        
     except Exception as e:
         logger.error(f"Error updating module: {str(e)}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -145,53 +143,55 @@ def create_module():
         if not module_data or "title" not in module_data:
             return jsonify({"success": False, "message": "Module title is required"}), 400
         
-        # Load existing modules
         modules_file = os.path.join(DATABASE_FOLDER, "modules.json")
-        modules = load_json_file(modules_file, [])
         
-        # Generate a new module ID
-        new_id = module_data.get("id")
-        if not new_id:
-            # Generate an ID based on title if not provided
-            base_id = f"module-{len(modules) + 1}"
-            new_id = base_id
+        def add_module(modules):
+            # Generate a new module ID
+            new_id = module_data.get("id")
+            if not new_id:
+                # Generate an ID based on title if not provided
+                base_id = f"module-{len(modules) + 1}"
+                new_id = base_id
+                
+                # Ensure ID is unique
+                existing_ids = [m.get("id") for m in modules]
+                counter = 1
+                while new_id in existing_ids:
+                    new_id = f"{base_id}-{counter}"
+                    counter += 1
             
-            # Ensure ID is unique
-            existing_ids = [m.get("id") for m in modules]
-            counter = 1
-            while new_id in existing_ids:
-                new_id = f"{base_id}-{counter}"
-                counter += 1
-        
-        # Create the new module object
-        new_module = {
-            "id": new_id,
-            "title": module_data.get("title"),
-            "date": module_data.get("date", ""),
-            "description": module_data.get("description", ""),
-            "topicId": module_data.get("topicId", "topic-1")  # Default to topic-1 if not specified
-        }
-        
-        # Add optional fields if provided
-        if "subtitle" in module_data:
-            new_module["subtitle"] = module_data["subtitle"]
-        
-        if "icon" in module_data:
-            new_module["icon"] = module_data["icon"]
-        
-        # Add the new module to the list
-        modules.append(new_module)
-        
-        # Save the updated modules back to file
-        if save_json_file(modules_file, modules):
-            return jsonify({
-                "success": True,
-                "message": "Module created successfully",
-                "module": new_module
-            })
-        else:
+            # Create the new module object
+            new_module = {
+                "id": new_id,
+                "title": module_data.get("title"),
+                "date": module_data.get("date", ""),
+                "description": module_data.get("description", ""),
+                "topicId": module_data.get("topicId", "topic-1")  # Default to topic-1 if not specified
+            }
+            
+            # Add optional fields if provided
+            if "subtitle" in module_data:
+                new_module["subtitle"] = module_data["subtitle"]
+            
+            if "icon" in module_data:
+                new_module["icon"] = module_data["icon"]
+            
+            # Add the new module to the list
+            modules.append(new_module)
+            return new_module
+        
+        # Generate the ID and save under the file lock so IDs stay unique
+        try:
+            new_module = update_json_file(modules_file, add_module, [])
+        except OSError:
             return jsonify({"success": False, "message": "Failed to save module data"}), 500
         
+        return jsonify({
+            "success": True,
+            "message": "Module created successfully",
+            "module": new_module
+        })
+        
     except Exception as e:
         logger.error(f"Error creating module: {str(e)}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -206,33 +206,29 @@ def delete_module(module_id):
         if not module_id:
             return jsonify({"success": False, "message": "Module ID is required"}), 400
         
-        # Load existing modules
         modules_file = os.path.join(DATABASE_FOLDER, "modules.json")
-        modules = load_json_file(modules_file, [])
-        
-        # Find the module to delete
-        module_index = None
-        for i, module in enumerate(modules):
-            if module.get("id") == module_id:
-                module_index = i
-                break
         
-        if module_index is None:
+        def remove_module(modules):
+            # Find the module to delete
+            for i, module in enumerate(modules):
+                if module.get("id") == module_id:
+                    return modules.pop(i)
+            raise LookupError(module_id)
+        
+        # Remove the module and save under the file lock
+        try:
+            deleted_module = update_json_file(modules_file, remove_module, [])
+        except LookupError:
             return jsonify({"success": False, "message": f"Module with ID {module_id} not found"}), 404
-        
-        # Remove the module
-        deleted_module = modules.pop(module_index)
-        
-        # Save the updated modules back to file
-        if save_json_file(modules_file, modules):
-            return jsonify({
-                "success": True,
-                "message": "Module deleted successfully",
-                "deleted_module": deleted_module
-            })
-        else:
+        except OSError:
             return jsonify({"success": False, "message": "Failed to save module data"}), 500
         
+        return jsonify({
+            "success": True,
+            "message": "Module deleted successfully",
+            "deleted_module": deleted_module
+        })
+        
     except Exception as e:
         logger.error(f"Error deleting module: {str(e)}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -262,46 +258,34 @@ def update_topic():
             logger.error(f"Error: topics.json file not found at {topics_file}")
             return jsonify({"success": False, "error": "Topics file not found"}), 404
             
-        # Explicitly load topics file with UTF-8 encoding
-        with open(topics_file, 'r', encoding='utf-8') as f:
-            topics = json.load(f)
-            logger.info(f"Successfully loaded topics from {topics_file}")
+        if 'name' not in topic_data and 'description' not in topic_data:
+            logger.warning("No changes were made to the topic")
+            return jsonify({"success": False, "error": "No changes provided"}), 400
             
-        # Find and update the topic
-        topic_found = False
-        topic_updated = False
-        
-        for topic in topics:
-            if topic.get('id') == topic_id:
-                logger.info(f"Found topic with ID {topic_id}")
-                topic_found = True
-                
-                # Update name if provided
-                if 'name' in topic_data:
-                    old_name = topic.get('name', '')
-                    topic['name'] = topic_data['name']
-                    logger.info(f"Updated topic name from '{old_name}' to '{topic_data['name']}'")
-                    topic_updated = True
+        # Find and update the topic under the file lock
+        def apply_update(topics):
+            for topic in topics:
+                if topic.get('id') == topic_id:
+                    logger.info(f"Found topic with ID {topic_id}")
                     
-                # Update description if provided
-                if 'description' in topic_data:
-                    topic['description'] = topic_data['description']
-                    logger.info(f"Updated topic description")
-                    topic_updated = True
-                
-                break
-                
-        if not topic_found:
+                    # Update name if provided
+                    if 'name' in topic_data:
+                        old_name = topic.get('name', '')
+                        topic['name'] = topic_data['name']
+                        logger.info(f"Updated topic name from '{old_name}' to '{topic_data['name']}'")
+                        
+                    # Update description if provided
+                    if 'description' in topic_data:
+                        topic['description'] = topic_data['description']
+                        logger.info(f"Updated topic description")
+                    return topic
+            raise LookupError(topic_id)
+        
+        try:
+            update_json_file(topics_file, apply_update, [])
+        except LookupError:
             logger.error(f"Topic with ID {topic_id} not found")
             return jsonify({"success": False, "error": f"Topic with ID {topic_id} not found"}), 404
-            
-        if not topic_updated:
-            logger.warning("No changes were made to the topic")
-            return jsonify({"success": False, "error": "No changes provided"}), 400
-            
-        # Explicitly save with UTF-8 encoding and ensure_ascii=False
-        with open(topics_file, 'w', encoding='utf-8') as f:
-            json.dump(topics, f, indent=2, ensure_ascii=False)
         logger.info(f"Successfully saved updated topics to {topics_file}")
             
         return jsonify({"success": True, "message": f"Topic {topic_id} updated successfully"})
@@ -1,17 +1,93 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import os
 import time
 import json
 
 from config.app_config import DATABASE_FOLDER, logger
-from services.quiz_generation import generate_quiz_with_ollama
-from services.quiz_parsing import parse_quiz
-from utils.file_helpers import load_json_file, save_json_file
+from services.inference_scheduler import PRIORITIES, SchedulerBusy, inference_scheduler
+from services.quiz_generation import generate_quiz_chunked, stream_quiz_with_ollama
+from services.quiz_parsing import IncrementalQuizParser
+from utils.file_helpers import load_json_file, update_json_file
 
 # Create blueprint for quiz-related routes
 quiz_routes = Blueprint("quiz_routes", __name__)
 
 
+def _read_quiz_request():
+    """
+    Read the quiz generation options from a JSON or form request
+
+    Returns:
+        dict: Generation options with defaults applied
+    """
+    # Check if the request is JSON or form data
+    if request.is_json:
+        # Handle JSON request from the frontend
+        data = request.json
+        options = {
+            "input_type": data.get("inputType", "topic"),
+            "content": data.get("content", ""),
+            "question_type": data.get("questionType", "multipleChoice"),
+            "student_level": data.get("studentLevel", "highSchool"),
+            "additional_instructions": data.get("additionalInstructions", ""),
+            "language": data.get("language", "danish"),
+            "num_questions": data.get("numQuestions", 5),  # Default to 5 if not provided
+            "quiz_title": data.get("quizTitle", "Quiz"),  # Get quiz title with default value
+            # Skip cached responses and run the model again
+            "regenerate": bool(data.get("regenerate", False)),
+            # "bulk" requests wait behind interactive ones for the LLM
+            "priority": PRIORITIES.get(data.get("priority"), PRIORITIES["interactive"]),
+        }
+
+        logger.info(
+            f"Received JSON request with input_type: {options['input_type']}, question_type: {options['question_type']}, language: {options['language']}"
+        )
+        logger.info(
+            f"Content length: {len(options['content'])} characters, requested questions: {options['num_questions']}"
+        )
+    else:
+        # For backward compatibility with form data
+        options = {
+            "input_type": request.form.get("inputType", "topic"),
+            "content": request.form.get("content", ""),
+            "question_type": request.form.get("questionType", "multipleChoice"),
+            "student_level": request.form.get("studentLevel", "highSchool"),
+            "additional_instructions": request.form.get("additionalInstructions", ""),
+            "language": request.form.get("language", "danish"),
+            "num_questions": int(request.form.get("numQuestions", 5)),  # Default to 5 if not provided
+            "quiz_title": request.form.get("quizTitle", "Quiz"),  # Get quiz title with default value
+            "regenerate": request.form.get("regenerate", "false").lower() in ("1", "true", "yes"),
+            "priority": PRIORITIES.get(request.form.get("priority"), PRIORITIES["interactive"]),
+        }
+
+        logger.info(
+            f"Received form data with input_type: {options['input_type']}, question_type: {options['question_type']}, language: {options['language']}"
+        )
+
+    return options
+
+
+def _combined_instructions(options):
+    """Add the language instruction to the user's additional instructions"""
+    # Add instructions about language if specified
+    lang_instruction = ""
+    if options["language"] == "danish":
+        lang_instruction = "Generate the quiz in Danish language."
+    elif options["language"] == "english":
+        lang_instruction = "Generate the quiz in English language."
+
+    # Combine all instructions
+    return f"{options['additional_instructions']} {lang_instruction}"
+
+
+def _busy_response(error):
+    """Tell the client the LLM is busy and when to try again"""
+    response = jsonify({"success": False, "message": str(error), "retryAfter": error.retry_after})
+    response.status_code = error.status_code
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
 @quiz_routes.route("/generate-quiz", methods=["POST"])
 def generate_quiz():
     """
@@ -19,81 +95,35 @@ def generate_quiz():
     """
     try:
         logger.info("=== Starting Quiz Generation Process ===")
-        # Check if the request is JSON or form data
-        if request.is_json:
-            # Handle JSON request from the frontend
-            data = request.json
-            input_type = data.get("inputType", "topic")
-            content = data.get("content", "")
-            question_type = data.get("questionType", "multipleChoice")
-            student_level = data.get("studentLevel", "highSchool")
-            additional_instructions = data.get("additionalInstructions", "")
-            language = data.get("language", "danish")
-            num_questions = data.get("numQuestions", 5)  # Default to 5 if not provided
-            quiz_title = data.get(
-                "quizTitle", "Quiz"
-            )  # Get quiz title with default value
-
-            logger.info(
-                f"Received JSON request with input_type: {input_type}, question_type: {question_type}, language: {language}"
-            )
-            logger.info(
-                f"Content length: {len(content)} characters, requested questions: {num_questions}"
-            )
-        else:
-            # For backward compatibility with form data
-            input_type = request.form.get("inputType", "topic")
-            content = request.form.get("content", "")
-            question_type = request.form.get("questionType", "multipleChoice")
-            student_level = request.form.get("studentLevel", "highSchool")
-            additional_instructions = request.form.get("additionalInstructions", "")
-            language = request.form.get("language", "danish")
-            num_questions = int(
-                request.form.get("numQuestions", 5)
-            )  # Default to 5 if not provided
-            quiz_title = request.form.get(
-                "quizTitle", "Quiz"
-            )  # Get quiz title with default value
-
-            logger.info(
-                f"Received form data with input_type: {input_type}, question_type: {question_type}, language: {language}"
-            )
+        options = _read_quiz_request()
+        content = options["content"]
+        question_type = options["question_type"]
+        language = options["language"]
+        num_questions = options["num_questions"]
+        quiz_title = options["quiz_title"]
 
         # If content is available, generate quiz with Ollama
         if content:
-            # Add instructions about language if specified
-            lang_instruction = ""
-            if language == "danish":
-                lang_instruction = "Generate the quiz in Danish language."
-            elif language == "english":
-                lang_instruction = "Generate the quiz in English language."
-
-            # Combine all instructions
-            combined_instructions = f"{additional_instructions} {lang_instruction}"
+            combined_instructions = _combined_instructions(options)
 
             logger.info(
                 f"Calling Ollama with language: {language}, instructions: '{combined_instructions}'"
             )
 
-            # Generate quiz using Ollama with the user-specified number of questions
+            # Generate quiz using Ollama with the user-specified number of
+            # questions; long content is split into chunks generated in parallel
             logger.info("Starting LLM quiz generation")
-            raw_quiz = generate_quiz_with_ollama(
+            quiz = generate_quiz_chunked(
                 content,
                 num_questions=num_questions,  # Use the value from the request
                 model="mistral",
                 question_type=question_type,
                 additional_instructions=combined_instructions,
+                use_cache=not options["regenerate"],
+                priority=options["priority"],
             )
 
-            if raw_quiz:
-                logger.info(
-                    f"Successfully received raw quiz from Ollama (length: {len(raw_quiz)} characters)"
-                )
-
-                # Parse the raw quiz text into structured format
-                logger.info("Parsing raw quiz text into structured format")
-                quiz = parse_quiz(raw_quiz, question_type)
-
+            if quiz:
                 # Add the title from the request to the quiz data
                 quiz["title"] = quiz_title
 
@@ -143,6 +173,8 @@ def generate_quiz():
 
         return jsonify(sample_quiz)
 
+    except SchedulerBusy as e:
+        return _busy_response(e)
     except Exception as e:
         logger.error(
             f"Error in generate_quiz: {e}", exc_info=True
@@ -150,6 +182,68 @@ def generate_quiz():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def _sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@quiz_routes.route("/generate-quiz/stream", methods=["POST"])
+def generate_quiz_stream():
+    """
+    Generate a quiz, sending each question as soon as the LLM has written it
+
+    Takes the same request as /generate-quiz and responds with Server-Sent
+    Events: a "question" event per completed question, then a "done" event
+    with the whole quiz as parse_quiz would read it (which the client should
+    keep in place of the streamed questions), or an "error" event.
+    """
+    options = _read_quiz_request()
+    if not options["content"]:
+        return jsonify({"success": False, "message": "No content provided"}), 400
+
+    # Wait for the LLM before starting the stream, so a busy server can
+    # still answer with a status code
+    try:
+        granted = inference_scheduler.acquire(options["priority"])
+    except SchedulerBusy as e:
+        return _busy_response(e)
+
+    combined_instructions = _combined_instructions(options)
+    question_type = options["question_type"]
+
+    def events():
+        parser = IncrementalQuizParser(question_type)
+        try:
+            for fragment in stream_quiz_with_ollama(
+                options["content"],
+                num_questions=options["num_questions"],
+                model="mistral",
+                question_type=question_type,
+                additional_instructions=combined_instructions,
+            ):
+                for question in parser.feed(fragment):
+                    yield _sse("question", question)
+            for question in parser.finish():
+                yield _sse("question", question)
+
+            quiz = parser.quiz()
+            quiz["title"] = options["quiz_title"]
+            logger.info(f"Streamed quiz with {len(quiz['questions'])} questions")
+            yield _sse("done", quiz)
+        except Exception as e:
+            logger.error(f"Error in generate_quiz_stream: {e}")
+            yield _sse("error", {"success": False, "message": str(e)})
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs even if the client disconnects before the stream starts
+    response.call_on_close(lambda: inference_scheduler.release(granted))
+    return response
+
+
 @quiz_routes.route("/save-quiz", methods=["POST"])
 def save_quiz():
     """
@@ -192,37 +286,34 @@ def save_quiz():
             
             logger.info(f"Automatically determined quiz type: {quiz_data['type']}")
 
-        # Load existing quizzes
+        # Add or replace the quiz while holding the quizzes file lock
         quizzes_file = os.path.join(DATABASE_FOLDER, "quizzes.json")
-        quizzes = load_json_file(quizzes_file, [])
 
-        # Check if quiz with same ID already exists
-        updated = False
-        for i, quiz in enumerate(quizzes):
-            if quiz.get("id") == quiz_data["id"]:
-                quizzes[i] = quiz_data
-                updated = True
-                break
-
-        # Add quiz if it doesn't exist
-        if not updated:
+        def upsert_quiz(quizzes):
+            # Check if quiz with same ID already exists
+            for i, quiz in enumerate(quizzes):
+                if quiz.get("id") == quiz_data["id"]:
+                    quizzes[i] = quiz_data
+                    return
+            # Add quiz if it doesn't exist
             quizzes.append(quiz_data)
 
-        # Save quizzes back to file
-        if save_json_file(quizzes_file, quizzes):
-            return jsonify(
-                {
-                    "success": True,
-                    "message": "Quiz saved successfully",
-                    "quizId": quiz_data["id"],
-                }
-            )
-        else:
+        try:
+            update_json_file(quizzes_file, upsert_quiz, [])
+        except OSError:
             return (
                 jsonify({"success": False, "message": "Failed to save quiz file"}),
                 500,
             )
 
+        return jsonify(
+            {
+                "success": True,
+                "message": "Quiz saved successfully",
+                "quizId": quiz_data["id"],
+            }
+        )
+
     except Exception as e:
         logger.error(f"Error saving quiz: {str(e)}")
         return jsonify({"success": False, "message": str(e)}), 500
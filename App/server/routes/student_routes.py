@@ -1,14 +1,18 @@
 import os
-import json
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import random
 
+from config.app_config import DATABASE_FOLDER, logger
+from services import badge_engine, item_analysis, quiz_stats
+from storage.factory import get_storage
+from utils.file_helpers import load_json_file, save_json_file
+
 student_bp = Blueprint("student", __name__)
 
 # Path to store student quiz results
-STUDENT_DATA_PATH = "database/student_results.json"
-STUDENTS_LIST_PATH = "database/students.json"
+STUDENT_DATA_PATH = os.path.join(DATABASE_FOLDER, "student_results.json")
+STUDENTS_LIST_PATH = os.path.join(DATABASE_FOLDER, "students.json")
 
 # Current logged in student
 CURRENT_STUDENT = {
@@ -17,48 +21,27 @@ CURRENT_STUDENT = {
 }
 
 
-def ensure_student_data_exists():
-    """Ensure the data directory and student_results.json file exist"""
-    os.makedirs(os.path.dirname(STUDENT_DATA_PATH), exist_ok=True)
-    if not os.path.exists(STUDENT_DATA_PATH):
-        with open(STUDENT_DATA_PATH, "w") as f:
-            json.dump({"quiz_history": []}, f, indent=2)
-
-
 def load_student_data():
-    """Load student quiz results from JSON file"""
-    ensure_student_data_exists()
-    try:
-        with open(STUDENT_DATA_PATH, "r") as f:
-            content = f.read().strip()
-            if not content:  # Handle empty file
-                return {"quiz_history": []}
-            return json.loads(content)
-    except json.JSONDecodeError:
-        # If file has invalid JSON, return empty quiz history
+    """Load student quiz results from storage"""
+    data = load_json_file(STUDENT_DATA_PATH, {"quiz_history": []})
+    if not isinstance(data, dict):
+        # If the document is invalid, return empty quiz history
         return {"quiz_history": []}
+    data.setdefault("quiz_history", [])
+    return data
 
 
 def save_student_data(data):
-    """Save student quiz results to JSON file"""
-    ensure_student_data_exists()
-    with open(STUDENT_DATA_PATH, "w") as f:
-        json.dump(data, f, indent=2)
+    """Save student quiz results to storage"""
+    return save_json_file(STUDENT_DATA_PATH, data)
 
 
 def load_all_students():
     """Load all students from JSON file"""
-    if not os.path.exists(STUDENTS_LIST_PATH):
-        return {"students": []}
-    
-    try:
-        with open(STUDENTS_LIST_PATH, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return {"students": []}
-            return json.loads(content)
-    except json.JSONDecodeError:
+    data = load_json_file(STUDENTS_LIST_PATH, {"students": []})
+    if not isinstance(data, dict):
         return {"students": []}
+    return data
 
 
 @student_bp.route("/student/current", methods=["GET"])
@@ -82,16 +65,9 @@ def get_all_students():
 @student_bp.route("/student/quiz-history", methods=["GET"])
 def get_quiz_history():
     """Get all quiz results for the current student"""
-    student_data = load_student_data()
-    
-    # Filter results by student ID
-    student_id = CURRENT_STUDENT["student_id"]
-    
     # Get only this student's quiz history
-    history = [
-        result for result in student_data["quiz_history"] 
-        if result.get("student_id") == student_id
-    ]
+    student_id = CURRENT_STUDENT["student_id"]
+    history = get_storage().get_quiz_results(student_id=student_id)
     
     return jsonify({"quiz_history": history})
 
@@ -100,7 +76,6 @@ def get_quiz_history():
 def save_quiz_result():
     """Save a new quiz result for the student"""
     data = request.json
-    student_data = load_student_data()
     
     quiz_id = data.get("quiz_id")
     student_id = CURRENT_STUDENT["student_id"]
@@ -122,24 +97,22 @@ def save_quiz_result():
         "student_name": CURRENT_STUDENT["name"]
     }
     
-    # Check if a result with the same quiz ID and student ID already exists
-    existing_index = -1
-    for i, result in enumerate(student_data["quiz_history"]):
-        if result.get("quiz_id") == quiz_id and result.get("student_id") == student_id:
-            existing_index = i
-            break
+    # Replaces any earlier result for the same quiz and student, counting
+    # the attempt, without rewriting unrelated results
+    quiz_result, replaced = get_storage().save_quiz_result(quiz_result)
     
-    if existing_index >= 0:
-        # Update the existing result
-        existing_result = student_data["quiz_history"][existing_index]
-        attempts = existing_result.get("attempts", 1) + 1
-        quiz_result["attempts"] = attempts
-        student_data["quiz_history"][existing_index] = quiz_result
-    else:
-        # Add new result
-        student_data["quiz_history"].append(quiz_result)
+    # Keep the student's badge aggregates up to date; badges are awarded with
+    # the quiz completion that follows
+    try:
+        badge_engine.record_result(quiz_result)
+    except Exception as e:
+        logger.error(f"Error updating badge progress: {str(e)}")
     
-    save_student_data(student_data)
+    # Keep the quiz and module statistics up to date
+    try:
+        quiz_stats.record_result(quiz_result, replaced)
+    except Exception as e:
+        logger.error(f"Error updating quiz statistics: {str(e)}")
     
     return jsonify({"success": True, "message": "Quiz result saved"})
 
@@ -150,57 +123,100 @@ def get_quiz_results(quiz_id):
         # Get the userRole from query param (default to student if not provided)
         user_role = request.args.get('userRole', 'student')
         
-        # Load student results using the correct path
-        if not os.path.exists(STUDENT_DATA_PATH):
-            # For teachers, always return mock data if no real data exists
-            if user_role == 'teacher':
-                return jsonify(generate_mock_quiz_results(quiz_id)), 200
-            return jsonify([]), 200
-
-        with open(STUDENT_DATA_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            quiz_results = [result for result in data.get('quiz_history', []) 
-                          if result.get('quiz_id') == quiz_id]
-            
-            # For teachers, return mock data if no real results exist
-            if len(quiz_results) == 0 and user_role == 'teacher':
-                return jsonify(generate_mock_quiz_results(quiz_id)), 200
-                
-            # Sort results by timestamp (newest first)
-            quiz_results.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            
-            return jsonify(quiz_results), 200
+        # Results come from the quiz index, sorted by timestamp (newest first)
+        quiz_results = get_storage().get_quiz_results(quiz_id=quiz_id, newest_first=True)
+        
+        # For teachers, return mock data if no real results exist
+        if len(quiz_results) == 0 and user_role == 'teacher':
+            return jsonify(generate_mock_quiz_results(quiz_id)), 200
+        
+        return jsonify(quiz_results), 200
 
     except Exception as e:
         print(f"Error fetching quiz results: {str(e)}")
         return jsonify({'error': 'Kunne ikke indlæse quiz resultater'}), 500
 
 
+@student_bp.route('/stats/quiz/<quiz_id>', methods=['GET'])
+def get_quiz_statistics(quiz_id):
+    """Get attempt counts, score distribution and per-question correctness for a quiz"""
+    try:
+        stats = quiz_stats.get_quiz_stats(quiz_id)
+        return jsonify({"quiz_id": quiz_id, **quiz_stats.summarize(stats)}), 200
+    except Exception as e:
+        logger.error(f"Error fetching statistics for quiz {quiz_id}: {str(e)}")
+        return jsonify({'error': 'Kunne ikke indlæse quiz statistik'}), 500
+
+
+@student_bp.route('/stats/quiz/<quiz_id>/leaderboard', methods=['GET'])
+def get_quiz_leaderboard(quiz_id):
+    """Get the students with the best score on a quiz (limit query param)"""
+    try:
+        limit = request.args.get('limit', type=int)
+        stats = quiz_stats.get_quiz_stats(quiz_id) or {}
+        return jsonify({"quiz_id": quiz_id, "leaderboard": stats.get("leaderboard", [])[:limit]}), 200
+    except Exception as e:
+        logger.error(f"Error fetching leaderboard for quiz {quiz_id}: {str(e)}")
+        return jsonify({'error': 'Kunne ikke indlæse rangliste'}), 500
+
+
+@student_bp.route('/stats/module/<module_id>', methods=['GET'])
+def get_module_statistics(module_id):
+    """Get attempt counts, score distribution and per-quiz summaries for a module"""
+    try:
+        stats = quiz_stats.get_module_stats(module_id)
+        return jsonify({"module_id": module_id, **quiz_stats.summarize(stats, quiz_stats.MODULE_SCOPE)}), 200
+    except Exception as e:
+        logger.error(f"Error fetching statistics for module {module_id}: {str(e)}")
+        return jsonify({'error': 'Kunne ikke indlæse modul statistik'}), 500
+
+
+@student_bp.route('/stats/module/<module_id>/leaderboard', methods=['GET'])
+def get_module_leaderboard(module_id):
+    """Get the students with the best quiz scores in a module (limit query param)"""
+    try:
+        limit = request.args.get('limit', type=int)
+        stats = quiz_stats.get_module_stats(module_id) or {}
+        return jsonify({"module_id": module_id, "leaderboard": stats.get("leaderboard", [])[:limit]}), 200
+    except Exception as e:
+        logger.error(f"Error fetching leaderboard for module {module_id}: {str(e)}")
+        return jsonify({'error': 'Kunne ikke indlæse rangliste'}), 500
+
+
+@student_bp.route('/stats/quiz/<quiz_id>/items', methods=['GET'])
+def get_quiz_item_analysis(quiz_id):
+    """Get difficulty, discrimination, item-total correlation and distractors per question of a quiz (for teachers)"""
+    try:
+        return jsonify({"quiz_id": quiz_id, **item_analysis.analyze_quiz(quiz_id)}), 200
+    except Exception as e:
+        logger.error(f"Error analyzing questions of quiz {quiz_id}: {str(e)}")
+        return jsonify({'error': 'Kunne ikke indlæse spørgsmålsanalyse'}), 500
+
+
+@student_bp.route('/stats/module/<module_id>/items', methods=['GET'])
+def get_module_item_analysis(module_id):
+    """Get difficulty, discrimination, item-total correlation and distractors per question of a module (for teachers)"""
+    try:
+        return jsonify({"module_id": module_id, **item_analysis.analyze_module(module_id)}), 200
+    except Exception as e:
+        logger.error(f"Error analyzing questions of module {module_id}: {str(e)}")
+        return jsonify({'error': 'Kunne ikke indlæse spørgsmålsanalyse'}), 500
+
+
 @student_bp.route('/student/<student_id>/quiz/<quiz_id>/latest', methods=['GET'])
 def get_student_latest_quiz_result(student_id, quiz_id):
     """Get the latest quiz result for a specific student and quiz"""
     try:
-        # Load student results
-        if not os.path.exists(STUDENT_DATA_PATH):
+        # Get only the newest result for this student and quiz
+        student_quiz_results = get_storage().get_quiz_results(
+            student_id=student_id, quiz_id=quiz_id, newest_first=True, limit=1
+        )
+        
+        if not student_quiz_results:
             return jsonify(None), 200
-
-        with open(STUDENT_DATA_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            # Filter results for this student and quiz
-            student_quiz_results = [
-                result for result in data.get('quiz_history', []) 
-                if result.get('quiz_id') == quiz_id and result.get('student_id') == student_id
-            ]
-            
-            if not student_quiz_results:
-                return jsonify(None), 200
-                
-            # Sort results by timestamp (newest first)
-            student_quiz_results.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            
-            # Return only the latest result
-            return jsonify(student_quiz_results[0]), 200
+        
+        # Return only the latest result
+        return jsonify(student_quiz_results[0]), 200
 
     except Exception as e:
         print(f"Error fetching student's latest quiz result: {str(e)}")
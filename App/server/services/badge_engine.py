@@ -0,0 +1,400 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from itertools import repeat
+
+from config.app_config import (
+    BADGE_RECHECK_CHUNK_SIZE,
+    BADGE_RECHECK_WORKERS,
+    DATABASE_FOLDER,
+    logger,
+)
+from services.badge_rules import COMPLETION_EVENT, RESULT_EVENT, get_badge_rules
+from storage.factory import get_storage
+from utils import file_helpers
+from utils.process_pool import spawn_process_pool
+
+BADGES_PATH = os.path.join(DATABASE_FOLDER, "badges.json")
+STUDENT_BADGES_PATH = os.path.join(DATABASE_FOLDER, "student_badges.json")
+QUIZ_COMPLETIONS_PATH = os.path.join(DATABASE_FOLDER, "quiz_completions.json")
+# Running aggregates per student, one record each (written through an event log)
+BADGE_PROGRESS_PATH = os.path.join(DATABASE_FOLDER, "badge_progress.json")
+
+# Bump when the layout of a progress record changes; older records are
+# rebuilt from the student's history on their next event
+PROGRESS_VERSION = 2
+
+
+def load_badges():
+    """Get the badge definitions"""
+    return file_helpers.load_json_file(BADGES_PATH, {"badges": []}).get("badges", [])
+
+
+def _is_current(progress, rules):
+    # Rebuilt when a badge was added that reads a metric not tracked yet
+    return progress.get("version") == PROGRESS_VERSION and set(rules.metrics) <= set(
+        progress.get("metrics", {})
+    )
+
+
+def new_progress(student_id, rules):
+    """
+    Create empty running aggregates for a student
+
+    Args:
+        student_id (str): ID of the student
+        rules (BadgeRules): Compiled badge rules, deciding which metrics to track
+
+    Returns:
+        dict: Progress record
+    """
+    return {
+        "student_id": student_id,
+        "version": PROGRESS_VERSION,
+        "metrics": rules.initial_states(),
+        "earned": [],
+        "pending": [],
+    }
+
+
+def apply_event(progress, rules, event, record):
+    """
+    Fold an event into a student's progress
+
+    The metrics whose value changed are marked pending, for evaluate_progress.
+    Completions must be applied in the order they happened.
+
+    Args:
+        progress (dict): Progress record, updated in place
+        rules (BadgeRules): Compiled badge rules
+        event (str): COMPLETION_EVENT or RESULT_EVENT
+        record (dict): Record from quiz_completions.json or student_results.json
+    """
+    changed = rules.apply(progress["metrics"], event, record)
+    if changed:
+        progress["pending"] = sorted(set(progress["pending"]) | changed)
+
+
+def build_progress(student_id, rules, completions=None, results=None, earned=None):
+    """
+    Compute a student's progress from their full history
+
+    Used the first time a student is seen, when the badge rules read metrics
+    the stored progress doesn't track, and for full re-checks. The history
+    is loaded unless given (see recheck_all_students).
+
+    Args:
+        student_id (str): ID of the student
+        rules (BadgeRules): Compiled badge rules
+        completions (list): The student's quiz completions
+        results (list): The student's quiz results
+        earned (iterable): IDs of the badges the student already has
+
+    Returns:
+        dict: Progress record, with every metric pending
+    """
+    progress = new_progress(student_id, rules)
+
+    if completions is None:
+        completions = [
+            completion
+            for completion in file_helpers.load_json_file(
+                QUIZ_COMPLETIONS_PATH, {"quiz_completions": []}
+            ).get("quiz_completions", [])
+            if completion.get("student_id") == student_id
+        ]
+    for completion in sorted(completions, key=lambda x: x.get("timestamp", "")):
+        apply_event(progress, rules, COMPLETION_EVENT, completion)
+
+    if results is None:
+        results = get_storage().get_quiz_results(student_id=student_id)
+    for result in results:
+        apply_event(progress, rules, RESULT_EVENT, result)
+
+    if earned is None:
+        earned = (
+            badge.get("badge_id")
+            for badge in file_helpers.load_json_file(
+                STUDENT_BADGES_PATH, {"student_badges": []}
+            ).get("student_badges", [])
+            if badge.get("student_id") == student_id
+        )
+    progress["earned"] = sorted(set(earned))
+    progress["pending"] = sorted(rules.metrics)
+    return progress
+
+
+def evaluate_progress(progress, rules, student_name):
+    """
+    Award the badges whose rules a student now meets
+
+    Only the rules reading a metric that changed since the last evaluation
+    are run. Earned badges are added to progress["earned"] and the pending
+    metrics cleared.
+
+    Args:
+        progress (dict): Progress record, updated in place
+        rules (BadgeRules): Compiled badge rules
+        student_name (str): Name to put on the awards
+
+    Returns:
+        list: New student badge records
+    """
+    earned = set(progress["earned"])
+    newly_earned = []
+
+    for compiled in rules.affected_by(progress["pending"]):
+        badge = compiled.badge
+        badge_id = badge.get("badge_id")
+        if badge_id in earned:
+            continue
+
+        met, context = compiled.check(progress["metrics"])
+        if met:
+            new_badge = {
+                "badge_id": badge_id,
+                "student_id": progress["student_id"],
+                "student_name": student_name,
+                "badge_name": badge.get("name"),
+                "badge_description": badge.get("description"),
+                "badge_icon": badge.get("icon"),
+                "earned_timestamp": datetime.now().isoformat(),
+            }
+            if context:
+                new_badge["context"] = context
+            newly_earned.append(new_badge)
+            earned.add(badge_id)
+
+    progress["earned"] = sorted(earned)
+    progress["pending"] = []
+    return newly_earned
+
+
+def _update_progress(student_id, update, evaluate_as=None, rebuild=False):
+    """
+    Atomically update a student's progress, rebuilding it from history when
+    it is missing or out of date
+
+    Args:
+        student_id (str): ID of the student
+        update (callable): Folds the event into the progress, given the
+            progress and the compiled rules (skipped when
+            the progress was rebuilt, as the history already holds the event)
+        evaluate_as (str): Student name to award badges under, or None to
+            only record the event
+        rebuild (bool): Always rebuild from history
+
+    Returns:
+        list: New student badge records
+    """
+    rules = get_badge_rules(load_badges())
+    newly_earned = []
+
+    def apply(existing):
+        if rebuild or existing is None or not _is_current(existing, rules):
+            progress = build_progress(student_id, rules)
+        else:
+            progress = existing
+            update(progress, rules)
+        newly_earned[:] = (
+            evaluate_progress(progress, rules, evaluate_as) if evaluate_as is not None else []
+        )
+        return progress
+
+    get_storage().upsert_record(
+        BADGE_PROGRESS_PATH, "students", {"student_id": student_id}, apply
+    )
+    return _award_many(newly_earned)
+
+
+def _award_many(newly_earned_badges):
+    """Save new student badge records in one write, skipping any already awarded"""
+    if not newly_earned_badges:
+        return []
+
+    def award(student_badges):
+        # Another request may have awarded the same badge meanwhile
+        awarded = {
+            (badge.get("student_id"), badge.get("badge_id"))
+            for badge in student_badges.setdefault("student_badges", [])
+        }
+        added = []
+        for badge in newly_earned_badges:
+            key = (badge["student_id"], badge["badge_id"])
+            if key not in awarded:
+                awarded.add(key)
+                added.append(badge)
+        student_badges["student_badges"].extend(added)
+        return added
+
+    return file_helpers.update_json_file(STUDENT_BADGES_PATH, award, {"student_badges": []})
+
+
+def record_completion(completion):
+    """
+    Update a student's progress with a quiz completion and award new badges
+
+    Costs O(badges): only the student's aggregates are read and written, and
+    only the rules reading a metric the completion changed are run.
+
+    Args:
+        completion (dict): Record just added to quiz_completions.json
+
+    Returns:
+        list: Newly earned student badge records
+    """
+    return _update_progress(
+        completion.get("student_id"),
+        lambda progress, rules: apply_event(progress, rules, COMPLETION_EVENT, completion),
+        evaluate_as=completion.get("student_name") or "Unknown",
+    )
+
+
+def record_result(result):
+    """
+    Update a student's progress with a saved quiz result
+
+    No badges are awarded here; the rules reading the metrics it changed are run
+    with the quiz completion that follows it (see record_completion), so
+    they are reported to the student together.
+
+    Args:
+        result (dict): Result as stored, with its attempt count
+    """
+    _update_progress(
+        result.get("student_id"),
+        lambda progress, rules: apply_event(progress, rules, RESULT_EVENT, result),
+    )
+
+
+def recheck_student(student_id, student_name):
+    """
+    Rebuild a student's progress from their full history and award any
+    badge they have earned
+
+    Args:
+        student_id (str): ID of the student
+        student_name (str): Name to put on the awards
+
+    Returns:
+        list: Newly earned student badge records
+    """
+    return _update_progress(student_id, None, evaluate_as=student_name, rebuild=True)
+
+
+def _recheck_chunk(badges, students):
+    """
+    Rebuild and evaluate the progress of some students (runs in a worker process)
+
+    Args:
+        badges (list): Badge definitions, compiled once per process
+        students (list): (student_id, student_name, completions, results,
+            earned badge IDs) per student
+
+    Returns:
+        list: (progress, newly earned student badge records) per student
+    """
+    rules = get_badge_rules(badges)
+    checked = []
+    for student_id, student_name, completions, results, earned in students:
+        progress = build_progress(student_id, rules, completions, results, earned)
+        checked.append((progress, evaluate_progress(progress, rules, student_name)))
+    return checked
+
+
+def recheck_all_students(students, workers=BADGE_RECHECK_WORKERS, chunk_size=BADGE_RECHECK_CHUNK_SIZE):
+    """
+    Rebuild every student's progress from their full history and award any
+    badge they have earned, in one batch
+
+    All history is loaded once and grouped by student in a single pass.
+    Students are evaluated in chunks by a pool of worker processes, and all
+    progress records and all new awards are then written in one save each.
+
+    Args:
+        students (list): (student_id, student_name) pairs
+        workers (int): Worker processes (1 evaluates in this process)
+        chunk_size (int): Students handed to a worker at a time
+
+    Returns:
+        tuple: (newly earned student badge records, report with timings
+            and throughput)
+    """
+    start = time.perf_counter()
+    badges = load_badges()
+
+    history = {student_id: ([], [], set()) for student_id, _ in students}
+    for completion in file_helpers.load_json_file(
+        QUIZ_COMPLETIONS_PATH, {"quiz_completions": []}
+    ).get("quiz_completions", []):
+        entry = history.get(completion.get("student_id"))
+        if entry is not None:
+            entry[0].append(completion)
+    for result in get_storage().get_quiz_results():
+        entry = history.get(result.get("student_id"))
+        if entry is not None:
+            entry[1].append(result)
+    for badge in file_helpers.load_json_file(
+        STUDENT_BADGES_PATH, {"student_badges": []}
+    ).get("student_badges", []):
+        entry = history.get(badge.get("student_id"))
+        if entry is not None:
+            entry[2].add(badge.get("badge_id"))
+
+    items = [(student_id, student_name, *history[student_id]) for student_id, student_name in students]
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    loaded = time.perf_counter()
+
+    workers = max(1, min(workers, len(chunks)))
+    checked = None
+    if workers > 1:
+        try:
+            with spawn_process_pool(workers) as pool:
+                checked = [
+                    entry
+                    for chunk_result in pool.map(_recheck_chunk, repeat(badges), chunks)
+                    for entry in chunk_result
+                ]
+        except BrokenProcessPool as e:
+            logger.warning(f"Badge recheck worker pool failed, evaluating in this process: {str(e)}")
+            workers = 1
+    if checked is None:
+        checked = [entry for chunk in chunks for entry in _recheck_chunk(badges, chunk)]
+    evaluated = time.perf_counter()
+
+    rebuilt = {progress["student_id"]: progress for progress, _ in checked}
+
+    def save_progress(data):
+        records = data.setdefault("students", [])
+        for i, record in enumerate(records):
+            student_id = record.get("student_id")
+            if student_id in rebuilt:
+                # An event recorded meanwhile only adds to the history, so
+                # keep the badges either version has seen as earned
+                progress = rebuilt.pop(student_id)
+                progress["earned"] = sorted(set(progress["earned"]) | set(record.get("earned", [])))
+                records[i] = progress
+        records.extend(rebuilt.values())
+
+    file_helpers.update_json_file(BADGE_PROGRESS_PATH, save_progress, {"students": []})
+
+    newly_earned = _award_many([badge for _, awarded in checked for badge in awarded])
+    finished = time.perf_counter()
+
+    elapsed = finished - start
+    report = {
+        "students": len(students),
+        "badges_awarded": len(newly_earned),
+        "workers": workers,
+        "load_seconds": round(loaded - start, 3),
+        "evaluate_seconds": round(evaluated - loaded, 3),
+        "save_seconds": round(finished - evaluated, 3),
+        "total_seconds": round(elapsed, 3),
+        "students_per_second": round(len(students) / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info(
+        f"Rechecked badges of {len(students)} students in {elapsed:.2f}s "
+        f"with {workers} worker(s), {len(newly_earned)} awarded"
+    )
+    return newly_earned, report
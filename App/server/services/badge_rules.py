@@ -0,0 +1,455 @@
+import json
+import operator
+import threading
+from datetime import datetime
+
+from config.app_config import logger
+
+# Kinds of events that update a student's metrics
+COMPLETION_EVENT = "completion"  # a record in quiz_completions.json
+RESULT_EVENT = "result"  # a saved attempt in student_results.json
+
+# Comparisons a rule can make against a metric's value
+COMPARISONS = {
+    "at_least": operator.ge,
+    "at_most": operator.le,
+    "more_than": operator.gt,
+    "less_than": operator.lt,
+    "equals": operator.eq,
+}
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO timestamp as a naive datetime, dropping any timezone
+
+    Args:
+        value (str): Timestamp, e.g. "2025-03-01T12:00:00Z"
+
+    Returns:
+        datetime: Parsed time (values that are already datetimes are returned as is)
+    """
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "").split("+")[0])
+    return value
+
+
+def result_duration(result):
+    """
+    Get how long a quiz attempt took
+
+    Args:
+        result (dict): Quiz result with start_timestamp and timestamp
+
+    Returns:
+        float: Seconds from start to finish, or None if unknown
+    """
+    start_timestamp = result.get("start_timestamp")
+    end_timestamp = result.get("timestamp")
+    if not start_timestamp or not end_timestamp:
+        return None
+    try:
+        return (parse_timestamp(end_timestamp) - parse_timestamp(start_timestamp)).total_seconds()
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Error parsing timestamps for quiz result: {e}")
+        return None
+
+
+def _score_percent(record):
+    total_questions = record.get("total_questions", 1)
+    if not total_questions:
+        return None
+    return (record.get("score", 0) / total_questions) * 100
+
+
+class Metric:
+    """
+    A running aggregate of one kind of event, kept per student
+
+    The state is stored as JSON in the student's progress record; update
+    folds one event into it. Rules compare value(state) against a number.
+    """
+
+    event = COMPLETION_EVENT
+    # Parameters a rule may set, with their defaults
+    params = {}
+
+    def initial(self, params):
+        return 0
+
+    def update(self, state, record, params):
+        """
+        Fold an event into the state
+
+        Args:
+            state: Current state
+            record (dict): The event's record
+            params (dict): The metric's parameters
+
+        Returns:
+            tuple: (new state, whether the value changed)
+        """
+        raise NotImplementedError
+
+    def value(self, state):
+        return state
+
+    def context(self, state):
+        """Details to store with an award (e.g. which quiz), or None"""
+        return None
+
+
+class CompletionCount(Metric):
+    """Number of quiz completions"""
+
+    def update(self, state, record, params):
+        return state + 1, True
+
+
+class PerfectScoreCount(Metric):
+    """Number of quiz completions with every question right"""
+
+    def update(self, state, record, params):
+        if record.get("score") == record.get("total_questions"):
+            return state + 1, True
+        return state, False
+
+
+class UniqueModules(Metric):
+    """Number of different modules with a completed quiz"""
+
+    def initial(self, params):
+        return []
+
+    def update(self, state, record, params):
+        module_id = record.get("module_id")
+        if module_id in state:
+            return state, False
+        return state + [module_id], True
+
+    def value(self, state):
+        return len(state)
+
+
+class BestStreak(Metric):
+    """Longest run of consecutive completions scoring at least min_score_percent"""
+
+    params = {"min_score_percent": 0}
+
+    def initial(self, params):
+        return {"current": 0, "best": 0}
+
+    def update(self, state, record, params):
+        if record.get("score_percent", 0) < params["min_score_percent"]:
+            return {"current": 0, "best": state["best"]}, False
+        current = state["current"] + 1
+        return {"current": current, "best": max(state["best"], current)}, current > state["best"]
+
+    def value(self, state):
+        return state["best"]
+
+
+class MaxAttempts(Metric):
+    """Most attempts at a single quiz"""
+
+    event = RESULT_EVENT
+
+    def initial(self, params):
+        return None
+
+    def update(self, state, record, params):
+        attempts = record.get("attempts", 1)
+        if not record.get("quiz_id") or (state is not None and attempts <= state["attempts"]):
+            return state, False
+        return {
+            "quiz_id": record.get("quiz_id"),
+            "quiz_title": record.get("quiz_title", "Unknown Quiz"),
+            "attempts": attempts,
+        }, True
+
+    def value(self, state):
+        return state["attempts"] if state else None
+
+    def context(self, state):
+        return dict(state) if state else None
+
+
+class FastestCompletion(Metric):
+    """Seconds taken by the fastest attempt scoring at least min_score_percent"""
+
+    event = RESULT_EVENT
+    params = {"min_score_percent": 80}
+
+    def initial(self, params):
+        return None
+
+    def update(self, state, record, params):
+        score_percent = _score_percent(record)
+        if score_percent is None or score_percent < params["min_score_percent"]:
+            return state, False
+        seconds = result_duration(record)
+        if seconds is None or (state is not None and seconds >= state["completion_time"]):
+            return state, False
+        return {
+            "quiz_id": record.get("quiz_id"),
+            "quiz_title": record.get("quiz_title", "Unknown Quiz"),
+            "completion_time": seconds,
+            "score_percent": score_percent,
+        }, True
+
+    def value(self, state):
+        return state["completion_time"] if state else None
+
+    def context(self, state):
+        return dict(state) if state else None
+
+
+# Metrics rules can refer to by name
+METRICS = {
+    "completions": CompletionCount(),
+    "perfect_scores": PerfectScoreCount(),
+    "unique_modules": UniqueModules(),
+    "best_streak": BestStreak(),
+    "max_attempts": MaxAttempts(),
+    "fastest_completion": FastestCompletion(),
+}
+
+
+def metric_key(name, params):
+    """Key of a metric with its parameters in progress records, e.g. "best_streak:min_score_percent=80" """
+    if not params:
+        return name
+    return name + ":" + ",".join(f"{param}={float(value):g}" for param, value in sorted(params.items()))
+
+
+def criteria_to_rule(criteria):
+    """
+    Translate the older "criteria" object of a badge into a rule
+
+    The criteria were alternatives: a badge was earned when any was met.
+
+    Args:
+        criteria (dict): e.g. {"quiz_streak": 3, "min_score_percent": 80}
+
+    Returns:
+        dict: Equivalent rule
+    """
+    rules = []
+    if "quiz_completions" in criteria:
+        rules.append({"metric": "completions", "at_least": criteria["quiz_completions"]})
+    if criteria.get("quiz_perfect_score") is True:
+        rules.append({"metric": "perfect_scores", "at_least": 1})
+    if "unique_module_completions" in criteria:
+        rules.append({"metric": "unique_modules", "at_least": criteria["unique_module_completions"]})
+    if "quiz_streak" in criteria:
+        rules.append(
+            {
+                "metric": "best_streak",
+                "min_score_percent": criteria.get("min_score_percent", 0),
+                "at_least": criteria["quiz_streak"],
+            }
+        )
+    if "same_quiz_attempts" in criteria:
+        rules.append({"metric": "max_attempts", "at_least": criteria["same_quiz_attempts"]})
+    if criteria.get("quick_completion") is True:
+        rules.append(
+            {
+                "metric": "fastest_completion",
+                "min_score_percent": criteria.get("min_score_percent", 80),
+                "at_most": criteria.get("max_seconds", 30),
+            }
+        )
+    return {"any": rules}
+
+
+def compile_rule(rule, metrics):
+    """
+    Compile a rule into a predicate over a student's metric states
+
+    A rule is either a comparison of one metric,
+
+        {"metric": "best_streak", "min_score_percent": 80, "at_least": 3}
+
+    (any keys besides "metric" and the comparison set the metric's
+    parameters), or a combination of rules: {"all": [...]}, {"any": [...]}
+    or {"not": rule}.
+
+    Args:
+        rule (dict): Rule from badges.json
+        metrics (dict): Filled with the metric keys the rule reads, mapped
+            to (metric, parameters)
+
+    Returns:
+        callable: Takes the metric states by key and returns (met, context)
+
+    Raises:
+        ValueError: If the rule is malformed
+    """
+    if not isinstance(rule, dict):
+        raise ValueError(f"A rule must be an object, got {rule!r}")
+
+    if "all" in rule or "any" in rule:
+        combine = all if "all" in rule else any
+        children = rule.get("all", rule.get("any"))
+        if not isinstance(children, list):
+            raise ValueError(f"'all' and 'any' take a list of rules, got {children!r}")
+        predicates = [compile_rule(child, metrics) for child in children]
+
+        def combined(states):
+            results = [predicate(states) for predicate in predicates]
+            context = {}
+            for met, child_context in results:
+                if met and child_context:
+                    context.update(child_context)
+            return combine(met for met, _ in results), context or None
+
+        return combined
+
+    if "not" in rule:
+        predicate = compile_rule(rule["not"], metrics)
+        return lambda states: (not predicate(states)[0], None)
+
+    name = rule.get("metric")
+    metric = METRICS.get(name)
+    if metric is None:
+        raise ValueError(f"Unknown metric {name!r} (known: {', '.join(METRICS)})")
+
+    comparisons = [key for key in rule if key in COMPARISONS]
+    if len(comparisons) != 1:
+        raise ValueError(f"A {name} rule needs exactly one of {', '.join(COMPARISONS)}")
+    compare = COMPARISONS[comparisons[0]]
+    target = rule[comparisons[0]]
+
+    params = dict(metric.params)
+    for param, value in rule.items():
+        if param in ("metric", comparisons[0]):
+            continue
+        if param not in metric.params:
+            raise ValueError(f"Unknown parameter {param!r} for metric {name}")
+        params[param] = value
+
+    key = metric_key(name, params)
+    metrics[key] = (metric, params)
+
+    def check(states):
+        state = states[key]
+        value = metric.value(state)
+        if value is None or not compare(value, target):
+            return False, None
+        return True, metric.context(state)
+
+    return check
+
+
+class CompiledBadge:
+    """A badge definition with its rule compiled"""
+
+    __slots__ = ("badge", "check", "metric_keys")
+
+    def __init__(self, badge, check, metric_keys):
+        self.badge = badge
+        self.check = check
+        self.metric_keys = metric_keys
+
+
+class BadgeRules:
+    """
+    Compiled rules of all badges, indexed by the metrics they read
+
+    Each metric is indexed under the event kind that updates it, and each
+    badge under the metrics its rule reads, so an event only leads to the
+    rules that read a metric the event changed.
+    """
+
+    def __init__(self, badges):
+        self.badges = []
+        self.metrics = {}
+        self._by_metric = {}
+
+        for position, badge in enumerate(badges):
+            rule = badge.get("rule")
+            if rule is None:
+                rule = criteria_to_rule(badge.get("criteria", {}))
+            metrics = {}
+            try:
+                check = compile_rule(rule, metrics)
+            except ValueError as e:
+                logger.error(f"Skipping badge {badge.get('badge_id')}: invalid rule: {str(e)}")
+                continue
+
+            compiled = CompiledBadge(badge, check, frozenset(metrics))
+            self.badges.append(compiled)
+            self.metrics.update(metrics)
+            for key in metrics:
+                self._by_metric.setdefault(key, []).append((position, compiled))
+
+        self.event_metrics = {COMPLETION_EVENT: [], RESULT_EVENT: []}
+        for key, (metric, _) in sorted(self.metrics.items()):
+            self.event_metrics[metric.event].append(key)
+
+    def initial_states(self):
+        """Metric states of a student without any history"""
+        return {key: metric.initial(params) for key, (metric, params) in self.metrics.items()}
+
+    def apply(self, states, event, record):
+        """
+        Fold an event into a student's metric states
+
+        Args:
+            states (dict): Metric states by key, updated in place
+            event (str): COMPLETION_EVENT or RESULT_EVENT
+            record (dict): The event's record
+
+        Returns:
+            set: Keys of the metrics whose value changed
+        """
+        changed = set()
+        for key in self.event_metrics[event]:
+            metric, params = self.metrics[key]
+            states[key], value_changed = metric.update(states[key], record, params)
+            if value_changed:
+                changed.add(key)
+        return changed
+
+    def affected_by(self, metric_keys):
+        """
+        Get the badges whose rules read any of some metrics
+
+        Args:
+            metric_keys (iterable): Keys of changed metrics
+
+        Returns:
+            list: CompiledBadge objects, in badges.json order
+        """
+        found = {}
+        for key in metric_keys:
+            for position, compiled in self._by_metric.get(key, ()):
+                found[position] = compiled
+        return [found[position] for position in sorted(found)]
+
+
+_compiled = None
+_compiled_source = None
+_compiled_lock = threading.Lock()
+
+
+def get_badge_rules(badges):
+    """
+    Get the compiled rules for badge definitions, compiling only when they changed
+
+    Args:
+        badges (list): Badge definitions from badges.json
+
+    Returns:
+        BadgeRules: Compiled rules
+    """
+    global _compiled, _compiled_source
+    source = json.dumps(badges, sort_keys=True)
+    with _compiled_lock:
+        if source != _compiled_source:
+            _compiled = BadgeRules(badges)
+            _compiled_source = source
+            logger.info(
+                f"Compiled {len(_compiled.badges)} badge rules over {len(_compiled.metrics)} metrics"
+            )
+        return _compiled
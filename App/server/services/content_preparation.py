@@ -0,0 +1,258 @@
+import re
+import math
+import heapq
+import textwrap
+import threading
+from collections import Counter
+
+from config.app_config import (
+    QUIZ_CONTENT_TOKENS,
+    QUIZ_MODEL_CONTENT_TOKENS,
+    TOKENIZER_ENCODING,
+    logger,
+)
+
+# Used when the tokenizer can't be loaded: roughly four characters per token
+CHARS_PER_TOKEN = 4
+
+# Characters of content used to measure its characters per token
+TOKEN_SAMPLE_CHARS = 20000
+
+# Lines this short that appear at least this often are page headers, footers
+# and similar boilerplate
+BOILERPLATE_MAX_CHARS = 80
+BOILERPLATE_MIN_REPEATS = 3
+
+# Unbroken text (e.g. a video transcript) is cut into sections of about this size
+SECTION_CHARS = 800
+
+WORD_PATTERN = re.compile(r"\w{3,}")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(
+                    f"Tokenizer unavailable ({str(e)}), estimating tokens from characters"
+                )
+        return _encoding
+
+
+def count_tokens(text):
+    """
+    Count the tokens in a text
+
+    Uses tiktoken when it is installed and its encoding can be loaded, and
+    estimates from the length otherwise. Ollama models have their own
+    tokenizers, so the count is an approximation either way.
+
+    Args:
+        text (str): Text to count
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def content_token_budget(model):
+    """
+    Get how many tokens of content a prompt for a model may carry
+
+    Args:
+        model (str): LLM model name
+
+    Returns:
+        int: Token budget for the content
+    """
+    return QUIZ_MODEL_CONTENT_TOKENS.get(model, QUIZ_CONTENT_TOKENS)
+
+
+def content_char_budget(model, text):
+    """
+    Estimate how many characters of a text fit a model's content token budget
+
+    The characters per token are measured on the start of the text, and a
+    tenth of the budget is kept spare for the text that follows being denser.
+
+    Args:
+        model (str): LLM model name
+        text (str): Content the estimate is for
+
+    Returns:
+        int: Number of characters
+    """
+    sample = text[:TOKEN_SAMPLE_CHARS]
+    tokens = count_tokens(sample) if sample else 0
+    chars_per_token = len(sample) / tokens if tokens else CHARS_PER_TOKEN
+    return max(1, int(content_token_budget(model) * chars_per_token * 0.9))
+
+
+def normalize_content(text):
+    """
+    Remove whitespace runs, repeated lines and boilerplate from content
+
+    Collapses runs of spaces and blank lines, drops a line identical to the
+    one before it, and drops short lines that repeat throughout the text
+    (page headers and footers, slide titles and so on). Page breaks (form
+    feeds) become paragraph breaks.
+
+    Args:
+        text (str): Content to clean up
+
+    Returns:
+        str: Normalized content
+    """
+    lines = [re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in text.splitlines()]
+
+    counts = Counter(line for line in lines if line and len(line) <= BOILERPLATE_MAX_CHARS)
+    boilerplate = {line for line, count in counts.items() if count >= BOILERPLATE_MIN_REPEATS}
+
+    kept = []
+    previous = None
+    for line in lines:
+        if line in boilerplate or (line and line == previous):
+            continue
+        # Keep at most one blank line in a row
+        if not line and (not kept or not kept[-1]):
+            continue
+        kept.append(line)
+        previous = line
+    return "\n".join(kept).strip()
+
+
+def split_sections(text):
+    """
+    Split content into sections: paragraphs, or groups of sentences when a
+    paragraph is long
+
+    Args:
+        text (str): Content to split
+
+    Returns:
+        list: Sections, in document order
+    """
+    sections = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= SECTION_CHARS * 2:
+            if paragraph:
+                sections.append(paragraph)
+            continue
+
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if len(sentence) > SECTION_CHARS * 2:
+                # No punctuation to split on, so split between words
+                pieces = textwrap.wrap(sentence, SECTION_CHARS)
+                sections.extend(([current] if current else []) + pieces[:-1])
+                current = ""
+                sentence = pieces[-1]
+            if current and len(current) + len(sentence) > SECTION_CHARS:
+                sections.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            sections.append(current)
+    return sections
+
+
+def select_informative_sections(text, max_tokens):
+    """
+    Shorten content to a token budget, keeping its most informative sections
+
+    The sections are picked greedily by how many not yet covered terms they
+    add per token, with terms weighted by how rare they are across the
+    content. This spreads the budget over all the topics in the text
+    instead of keeping only its beginning. The first section (usually the
+    title or introduction) is always kept, and the sections stay in their
+    original order.
+
+    Args:
+        text (str): Content to shorten
+        max_tokens (int): Token budget
+
+    Returns:
+        str: Content that fits the budget
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    sections = split_sections(text)
+    tokens = [count_tokens(section) for section in sections]
+    terms = [set(WORD_PATTERN.findall(section.lower())) for section in sections]
+
+    document_frequency = Counter(term for section_terms in terms for term in section_terms)
+    weight = {
+        term: math.log(len(sections) / frequency)
+        for term, frequency in document_frequency.items()
+    }
+
+    def gain(index, covered):
+        new_weight = sum(weight[term] for term in terms[index] if term not in covered)
+        return new_weight / max(tokens[index], 1)
+
+    selected = set()
+    covered = set()
+    used = 0
+    if sections and tokens[0] <= max_tokens:
+        selected.add(0)
+        covered |= terms[0]
+        used = tokens[0]
+
+    # Lazy greedy: a section's gain only shrinks as more terms are covered,
+    # so a stale gain that still tops the heap only needs refreshing
+    heap = [(-gain(i, covered), i) for i in range(len(sections)) if i not in selected]
+    heapq.heapify(heap)
+    while heap and used < max_tokens:
+        _, index = heapq.heappop(heap)
+        if used + tokens[index] > max_tokens:
+            continue
+        current = gain(index, covered)
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, index))
+            continue
+        selected.add(index)
+        covered |= terms[index]
+        used += tokens[index]
+
+    if not selected:
+        logger.warning(
+            f"Content cut to its first {max_tokens * CHARS_PER_TOKEN:,} characters "
+            f"to fit the content budget of {max_tokens} tokens"
+        )
+        return text[: max_tokens * CHARS_PER_TOKEN]
+
+    logger.warning(
+        f"Content cut to {len(selected)} of {len(sections)} sections "
+        f"({used} of {sum(tokens)} tokens) to fit the content budget"
+    )
+    return "\n\n".join(sections[i] for i in sorted(selected))
+
+
+def prepare_content(text, model):
+    """
+    Clean up content and fit it to the model's content token budget
+
+    Args:
+        text (str): Content for a quiz prompt
+        model (str): LLM model name
+
+    Returns:
+        str: Prepared content
+    """
+    return select_informative_sections(normalize_content(text), content_token_budget(model))
@@ -0,0 +1,295 @@
+import os
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are only limited within the process
+    fcntl = None
+
+from config.app_config import (
+    OLLAMA_MAX_CONCURRENT,
+    OLLAMA_MAX_QUEUE,
+    OLLAMA_QUEUE_TIMEOUT,
+    OLLAMA_SLOT_FOLDER,
+    logger,
+)
+
+# Seconds between checks for a slot freed by another process
+SLOT_POLL_INTERVAL = 0.25
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "bulk": PRIORITY_BULK}
+
+
+class SchedulerBusy(Exception):
+    """
+    Raised when a request can't be admitted to run on the LLM
+
+    Attributes:
+        retry_after (int): Seconds after which a retry is likely to succeed
+        status_code (int): HTTP status to answer with
+    """
+
+    status_code = 429
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeout(SchedulerBusy):
+    """Raised when a request waited past its deadline without getting a slot"""
+
+    status_code = 503
+
+
+class ProcessSlots:
+    """
+    A fixed number of slots shared by all processes on the machine
+
+    Each slot is a lock file held with flock(), so a slot is freed when its
+    holder releases it or dies. Files are opened lazily in each process, as
+    a lock taken on a file opened before fork() would be shared with the
+    parent. Not thread-safe: InferenceScheduler calls it under its lock.
+    """
+
+    def __init__(self, count, folder=OLLAMA_SLOT_FOLDER):
+        self.count = count
+        self.folder = folder
+        self._files = None
+        self._pid = None
+        self._held = set()
+
+    def _open(self):
+        if self._pid != os.getpid():
+            os.makedirs(self.folder, exist_ok=True)
+            self._files = [
+                open(os.path.join(self.folder, f"slot_{i}.lock"), "a+b") for i in range(self.count)
+            ]
+            self._pid = os.getpid()
+            self._held = set()
+        return self._files
+
+    def try_acquire(self):
+        """
+        Take a free slot without waiting
+
+        Returns:
+            int: Index of the slot, or None if all are taken
+        """
+        if fcntl is None:
+            free = [i for i in range(self.count) if i not in self._held]
+            if not free:
+                return None
+            self._held.add(free[0])
+            return free[0]
+
+        for i, file in enumerate(self._open()):
+            # A lock this process already holds would be granted again
+            if i in self._held:
+                continue
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue
+            self._held.add(i)
+            return i
+        return None
+
+    def release(self, index):
+        """Free a slot taken with try_acquire"""
+        self._held.discard(index)
+        if fcntl is not None:
+            fcntl.flock(self._files[index], fcntl.LOCK_UN)
+
+
+class _Waiter:
+    __slots__ = ("priority", "order")
+
+    def __init__(self, priority, order):
+        self.priority = priority
+        self.order = order
+
+    def __lt__(self, other):
+        return (self.priority, self.order) < (other.priority, other.order)
+
+
+class InferenceScheduler:
+    """
+    Limits how many generations run on Ollama at once
+
+    Up to max_concurrent requests run, counted across all server processes
+    on the machine (see ProcessSlots); the rest wait in this process's
+    queue, ordered by priority, then arrival. A request is refused straight
+    away when max_queue requests are already waiting in this process, and
+    gives up when it has waited longer than its deadline, so callers can
+    answer "busy" quickly instead of holding a worker until Ollama times
+    out. Priorities are only compared within a process.
+    """
+
+    def __init__(
+        self,
+        max_concurrent=OLLAMA_MAX_CONCURRENT,
+        max_queue=OLLAMA_MAX_QUEUE,
+        queue_timeout=OLLAMA_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = ProcessSlots(self.max_concurrent)
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._order = itertools.count()
+        self._running = 0
+        # Moving average of how long a generation holds its slot
+        self._average_seconds = None
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _retry_after(self):
+        average = self._average_seconds or 30.0
+        rounds = (len(self._waiting) + 1) / self.max_concurrent
+        return max(1, math.ceil(average * rounds))
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """
+        Wait for a slot to run a generation
+
+        Args:
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BULK
+            deadline (float): Seconds to wait at most (defaults to the
+                queue timeout)
+
+        Returns:
+            tuple: The slot and the time it was granted (pass it to release)
+
+        Raises:
+            SchedulerBusy: If the queue is full
+            QueueTimeout: If no slot became free before the deadline
+        """
+        timeout = self.queue_timeout if deadline is None else deadline
+        with self._condition:
+            if not self._waiting:
+                slot = self._slots.try_acquire()
+                if slot is not None:
+                    self._running += 1
+                    self.admitted += 1
+                    return slot, time.monotonic()
+
+            if len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                retry_after = self._retry_after()
+                logger.warning(f"LLM queue full ({len(self._waiting)} waiting), rejecting request")
+                raise SchedulerBusy("The quiz generator is busy, try again later", retry_after)
+
+            waiter = _Waiter(priority, next(self._order))
+            heapq.heappush(self._waiting, waiter)
+            end = time.monotonic() + timeout
+            while True:
+                # Only the front of the queue takes a slot; slots freed by
+                # other processes are noticed by polling
+                if self._waiting[0] is waiter:
+                    slot = self._slots.try_acquire()
+                    if slot is not None:
+                        heapq.heappop(self._waiting)
+                        self._running += 1
+                        # The next waiter is now at the front
+                        self._condition.notify_all()
+                        break
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(waiter)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                    self.timed_out += 1
+                    logger.warning(f"Request waited {timeout}s for the LLM, giving up")
+                    raise QueueTimeout(
+                        "Timed out waiting for the quiz generator, try again later",
+                        self._retry_after(),
+                    )
+                self._condition.wait(min(remaining, SLOT_POLL_INTERVAL))
+
+            self.admitted += 1
+            return slot, time.monotonic()
+
+    def try_acquire(self):
+        """
+        Take a slot only if one is free and no request is waiting for it
+
+        Used to run extra requests alongside one that already holds a slot.
+
+        Returns:
+            tuple: As from acquire, or None if no slot was free
+        """
+        with self._condition:
+            if self._waiting:
+                return None
+            slot = self._slots.try_acquire()
+            if slot is None:
+                return None
+            self._running += 1
+            self.admitted += 1
+            return slot, time.monotonic()
+
+    def release(self, granted):
+        """
+        Give back a slot obtained from acquire
+
+        Args:
+            granted (tuple): Value returned by acquire
+        """
+        slot, started = granted
+        elapsed = time.monotonic() - started
+        with self._condition:
+            self._slots.release(slot)
+            self._running -= 1
+            if self._average_seconds is None:
+                self._average_seconds = elapsed
+            else:
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * elapsed
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """
+        Hold a slot for the duration of a with block (see acquire)
+        """
+        granted = self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release(granted)
+
+    def stats(self):
+        """
+        Report running and queued requests
+
+        Returns:
+            dict: Occupancy and counters of this process
+        """
+        with self._condition:
+            return {
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "average_seconds": round(self._average_seconds, 3)
+                if self._average_seconds is not None
+                else None,
+            }
+
+
+# Shared scheduler for all generations on the local Ollama server
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,278 @@
+import threading
+from datetime import datetime
+
+from services import quiz_stats
+from storage.factory import get_storage
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")  # Imported on first analysis
+
+# Share of students in each of the upper and lower groups compared by the
+# discrimination index (the classical 27%)
+DISCRIMINATION_GROUP_FRACTION = 0.27
+
+# Analyses by (scope, id), each with the token of the statistics it was
+# computed from; a new result changes the token (see _token)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _round(values, digits=3):
+    # NaN (not enough data) becomes None in the response
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def _answer_text(answer):
+    value = answer.get("answer")
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def build_matrix(results, item_key):
+    """
+    Build the student x question correctness matrix of some quiz results
+
+    Args:
+        results (list): Stored quiz results (one per student and quiz)
+        item_key (callable): Gives the column key of an answer, given the
+            result and the answer
+
+    Returns:
+        dict: "students" and "items" (row and column keys), "questions"
+            (question text per item), "correct" (int8 matrix, 1 for a
+            correct answer), "answered" (bool matrix), and "wrong_items"
+            and "wrong_answers" (column and text of every wrong answer)
+    """
+    students = {}
+    items = {}
+    questions = []
+    rows, columns, correct = [], [], []
+    wrong_items, wrong_answers = [], []
+
+    for result in results:
+        row = students.setdefault(result.get("student_id"), len(students))
+        for answer in result.get("answers") or []:
+            key = item_key(result, answer)
+            column = items.get(key)
+            if column is None:
+                column = items[key] = len(items)
+                questions.append(answer.get("question"))
+            rows.append(row)
+            columns.append(column)
+            correct.append(bool(answer.get("correct")))
+            if not answer.get("correct"):
+                text = _answer_text(answer)
+                if text is not None:
+                    wrong_items.append(column)
+                    wrong_answers.append(text)
+
+    shape = (len(students), len(items))
+    correct_matrix = np.zeros(shape, dtype=np.int8)
+    answered = np.zeros(shape, dtype=bool)
+    # A repeated question in one result counts once, as its last answer
+    correct_matrix[rows, columns] = correct
+    answered[rows, columns] = True
+
+    return {
+        "students": list(students),
+        "items": list(items),
+        "questions": questions,
+        "correct": correct_matrix,
+        "answered": answered,
+        "wrong_items": np.asarray(wrong_items, dtype=np.intp),
+        "wrong_answers": wrong_answers,
+    }
+
+
+def _correlations(x, y, mask):
+    # Pearson correlation of each column of x with the same column of y,
+    # over the rows where mask is set
+    counts = mask.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.where(mask, x, 0).sum(axis=0) / counts
+        y_mean = np.where(mask, y, 0).sum(axis=0) / counts
+        x_dev = np.where(mask, x - x_mean, 0)
+        y_dev = np.where(mask, y - y_mean, 0)
+        spread = np.sqrt((x_dev**2).sum(axis=0) * (y_dev**2).sum(axis=0))
+        return np.where(spread > 0, (x_dev * y_dev).sum(axis=0) / spread, np.nan)
+
+
+def analyze_matrix(matrix):
+    """
+    Compute classical item statistics from a correctness matrix
+
+    Students are ranked by their share of correct answers, so in a module
+    students who took only some of the quizzes are compared fairly.
+
+    Args:
+        matrix (dict): Matrix from build_matrix
+
+    Returns:
+        dict: Per item arrays "answered", "difficulty" (share answering
+            correctly), "discrimination" (difficulty in the upper group
+            minus in the lower group), "item_total_correlation" (with the
+            student's score on the other items), and "distractors" (wrong
+            answers with their counts, per item)
+    """
+    correct = matrix["correct"].astype(float)
+    answered = matrix["answered"]
+    student_count, item_count = correct.shape
+
+    answered_count = answered.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difficulty = correct.sum(axis=0) / answered_count
+
+        # Score of each student on the other items, as a share correct
+        student_correct = correct.sum(axis=1, keepdims=True)
+        student_answered = answered.sum(axis=1, keepdims=True)
+        rest_score = (student_correct - correct) / (student_answered - 1)
+        rest_answered = answered & (student_answered > 1)
+        item_total_correlation = _correlations(correct, rest_score, rest_answered)
+
+        # Upper and lower groups by overall share correct
+        discrimination = np.full(item_count, np.nan)
+        group_size = int(np.ceil(student_count * DISCRIMINATION_GROUP_FRACTION))
+        if student_count >= 2 and group_size:
+            group_size = min(group_size, student_count // 2)
+            order = np.argsort(-(student_correct[:, 0] / np.maximum(student_answered[:, 0], 1)), kind="stable")
+            upper, lower = order[:group_size], order[-group_size:]
+            discrimination = (
+                correct[upper].sum(axis=0) / answered[upper].sum(axis=0)
+                - correct[lower].sum(axis=0) / answered[lower].sum(axis=0)
+            )
+
+    # Wrong answers counted per (item, answer text) pair in one pass
+    distractors = [[] for _ in range(item_count)]
+    if matrix["wrong_answers"]:
+        texts, codes = np.unique(np.asarray(matrix["wrong_answers"], dtype=object).astype(str), return_inverse=True)
+        pairs, counts = np.unique(matrix["wrong_items"] * len(texts) + codes, return_counts=True)
+        for pair, count in zip(pairs.tolist(), counts.tolist()):
+            item, code = divmod(pair, len(texts))
+            distractors[item].append(
+                {"answer": str(texts[code]), "count": count, "rate": round(count / int(answered_count[item]), 3)}
+            )
+        for item_distractors in distractors:
+            item_distractors.sort(key=lambda d: -d["count"])
+
+    return {
+        "answered": answered_count,
+        "difficulty": difficulty,
+        "discrimination": discrimination,
+        "item_total_correlation": item_total_correlation,
+        "distractors": distractors,
+    }
+
+
+def _report(matrix, analysis, item_fields):
+    items = []
+    columns = zip(
+        matrix["items"],
+        matrix["questions"],
+        analysis["answered"].tolist(),
+        _round(analysis["difficulty"]),
+        _round(analysis["discrimination"]),
+        _round(analysis["item_total_correlation"]),
+        analysis["distractors"],
+    )
+    for key, question, answered, difficulty, discrimination, correlation, distractors in columns:
+        items.append(
+            {
+                **item_fields(key),
+                "question": question,
+                "answered": answered,
+                "difficulty": difficulty,
+                "discrimination": discrimination,
+                "item_total_correlation": correlation,
+                "distractors": distractors,
+            }
+        )
+    return {
+        "students": len(matrix["students"]),
+        "items": items,
+        "computed": datetime.now().isoformat(),
+    }
+
+
+def _token(quiz_ids):
+    # Changes whenever a result is saved for one of the quizzes, as their
+    # statistics are updated with every result (see quiz_stats.record_result);
+    # get_quiz_stats only reads the stored record, it never builds one
+    token = []
+    for quiz_id in quiz_ids:
+        stats = quiz_stats.get_quiz_stats(quiz_id)
+        token.append((quiz_id, stats["attempts"], stats["updated"]) if stats else (quiz_id, None, None))
+    return tuple(token)
+
+
+def _cached(key, quiz_ids, compute):
+    # The token is read before the results, so a result saved meanwhile
+    # makes the next request recompute rather than being missed
+    token = _token(quiz_ids)
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None and entry[0] == token:
+        return entry[1]
+    report = compute()
+    with _cache_lock:
+        _cache[key] = (token, report)
+    return report
+
+
+def analyze_quiz(quiz_id):
+    """
+    Get difficulty, discrimination, item-total correlation and distractors
+    for every question of a quiz
+
+    Computed from each student's latest result, the same results the
+    per question correctness of quiz_stats counts, so difficulty here is
+    the correct_rate of /stats/quiz/<id>. Cached until a new result is
+    saved for the quiz.
+
+    Args:
+        quiz_id (str): ID of the quiz
+
+    Returns:
+        dict: Number of students and per question statistics
+    """
+
+    def compute():
+        matrix = build_matrix(
+            get_storage().get_quiz_results(quiz_id=quiz_id),
+            lambda result, answer: str(answer.get("question_id")),
+        )
+        return _report(matrix, analyze_matrix(matrix), lambda key: {"question_id": key})
+
+    return _cached((quiz_stats.QUIZ_SCOPE, quiz_id), [quiz_id], compute)
+
+
+def analyze_module(module_id):
+    """
+    Get the item statistics of every question in a module's quizzes, with
+    students ranked across all of them
+
+    Computed from each student's latest result of each quiz, and cached
+    until a new result is saved for one of the module's quizzes.
+
+    Args:
+        module_id (str): ID of the module
+
+    Returns:
+        dict: Number of students and per question statistics
+    """
+    quiz_ids = quiz_stats.module_quizzes(module_id)
+
+    def compute():
+        storage = get_storage()
+        results = [result for quiz_id in quiz_ids for result in storage.get_quiz_results(quiz_id=quiz_id)]
+        matrix = build_matrix(
+            results,
+            lambda result, answer: (result.get("quiz_id"), str(answer.get("question_id"))),
+        )
+        return _report(
+            matrix,
+            analyze_matrix(matrix),
+            lambda key: {"quiz_id": key[0], "question_id": key[1]},
+        )
+
+    return _cached((quiz_stats.MODULE_SCOPE, module_id), quiz_ids, compute)
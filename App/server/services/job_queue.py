@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config.app_config import (
+    JOBS_FOLDER,
+    UPLOAD_JOB_MAX_PENDING,
+    UPLOAD_JOB_TTL,
+    UPLOAD_JOB_WORKERS,
+    logger,
+)
+from storage.json_backend import write_json_atomic
+
+
+class JobQueueFull(Exception):
+    """Raised when a job would exceed the number of tasks allowed to queue"""
+
+
+class Job:
+    """
+    A named batch of tasks whose results are collected as they finish
+
+    Each task is one item (e.g. one uploaded file). Items run independently,
+    so a job reports partial results while others are still running. When
+    the last item finishes, finalize turns the item results into the job's
+    result.
+    """
+
+    def __init__(self, kind, items, finalize=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.items = [
+            {"name": name, "status": "queued", "result": None, "error": None}
+            for name, _ in items
+        ]
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._finalize = finalize
+        self._remaining = len(items)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def to_dict(self):
+        with self._lock:
+            finished = sum(item["status"] in ("completed", "failed") for item in self.items)
+            return {
+                "jobId": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": {"completed": finished, "total": len(self.items)},
+                "items": [dict(item) for item in self.items],
+                "result": self.result,
+                "error": self.error,
+                "createdAt": self.created_at,
+                "finishedAt": self.finished_at,
+            }
+
+    def wait(self, timeout=None):
+        """
+        Block until every item has finished
+
+        Args:
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            bool: True if the job finished
+        """
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+class JobQueue:
+    """
+    Runs job items on a bounded thread pool and keeps their status
+
+    Job status lives in memory and is mirrored to JOBS_FOLDER, so a job can
+    be polled from any server process. Finished jobs are dropped after
+    UPLOAD_JOB_TTL seconds.
+    """
+
+    def __init__(
+        self,
+        max_workers=UPLOAD_JOB_WORKERS,
+        max_pending=UPLOAD_JOB_MAX_PENDING,
+        ttl=UPLOAD_JOB_TTL,
+        folder=JOBS_FOLDER,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.folder = folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, items, finalize=None):
+        """
+        Queue a job
+
+        Args:
+            kind (str): Type of job, reported to pollers (e.g. "upload")
+            items (list): (name, callable) pairs; each callable returns the
+                item's result
+            finalize (callable): Receives the list of items (with their
+                status, result and error) and returns the job's result
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            JobQueueFull: If too many items are already waiting
+        """
+        self._prune()
+        with self._lock:
+            if self._pending + len(items) > self.max_pending:
+                raise JobQueueFull(
+                    f"Too many queued tasks ({self._pending}), try again later"
+                )
+            self._pending += len(items)
+
+            job = Job(kind, items, finalize)
+            self._jobs[job.id] = job
+
+        self._persist(job)
+        for index, (_, task) in enumerate(items):
+            self._executor.submit(self._run_item, job, index, task)
+        if not items:
+            self._finish(job)
+        return job
+
+    def _run_item(self, job, index, task):
+        item = job.items[index]
+        with job._lock:
+            item["status"] = "running"
+            if job.status == "queued":
+                job.status = "running"
+        self._persist(job)
+
+        try:
+            result = task()
+            with job._lock:
+                item["result"] = result
+                item["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Job {job.id} item {item['name']} failed: {str(e)}")
+            with job._lock:
+                item["error"] = str(e)
+                item["status"] = "failed"
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        with job._lock:
+            job._remaining -= 1
+            last = job._remaining == 0
+        if last:
+            self._finish(job)
+        else:
+            self._persist(job)
+
+    def _finish(self, job):
+        try:
+            result = job._finalize(job.to_dict()["items"]) if job._finalize else None
+            with job._lock:
+                job.result = result
+                job.status = "completed"
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            with job._lock:
+                job.error = str(e)
+                job.status = "failed"
+        with job._lock:
+            job.finished_at = time.time()
+        self._persist(job)
+        job._done.set()
+
+    def _job_path(self, job_id):
+        return os.path.join(self.folder, f"{job_id}.json")
+
+    def _persist(self, job):
+        try:
+            write_json_atomic(self._job_path(job.id), job.to_dict(), indent=None)
+        except Exception as e:
+            logger.warning(f"Could not save status of job {job.id}: {str(e)}")
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+        # Also sweeps up jobs left behind by other (or earlier) processes
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return
+        for entry in entries:
+            job_id = entry.name[: -len(".json")]
+            if not entry.name.endswith(".json") or job_id in self._jobs:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get(self, job_id):
+        """
+        Get the status of a job
+
+        Args:
+            job_id (str): ID returned when the job was submitted
+
+        Returns:
+            dict: Job status, or None if the job is unknown or expired
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        # Submitted by another server process
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._job_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self):
+        """
+        Report queue occupancy
+
+        Returns:
+            dict: Worker count, queued tasks and jobs by status
+        """
+        with self._lock:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {
+                "workers": self.max_workers,
+                "pending_tasks": self._pending,
+                "max_pending": self.max_pending,
+                "jobs": by_status,
+            }
+
+
+# Shared queue for upload processing
+job_queue = JobQueue()
@@ -0,0 +1,347 @@
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.app_config import (
+    OLLAMA_API,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_RETRY_BACKOFF,
+    logger,
+)
+
+# Responses worth retrying: Ollama is restarting, loading a model or overloaded
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Number of recent calls kept for the latency percentiles
+LATENCY_WINDOW = 200
+
+
+class OllamaError(RuntimeError):
+    """Raised when Ollama answers with an error status or an error message"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _CallStats:
+    """Counters and recent latencies for one kind of call"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95),
+            "max_seconds": round(ordered[-1], 3) if ordered else None,
+        }
+
+
+class OllamaClient:
+    """
+    Shared connection to the Ollama API
+
+    Synchronous calls go through one requests.Session whose connection pool
+    keeps up to max_connections connections alive, so repeated generations
+    don't pay for a new TCP connection each time. Connection failures and
+    "busy" responses are retried with exponential backoff; a generation that
+    times out while reading is not, as it may still be running in Ollama.
+    generate_many sends several prompts at once from one thread using an
+    httpx async client (httpx is only needed if it is used).
+    """
+
+    def __init__(
+        self,
+        api_url=OLLAMA_API,
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        max_retries=OLLAMA_MAX_RETRIES,
+        retry_backoff=OLLAMA_RETRY_BACKOFF,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=OLLAMA_READ_TIMEOUT,
+    ):
+        self.api_url = api_url
+        self.max_connections = max(1, max_connections)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self._session = None
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                retry = Retry(
+                    total=self.max_retries,
+                    connect=self.max_retries,
+                    read=0,
+                    status=self.max_retries,
+                    backoff_factor=self.retry_backoff,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset({"POST"}),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.max_connections,
+                    pool_block=True,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def _record(self, kind, seconds, ok):
+        with self._lock:
+            stats = self._stats.setdefault(kind, _CallStats())
+            stats.calls += 1
+            if not ok:
+                stats.errors += 1
+            stats.latencies.append(seconds)
+
+    @staticmethod
+    def _payload(model, prompt, stream, options):
+        payload = {"model": model, "prompt": prompt, "stream": stream}
+        if options:
+            payload["options"] = options
+        return payload
+
+    def generate(self, model, prompt, options=None):
+        """
+        Run a generation and wait for the whole response
+
+        Args:
+            model (str): Ollama model name
+            prompt (str): Prompt text
+            options (dict): Ollama model options (e.g. temperature)
+
+        Returns:
+            dict: Ollama's response ("response" holds the generated text)
+
+        Raises:
+            OllamaError: If Ollama returns an error status
+            requests.exceptions.RequestException: If Ollama can't be reached
+                or doesn't answer in time
+        """
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(
+                self.api_url,
+                json=self._payload(model, prompt, False, options),
+                timeout=self.timeout,
+            )
+            if response.status_code != 200:
+                logger.error(f"Error from Ollama API: {response.status_code}")
+                logger.error(response.text)
+                raise OllamaError(
+                    f"Ollama API returned status {response.status_code}",
+                    response.status_code,
+                )
+            result = response.json()
+            ok = True
+            return result
+        finally:
+            self._record("generate", time.perf_counter() - start, ok)
+
+    def stream(self, model, prompt, options=None):
+        """
+        Run a generation, yielding Ollama's messages as they arrive
+
+        The read timeout applies between messages, not to the whole
+        generation.
+
+        Args:
+            model (str): Ollama model name
+            prompt (str): Prompt text
+            options (dict): Ollama model options (e.g. temperature)
+
+        Yields:
+            dict: One message per line; "response" holds the next piece of
+                text and the last message has "done" set
+
+        Raises:
+            OllamaError: If Ollama returns an error status or message
+            requests.exceptions.RequestException: If Ollama can't be reached
+                or stops sending
+        """
+        start = time.perf_counter()
+        first_token = None
+        ok = False
+        try:
+            with self.session.post(
+                self.api_url,
+                json=self._payload(model, prompt, True, options),
+                stream=True,
+                timeout=self.timeout,
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(f"Error from Ollama API: {response.status_code}")
+                    logger.error(response.text)
+                    raise OllamaError(
+                        f"Ollama API returned status {response.status_code}",
+                        response.status_code,
+                    )
+
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise OllamaError(message["error"])
+                    if first_token is None and message.get("response"):
+                        first_token = time.perf_counter() - start
+                    yield message
+                    if message.get("done"):
+                        break
+            ok = True
+        finally:
+            self._record("stream", time.perf_counter() - start, ok)
+            if first_token is not None:
+                self._record("stream_first_token", first_token, True)
+
+    async def agenerate(self, client, model, prompt, options=None):
+        """
+        Run a generation on an httpx.AsyncClient from async_client()
+
+        Args:
+            client: Client returned by async_client()
+            model (str): Ollama model name
+            prompt (str): Prompt text
+            options (dict): Ollama model options (e.g. temperature)
+
+        Returns:
+            dict: Ollama's response ("response" holds the generated text)
+
+        Raises:
+            OllamaError: If Ollama returns an error status
+            httpx.HTTPError: If Ollama can't be reached or doesn't answer in time
+        """
+        start = time.perf_counter()
+        ok = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = await client.post(
+                    self.api_url, json=self._payload(model, prompt, False, options)
+                )
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    break
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+            if response.status_code != 200:
+                logger.error(f"Error from Ollama API: {response.status_code}")
+                logger.error(response.text)
+                raise OllamaError(
+                    f"Ollama API returned status {response.status_code}",
+                    response.status_code,
+                )
+            result = response.json()
+            ok = True
+            return result
+        finally:
+            self._record("generate_async", time.perf_counter() - start, ok)
+
+    def async_client(self):
+        """
+        Create an httpx.AsyncClient with this client's limits and timeouts
+
+        The client belongs to the running event loop, so use it as an async
+        context manager inside that loop.
+
+        Returns:
+            httpx.AsyncClient: New async client
+        """
+        import httpx
+
+        connect_timeout, read_timeout = self.timeout
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # Retries connection failures; busy statuses are retried in agenerate
+            transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+        )
+
+    def generate_many(self, model, prompts, options=None, concurrency=None):
+        """
+        Run several generations concurrently without a thread per request
+
+        Args:
+            model (str): Ollama model name
+            prompts (list): Prompt texts
+            options (dict): Ollama model options (e.g. temperature)
+            concurrency (int): Requests in flight at once (defaults to
+                max_connections)
+
+        Returns:
+            list: Ollama's response for each prompt, in order, or the
+                exception raised for it
+        """
+        async def run_all():
+            limit = asyncio.Semaphore(concurrency or self.max_connections)
+            async with self.async_client() as client:
+
+                async def run_one(prompt):
+                    async with limit:
+                        return await self.agenerate(client, model, prompt, options)
+
+                return await asyncio.gather(
+                    *(run_one(prompt) for prompt in prompts), return_exceptions=True
+                )
+
+        return asyncio.run(run_all())
+
+    def stats(self):
+        """
+        Report call counts, errors and latency percentiles
+
+        Returns:
+            dict: Statistics per kind of call
+        """
+        with self._lock:
+            return {
+                "api_url": self.api_url,
+                "max_connections": self.max_connections,
+                "max_retries": self.max_retries,
+                "calls": {kind: stats.to_dict() for kind, stats in self._stats.items()},
+            }
+
+    def close(self):
+        """
+        Close the pooled connections
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Shared client for all calls to Ollama
+ollama_client = OllamaClient()
@@ -1,34 +1,54 @@
+import re
+import math
 import requests
 import logging
-from config.app_config import logger, OLLAMA_API
 
-
-def generate_quiz_with_ollama(
+from config.app_config import (
+    logger,
+    QUIZ_CACHE_FOLDER,
+    QUIZ_CACHE_MAX_BYTES,
+    QUIZ_CACHE_TTL,
+    QUIZ_GENERATION_CONCURRENCY,
+    QUIZ_MAX_CONTENT_CHARS,
+)
+from services.content_preparation import content_char_budget, normalize_content, prepare_content
+from services.inference_scheduler import PRIORITY_INTERACTIVE, SchedulerBusy, inference_scheduler
+from services.ollama_client import OllamaError, ollama_client
+from services.quiz_parsing import build_quiz, parse_quiz
+from utils.disk_cache import DiskCache, make_cache_key
+from utils.single_flight import SingleFlight
+
+# Raw LLM output per prompt, so regenerating the same quiz is instant
+quiz_cache = DiskCache(
+    QUIZ_CACHE_FOLDER, QUIZ_CACHE_MAX_BYTES, ttl=QUIZ_CACHE_TTL or None, name="quiz cache"
+)
+
+# Generations currently running, keyed like the cache
+in_flight_quizzes = SingleFlight(name="quiz generation")
+
+
+def build_quiz_prompt(
     content,
     num_questions=5,
-    model="llama3.1:8b-instruct-q4_0",
     question_type="multipleChoice",
     additional_instructions="",
 ):
     """
-    Generate a quiz using Ollama's Mistral model
+    Build the prompt asking the LLM for a quiz in the format parse_quiz reads
 
     Args:
         content (str): Content to base the quiz on
         num_questions (int): Number of questions to generate
-        model (str): LLM model to use
         question_type (str): Type of questions (multipleChoice, trueFalse, shortAnswer, flashcards)
         additional_instructions (str): Additional instructions for the LLM
 
     Returns:
-        str: Raw quiz text generated by the LLM
+        str: The prompt
     """
-    logger.info("Starting quiz generation with Ollama")
-
     # Limit content length for token constraints
-    if len(content) > 128000:
-        logger.warning("Content too long, truncating to 128,000 characters")
-        content = content[:128000]
+    if len(content) > QUIZ_MAX_CONTENT_CHARS:
+        logger.warning(f"Content too long, truncating to {QUIZ_MAX_CONTENT_CHARS:,} characters")
+        content = content[:QUIZ_MAX_CONTENT_CHARS]
 
     # Adjust prompt based on question type
     if question_type == "multipleChoice":
@@ -134,38 +154,434 @@ def generate_quiz_with_ollama(
     if additional_instructions:
         format_instructions += f"\n\nAdditional instructions: {additional_instructions}"
 
-    # Prepare payload for Ollama API
-    payload = {"model": model, "prompt": format_instructions, "stream": False}
+    return format_instructions
 
+
+def generate_quiz_with_ollama(
+    content,
+    num_questions=5,
+    model="llama3.1:8b-instruct-q4_0",
+    question_type="multipleChoice",
+    additional_instructions="",
+    options=None,
+    use_cache=True,
+    priority=PRIORITY_INTERACTIVE,
+):
+    """
+    Generate a quiz using Ollama's Mistral model
+
+    The content is cleaned up and cut to the model's token budget first
+    (see prepare_content). Responses are cached by model, prompt and
+    options, so the same request is answered from the cache until the entry
+    expires. Identical requests made while one is already running wait for
+    it instead of running the model again.
+
+    Args:
+        content (str): Content to base the quiz on
+        num_questions (int): Number of questions to generate
+        model (str): LLM model to use
+        question_type (str): Type of questions (multipleChoice, trueFalse, shortAnswer, flashcards)
+        additional_instructions (str): Additional instructions for the LLM
+        options (dict): Ollama model options (e.g. seed, temperature)
+        use_cache (bool): Look the response up in the cache first; False
+            always runs the model (the new response is still cached)
+        priority (int): Scheduling priority (see inference_scheduler)
+
+    Returns:
+        str: Raw quiz text generated by the LLM
+
+    Raises:
+        SchedulerBusy: If Ollama is too busy to take the request
+    """
+    logger.info("Starting quiz generation with Ollama")
+
+    format_instructions, cache_key = _quiz_request(
+        content, num_questions, model, question_type, additional_instructions, options
+    )
+    if use_cache:
+        cached = quiz_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached Ollama response")
+            return cached
+
+    # Identical requests arriving while this one runs share its result
+    return in_flight_quizzes.do(
+        cache_key,
+        lambda: _run_quiz_prompt(model, format_instructions, options, cache_key, priority),
+    )
+
+
+def _quiz_request(content, num_questions, model, question_type, additional_instructions, options=None):
+    # Prompt for a quiz and the key its response is cached under
+    content = prepare_content(content, model)
+    prompt = build_quiz_prompt(content, num_questions, question_type, additional_instructions)
+    # The prompt already contains the instructions (and so the language)
+    cache_key = make_cache_key("quiz", model, prompt, question_type, int(num_questions), options)
+    return prompt, cache_key
+
+
+def _log_response(response_json):
+    raw_quiz = response_json.get("response", "No response received.")
+
+    # Log the complete response
+    logger.info("Ollama raw response:")
+    logger.info(raw_quiz)
+
+    # Also log information about tokens
+    if "eval_count" in response_json:
+        logger.info(f"Tokens used: {response_json.get('eval_count')}")
+    if "eval_duration" in response_json:
+        logger.info(f"Generation time: {response_json.get('eval_duration')}ns")
+    return raw_quiz
+
+
+def _run_quiz_prompt(model, prompt, options, cache_key, priority):
+    # Send a quiz prompt to Ollama and cache the response; None on failure
     try:
-        # Add timeout to the Ollama API call
-        response = requests.post(
-            OLLAMA_API, json=payload, timeout=300
-        )  # 5-minute timeout
-
-        if response.status_code == 200:
-            # Get the full response
-            response_json = response.json()
-            raw_quiz = response_json.get("response", "No response received.")
-
-            # Log the complete response
-            logger.info("Ollama raw response:")
-            logger.info(raw_quiz)
-
-            # Also log information about tokens
-            if "eval_count" in response_json:
-                logger.info(f"Tokens used: {response_json.get('eval_count')}")
-            if "eval_duration" in response_json:
-                logger.info(f"Generation time: {response_json.get('eval_duration')}ns")
-
-            return raw_quiz
-        else:
-            logger.error(f"Error from Ollama API: {response.status_code}")
-            logger.error(response.text)
-            return None
+        with inference_scheduler.slot(priority):
+            response_json = ollama_client.generate(model, prompt, options)
+        raw_quiz = _log_response(response_json)
+
+        if raw_quiz.strip():
+            quiz_cache.set(cache_key, raw_quiz)
+        return raw_quiz
+    except SchedulerBusy:
+        raise
+    except OllamaError:
+        return None
     except requests.exceptions.Timeout:
         logger.error("Timeout while calling Ollama API")
         return None
     except Exception as e:
         logger.error(f"Exception when calling Ollama API: {e}")
         return None
+
+
+def _run_quiz_prompts(model, prompts, max_workers, priority):
+    """
+    Send several quiz prompts to Ollama concurrently and cache the responses
+
+    The prompts run on the async client (see OllamaClient.generate_many),
+    as many at once as scheduler slots could be had: one is waited for and
+    up to max_workers - 1 more are taken if free.
+
+    Args:
+        model (str): LLM model to use
+        prompts (list): (prompt, cache key) pairs
+        max_workers (int): Maximum prompts in flight at once
+        priority (int): Scheduling priority (see inference_scheduler)
+
+    Returns:
+        list: Raw quiz text for each prompt, or None where it failed
+
+    Raises:
+        SchedulerBusy: If Ollama is too busy to take the request
+    """
+    granted = [inference_scheduler.acquire(priority)]
+    try:
+        while len(granted) < min(max(1, max_workers), len(prompts)):
+            extra = inference_scheduler.try_acquire()
+            if extra is None:
+                break
+            granted.append(extra)
+        logger.info(f"Sending {len(prompts)} quiz prompts to Ollama, {len(granted)} at a time")
+        responses = ollama_client.generate_many(
+            model, [prompt for prompt, _ in prompts], concurrency=len(granted)
+        )
+    finally:
+        for slot in granted:
+            inference_scheduler.release(slot)
+
+    raw_quizzes = []
+    for (_, cache_key), response in zip(prompts, responses):
+        if isinstance(response, OllamaError):
+            raw_quizzes.append(None)
+        elif isinstance(response, BaseException):
+            logger.error(f"Exception when calling Ollama API: {response!r}")
+            raw_quizzes.append(None)
+        else:
+            raw_quiz = _log_response(response)
+            if raw_quiz.strip():
+                quiz_cache.set(cache_key, raw_quiz)
+            raw_quizzes.append(raw_quiz)
+    return raw_quizzes
+
+
+def stream_quiz_with_ollama(
+    content,
+    num_questions=5,
+    model="llama3.1:8b-instruct-q4_0",
+    question_type="multipleChoice",
+    additional_instructions="",
+):
+    """
+    Generate a quiz with Ollama, yielding the text as it is produced
+
+    The caller should hold an inference_scheduler slot while iterating.
+
+    Args:
+        content (str): Content to base the quiz on
+        num_questions (int): Number of questions to generate
+        model (str): LLM model to use
+        question_type (str): Type of questions (multipleChoice, trueFalse, shortAnswer, flashcards)
+        additional_instructions (str): Additional instructions for the LLM
+
+    Yields:
+        str: Fragments of the raw quiz text
+
+    Raises:
+        OllamaError: If Ollama reports an error
+        requests.exceptions.RequestException: If Ollama can't be reached or
+            stops sending tokens for OLLAMA_READ_TIMEOUT seconds
+    """
+    logger.info("Starting streaming quiz generation with Ollama")
+
+    content = prepare_content(content, model)
+    format_instructions = build_quiz_prompt(
+        content, num_questions, question_type, additional_instructions
+    )
+
+    for message in ollama_client.stream(model, format_instructions):
+        if message.get("response"):
+            yield message["response"]
+        if message.get("done"):
+            if "eval_count" in message:
+                logger.info(f"Tokens used: {message.get('eval_count')}")
+            if "eval_duration" in message:
+                logger.info(f"Generation time: {message.get('eval_duration')}ns")
+
+
+def _split_long_paragraph(paragraph, max_chars):
+    # Prefer sentence ends, then line breaks, and only cut words as a last resort
+    pieces = []
+    while len(paragraph) > max_chars:
+        window = paragraph[:max_chars]
+        cut = max(window.rfind(". "), window.rfind("! "), window.rfind("? "))
+        if cut < max_chars // 2:
+            cut = window.rfind("\n")
+        if cut < max_chars // 2:
+            cut = window.rfind(" ")
+        if cut < max_chars // 2:
+            cut = max_chars - 1
+        pieces.append(paragraph[: cut + 1].strip())
+        paragraph = paragraph[cut + 1 :]
+    if paragraph.strip():
+        pieces.append(paragraph.strip())
+    return pieces
+
+
+def split_content_into_chunks(content, max_chars):
+    """
+    Split content into chunks along paragraph and page boundaries
+
+    Pages of a PDF are separated by a form feed (see extract_text_from_pdf),
+    which normalize_content turns into a paragraph break.
+
+    Paragraphs are packed into chunks of at most max_chars characters; only
+    a paragraph longer than that is split itself, at a sentence end if
+    possible.
+
+    Args:
+        content (str): Text to split
+        max_chars (int): Maximum characters per chunk
+
+    Returns:
+        list: Chunks of text, in document order
+    """
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n|\f", content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) > max_chars:
+            paragraphs.extend(_split_long_paragraph(paragraph, max_chars))
+        else:
+            paragraphs.append(paragraph)
+
+    chunks = []
+    current = []
+    current_length = 0
+    for paragraph in paragraphs:
+        if current and current_length + len(paragraph) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_length = 0
+        current.append(paragraph)
+        current_length += len(paragraph) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def allocate_questions(chunk_lengths, num_questions):
+    """
+    Divide questions between chunks in proportion to their length
+
+    Uses the largest remainder method, so the counts always add up to
+    num_questions.
+
+    Args:
+        chunk_lengths (list): Length of each chunk
+        num_questions (int): Total number of questions
+
+    Returns:
+        list: Number of questions for each chunk (some may be 0)
+    """
+    total = sum(chunk_lengths)
+    if total == 0 or num_questions <= 0:
+        return [0] * len(chunk_lengths)
+
+    quotas = [num_questions * length / total for length in chunk_lengths]
+    counts = [math.floor(quota) for quota in quotas]
+    remaining = num_questions - sum(counts)
+    by_remainder = sorted(
+        range(len(quotas)), key=lambda i: (quotas[i] - counts[i], chunk_lengths[i]), reverse=True
+    )
+    for i in by_remainder[:remaining]:
+        counts[i] += 1
+    return counts
+
+
+def merge_chunks(chunks, count):
+    """
+    Merge adjacent chunks into count chunks of about equal length
+
+    Used when there are more chunks than questions, so that every part of
+    the content is in a chunk that gets a question.
+
+    Args:
+        chunks (list): Chunks of text, in document order
+        count (int): Number of chunks wanted (at most len(chunks))
+
+    Returns:
+        list: count chunks, in document order
+    """
+    total = sum(len(chunk) for chunk in chunks)
+    merged = []
+    current = []
+    seen = 0
+    for i, chunk in enumerate(chunks):
+        current.append(chunk)
+        seen += len(chunk)
+        groups_left = count - len(merged) - 1
+        if groups_left == 0:
+            continue
+        chunks_left = len(chunks) - i - 1
+        # Close the group at its share of the length, or when every
+        # remaining chunk is needed to start a group of its own
+        if chunks_left == groups_left or seen * count >= total * (len(merged) + 1):
+            merged.append("\n\n".join(current))
+            current = []
+    merged.append("\n\n".join(current))
+    return merged
+
+
+def generate_quiz_chunked(
+    content,
+    num_questions=5,
+    model="llama3.1:8b-instruct-q4_0",
+    question_type="multipleChoice",
+    additional_instructions="",
+    max_workers=QUIZ_GENERATION_CONCURRENCY,
+    use_cache=True,
+    priority=PRIORITY_INTERACTIVE,
+):
+    """
+    Generate a quiz spread over the content, one LLM request per chunk
+
+    The content is split into chunks that fit the model's content token
+    budget (see split_content_into_chunks and content_char_budget). Every
+    chunk gets at least one question and the rest are divided between them
+    by length, so all of the content is covered. With more chunks than
+    questions, neighbouring chunks are merged first (see merge_chunks) and
+    prepare_content cuts the merged chunks down to their most informative
+    sections, so coverage is only best-effort. The chunks not in the cache
+    are sent to Ollama concurrently over the async client. The per-chunk
+    quizzes are parsed with parse_quiz and merged in document order with
+    the questions renumbered. Content that fits in one chunk takes a single
+    request, as before.
+
+    Args:
+        content (str): Content to base the quiz on
+        num_questions (int): Number of questions to generate
+        model (str): LLM model to use
+        question_type (str): Type of questions (multipleChoice, trueFalse, shortAnswer, flashcards)
+        additional_instructions (str): Additional instructions for the LLM
+        max_workers (int): Maximum concurrent requests to Ollama
+        use_cache (bool): Reuse cached responses (see generate_quiz_with_ollama)
+        priority (int): Scheduling priority (see inference_scheduler)
+
+    Returns:
+        dict: Parsed quiz, or None if no chunk produced a response
+
+    Raises:
+        SchedulerBusy: If Ollama is too busy to take the request
+    """
+    num_questions = int(num_questions)
+    content = normalize_content(content)
+
+    # Chunks are as large as one prompt can carry, so a chunk is only cut
+    # down when several had to be merged for lack of questions
+    chunk_chars = min(content_char_budget(model, content), QUIZ_MAX_CONTENT_CHARS)
+    chunks = split_content_into_chunks(content, chunk_chars)
+
+    if len(chunks) <= 1:
+        raw_quiz = generate_quiz_with_ollama(
+            content, num_questions, model, question_type, additional_instructions,
+            use_cache=use_cache, priority=priority,
+        )
+        return parse_quiz(raw_quiz, question_type) if raw_quiz else None
+
+    if len(chunks) > num_questions:
+        # One question per chunk at most: merge neighbouring chunks, which
+        # prepare_content then condenses to their most informative sections
+        logger.info(f"Merging {len(chunks)} chunks into {num_questions} for {num_questions} questions")
+        chunks = merge_chunks(chunks, num_questions)
+        counts = [1] * len(chunks)
+    else:
+        # Every chunk gets a question, and the rest go by length
+        counts = [
+            1 + count
+            for count in allocate_questions([len(chunk) for chunk in chunks], num_questions - len(chunks))
+        ]
+    jobs = list(zip(chunks, counts))
+    logger.info(
+        f"Generating {num_questions} questions from {len(jobs)} chunks "
+        f"({len(content)} characters, up to {max_workers} at a time)"
+    )
+
+    prompts = [
+        _quiz_request(chunk, count, model, question_type, additional_instructions)
+        for chunk, count in jobs
+    ]
+    raw_quizzes = [quiz_cache.get(cache_key) if use_cache else None for _, cache_key in prompts]
+    missing = [i for i, raw_quiz in enumerate(raw_quizzes) if raw_quiz is None]
+    if missing:
+        batch = [prompts[i] for i in missing]
+        # Identical requests arriving while this one runs share its result
+        fetched = in_flight_quizzes.do(
+            make_cache_key("quiz chunks", [cache_key for _, cache_key in batch]),
+            lambda: _run_quiz_prompts(model, batch, max_workers, priority),
+        )
+        for i, raw_quiz in zip(missing, fetched):
+            raw_quizzes[i] = raw_quiz
+
+    questions = []
+    failed = 0
+    for (_, count), raw_quiz in zip(jobs, raw_quizzes):
+        if not raw_quiz:
+            failed += 1
+            continue
+        # Drop any extra questions the LLM added beyond its share
+        questions.extend(parse_quiz(raw_quiz, question_type)["questions"][:count])
+
+    if failed:
+        logger.warning(f"{failed} of {len(jobs)} chunks failed to generate")
+    if failed == len(jobs):
+        return None
+
+    prefix = "fc" if question_type == "flashcards" else "q"
+    for number, question in enumerate(questions, start=1):
+        question["id"] = f"{prefix}{number}"
+
+    return build_quiz(questions)
@@ -1,230 +1,408 @@
-import logging
+import re
 from config.app_config import logger
 
+# A numbered line starts a question: a digit, then ". " within the first ten
+# characters (e.g. "1. ", "12. ")
+QUESTION_START = re.compile(r"\d.{0,7}?\. (.*)")
+OPTION_LINE = re.compile(r"([A-Z])[).]\s*(.*)")
+ANSWER_MARKER = re.compile(r"correct answer|correct:|answer:", re.IGNORECASE)
+ANSWER_LETTER = re.compile(r"[\s\[(*]*([A-Za-z])\b")
+FLIP_SIDE = re.compile(r"flip side:\s*(.*)", re.IGNORECASE)
 
-def parse_quiz(raw_quiz, question_type="multipleChoice"):
-    """
-    Parse raw quiz text into structured format
 
-    Args:
-        raw_quiz (str): Raw quiz text from LLM
-        question_type (str): Type of questions in the quiz
+def is_question_start(line):
+    """Check whether a stripped line starts a new numbered question (e.g. "1. ")"""
+    return QUESTION_START.match(line) is not None
 
-    Returns:
-        dict: Structured quiz object with questions, options, and correct answers
-    """
-    logger.info("Starting to parse quiz text")
-    questions = []
 
-    if question_type == "flashcards":
-        # Split by numbered flashcards (1., 2., etc.)
-        raw_flashcards = []
-        current_flashcard = ""
+class _OpenQuestion:
+    """A question while its lines are being read"""
 
-        # Split up all flashcards line by line
-        lines = raw_quiz.split("\n")
-        logger.info(f"Raw quiz has {len(lines)} lines")
+    __slots__ = ("number", "line_number", "text", "options", "answer", "answer_line")
 
-        for line in lines:
-            line = line.strip()
-
-            # Check if this is a new flashcard (starts with a number followed by a period)
-            if line and line[0].isdigit() and ". " in line[:10]:
-                if current_flashcard:  # Save the previous flashcard if it exists
-                    raw_flashcards.append(current_flashcard)
-                current_flashcard = line
-            elif current_flashcard:  # Append to the current flashcard
-                current_flashcard += "\n" + line
-
-        # Add the last flashcard
-        if current_flashcard:
-            raw_flashcards.append(current_flashcard)
-
-        logger.info(f"Found {len(raw_flashcards)} raw flashcards")
-
-        # Process each flashcard
-        for i, fc in enumerate(raw_flashcards):
-            if not fc.strip():
-                continue
-
-            logger.info(f"Processing flashcard {i+1}")
-
-            # Initialize flashcard object
-            flashcard = {
-                "id": f"fc{i+1}",  # Start from fc1 instead of fc0
-                "question": "",  # Front side of the card
-                "correctAnswer": "",  # Back side of the card
-                "type": "flashcard"  # Indicate this is a flashcard
+    def __init__(self, number, line_number, text):
+        self.number = number
+        self.line_number = line_number
+        self.text = [text]
+        self.options = []
+        self.answer = None
+        self.answer_line = None
+
+
+class QuestionGrammar:
+    """
+    Reads the lines of one question type
+
+    A grammar is told about every line of a question after its numbered
+    first line, and then builds the question dict. Add a grammar to
+    GRAMMARS to support a new question type.
+    """
+
+    id_prefix = "q"
+
+    def read_line(self, question, line, line_number):
+        """
+        Take in one stripped line of a question
+
+        Args:
+            question (_OpenQuestion): Question being read
+            line (str): The line, stripped
+            line_number (int): Position of the line in the text (from 1)
+
+        Returns:
+            str: "answer" if the line completes the question, "used" if it
+                was part of it, "ignored" otherwise
+        """
+        raise NotImplementedError
+
+    def build(self, question, issues):
+        """
+        Turn a read question into the structure the frontend uses
+
+        Args:
+            question (_OpenQuestion): Question that was read
+            issues (list): Problems found are appended here
+
+        Returns:
+            dict: The question
+        """
+        raise NotImplementedError
+
+    def _question_id(self, question):
+        return f"{self.id_prefix}{question.number}"
+
+    @staticmethod
+    def _issue(issues, question, message, line_number=None):
+        issues.append(
+            {
+                "question": question.number,
+                "line": line_number or question.line_number,
+                "message": message,
             }
+        )
+
+
+def _answer_value(line):
+    # Whatever follows the colon, or the answer marker if there is no colon
+    colon = line.find(":")
+    if colon != -1:
+        return line[colon + 1 :].strip()
+    marker = ANSWER_MARKER.search(line)
+    return line[marker.end() :].strip() if marker else ""
+
+
+class ChoiceGrammar(QuestionGrammar):
+    """Questions with lettered options and a "Correct answer:" line"""
+
+    def __init__(self, letters):
+        self.letters = letters
+
+    def read_line(self, question, line, line_number):
+        option = OPTION_LINE.match(line)
+        if option and option.group(1) in self.letters:
+            question.options.append((option.group(1), option.group(2).strip()))
+            return "used"
+        if ANSWER_MARKER.search(line):
+            if question.answer is not None:
+                # e.g. "Explanation: the answer: ..." after the real answer
+                return "ignored"
+            question.answer = _answer_value(line)
+            question.answer_line = line_number
+            return "answer"
+        if line and not question.options:
+            # The question text continues on the next line
+            question.text.append(line)
+            return "used"
+        return "ignored"
+
+    def _correct_option(self, question, issues):
+        if question.answer is None:
+            self._issue(issues, question, "No correct answer line")
+            return ""
+
+        # "Correct answer: True" names the option instead of its letter
+        for _, text in question.options:
+            if text and text.lower() == question.answer.lower():
+                return text
+
+        letter = ANSWER_LETTER.match(question.answer)
+        if letter:
+            wanted = letter.group(1).upper()
+            for option_letter, text in question.options:
+                if option_letter == wanted:
+                    return text
+        self._issue(
+            issues,
+            question,
+            f"Correct answer '{question.answer}' doesn't match an option",
+            question.answer_line,
+        )
+        return ""
+
+    def build(self, question, issues):
+        if len(question.options) != len(self.letters):
+            self._issue(
+                issues,
+                question,
+                f"Expected {len(self.letters)} options, found {len(question.options)}",
+            )
+        return {
+            "id": self._question_id(question),
+            "question": " ".join(question.text),
+            "options": [text for _, text in question.options],
+            "correctAnswer": self._correct_option(question, issues),
+        }
+
+
+class ShortAnswerGrammar(QuestionGrammar):
+    """Questions answered in a few words on a "Correct answer:" line"""
+
+    def read_line(self, question, line, line_number):
+        if ANSWER_MARKER.search(line) and question.answer is None:
+            question.answer = _answer_value(line)
+            question.answer_line = line_number
+            return "answer"
+        if line and question.answer is None:
+            question.text.append(line)
+            return "used"
+        return "ignored"
+
+    def build(self, question, issues):
+        if not question.answer:
+            self._issue(issues, question, "No correct answer line")
+        return {
+            "id": self._question_id(question),
+            "question": " ".join(question.text),
+            "options": [],
+            "correctAnswer": question.answer or "",
+            "type": "shortAnswer",
+        }
+
+
+class FlashcardGrammar(QuestionGrammar):
+    """Cards with the front on the numbered line and a "Flip side:" line"""
+
+    id_prefix = "fc"
+
+    def read_line(self, question, line, line_number):
+        flip_side = FLIP_SIDE.search(line)
+        if flip_side and question.answer is None:
+            question.answer = flip_side.group(1).strip()
+            question.answer_line = line_number
+            return "answer"
+        return "ignored"
+
+    def build(self, question, issues):
+        if question.answer is None:
+            self._issue(issues, question, "No flip side line")
+        return {
+            "id": self._question_id(question),
+            "question": question.text[0],  # Front side of the card
+            "correctAnswer": question.answer or "",  # Back side of the card
+            "type": "flashcard",  # Indicate this is a flashcard
+        }
+
+
+# Grammar for each question type the quiz prompts ask for
+GRAMMARS = {
+    "multipleChoice": ChoiceGrammar("ABCD"),
+    "trueFalse": ChoiceGrammar("AB"),
+    "shortAnswer": ShortAnswerGrammar(),
+    "flashcards": FlashcardGrammar(),
+}
+
+
+def get_grammar(question_type):
+    """Get the grammar for a question type, reading unknown types as multiple choice"""
+    return GRAMMARS.get(question_type) or GRAMMARS["multipleChoice"]
+
+
+class IncrementalQuizParser:
+    """
+    Parses quiz text in a single pass, also while it is still being generated
 
-            # Split the flashcard into lines for processing
-            lines = fc.strip().split("\n")
-            logger.info(f"Flashcard {i+1} has {len(lines)} lines")
-
-            # Extract front side (first line)
-            front_side = ""
-            if lines:
-                # Remove the flashcard number (e.g., "1. ")
-                first_line = lines[0]
-                dot_index = first_line.find(". ")
-                if dot_index != -1:
-                    front_side = first_line[dot_index + 2:].strip()
-                else:
-                    front_side = first_line.strip()
-
-                flashcard["question"] = front_side
-                logger.info(f"Front side: {front_side[:50]}...")
-
-            # Find the back side ("Flip side:" content)
-            for line in lines[1:]:  # Skip the first line (front side)
-                line = line.strip().lower()
-                if "flip side:" in line:
-                    back_side = line[line.find("flip side:") + 10:].strip()
-                    flashcard["correctAnswer"] = back_side
-                    logger.info(f"Back side: {back_side[:50]}...")
-                    break
-
-            questions.append(flashcard)
-
-    elif question_type == "multipleChoice":
-        # Split by numbered questions (1., 2., etc.)
-        raw_questions = []
-        current_question = ""
-
-        # Split up all questions line by line
-        lines = raw_quiz.split("\n")
-        logger.info(f"Raw quiz has {len(lines)} lines")
+    Text is fed in arbitrary fragments (e.g. LLM tokens). A question is
+    returned as soon as its answer line is complete, or when the next
+    question starts. The full text is kept, and parse problems are
+    collected in diagnostics; quiz() gives the final quiz as parse_quiz
+    reads it.
+    """
 
+    def __init__(self, question_type="multipleChoice"):
+        self.question_type = question_type
+        self._grammar = get_grammar(question_type)
+        self._fragments = []
+        self._partial_line = ""
+        self._line_number = 0
+        self._open = None
+        self._emitted = False
+        self._questions = []
+        self._issues = []
+        self._ignored_lines = 0
+        if question_type not in GRAMMARS:
+            self._issues.append(
+                {
+                    "question": None,
+                    "line": None,
+                    "message": f"Unknown question type '{question_type}', read as multipleChoice",
+                }
+            )
+
+    @property
+    def text(self):
+        """All text fed so far"""
+        return "".join(self._fragments)
+
+    def feed(self, fragment):
+        """
+        Add generated text
+
+        Args:
+            fragment (str): Next piece of the raw quiz text
+
+        Returns:
+            list: Questions completed by this fragment
+        """
+        self._fragments.append(fragment)
+        if "\n" not in fragment:
+            self._partial_line += fragment
+            return []
+
+        lines = (self._partial_line + fragment).split("\n")
+        self._partial_line = lines.pop()
+
+        completed = []
         for line in lines:
-            line = line.strip()
-
-            # Check if this is a new question (starts with a number followed by a period)
-            if line and line[0].isdigit() and ". " in line[:10]:
-                if current_question:  # Save the previous question if it exists
-                    raw_questions.append(current_question)
-                current_question = line
-            elif current_question:  # Append to the current question
-                current_question += "\n" + line
-
-        # Add the last question
-        if current_question:
-            raw_questions.append(current_question)
-
-        logger.info(f"Found {len(raw_questions)} raw questions")
-
-        # Process each question
-        for i, q in enumerate(raw_questions):
-            if not q.strip():
-                continue
-
-            logger.info(f"Processing question {i+1}")
-
-            # Initialize question object
-            question = {
-                "id": f"q{i+1}",  # Start from q1 instead of q0
-                "question": "",  # Use only question, not questionText
-                "options": [],
-                "correctAnswer": "",
-                # "explanation": "",
-            }
+            question = self._read_line(line.strip())
+            if question is not None:
+                completed.append(question)
+        return completed
+
+    def finish(self):
+        """
+        Signal the end of the text
+
+        Returns:
+            list: Questions that were still open
+        """
+        completed = []
+        if self._partial_line:
+            question = self._read_line(self._partial_line.strip())
+            self._partial_line = ""
+            if question is not None:
+                completed.append(question)
+        question = self._close_question()
+        if question is not None:
+            completed.append(question)
+        return completed
+
+    def _read_line(self, line):
+        self._line_number += 1
+        start = QUESTION_START.match(line)
+        if start:
+            question = self._close_question()
+            self._open = _OpenQuestion(
+                len(self._questions) + 1, self._line_number, start.group(1).strip()
+            )
+            self._emitted = False
+            return question
+
+        if self._open is None:
+            if line:
+                self._ignored_lines += 1
+            return None
+
+        result = self._grammar.read_line(self._open, line, self._line_number)
+        if result == "ignored" and line:
+            self._ignored_lines += 1
+        if result == "answer" and not self._emitted:
+            # Shown early; the question is built again when it is closed, in
+            # case more lines follow
+            self._emitted = True
+            return self._grammar.build(self._open, [])
+        return None
+
+    def _close_question(self):
+        if self._open is None:
+            return None
+        question = self._grammar.build(self._open, self._issues)
+        self._questions.append(question)
+        self._open = None
+        return None if self._emitted else question
+
+    @property
+    def diagnostics(self):
+        """Problems found in the text read so far"""
+        return {
+            "questionType": self.question_type,
+            "questions": len(self._questions),
+            "lines": self._line_number,
+            "ignoredLines": self._ignored_lines,
+            "issues": list(self._issues),
+        }
+
+    def quiz(self):
+        """
+        Get the quiz read so far (call finish first)
+
+        Returns:
+            dict: Structured quiz object with questions, options, and correct answers
+        """
+        return build_quiz(self._questions)
+
+
+def build_quiz(questions):
+    """
+    Wrap parsed questions in the quiz object the frontend uses
 
-            # Split the question into lines for processing
-            lines = q.strip().split("\n")
-            logger.info(f"Question {i+1} has {len(lines)} lines")
-
-            # Extract question text (first line)
-            question_text = ""
-            if lines:
-                # Remove the question number (e.g., "1. ")
-                first_line = lines[0]
-                dot_index = first_line.find(". ")
-                if dot_index != -1:
-                    question_text = first_line[dot_index + 2 :].strip()
-                else:
-                    question_text = first_line.strip()
-
-                question["question"] = question_text
-                logger.info(f"Question text: {question_text[:50]}...")
-
-            # Process options and correct answer
-            options = []
-            correct_answer_line = ""
-
-            for line in lines[1:]:  # Skip the first line (question text)
-                line = line.strip()
-
-                # Log current line for debugging
-                if line:
-                    logger.debug(f"Processing line: {line}")
-
-                # Check if it's an option line (A), B), A., B. etc)
-                if line and line[0] in "ABCD" and line[1] in ").":
-                    options.append(line[2:].strip())
-                    logger.debug(f"Added option: {line[0]}: {line[2:].strip()}")
-                # Check various formats of correct answer lines
-                elif (
-                    "correct answer" in line.lower()
-                    or "correct:" in line.lower()
-                    or "answer:" in line.lower()
-                ):
-                    correct_answer_line = line
-                    logger.info(f"Found correct answer line: {line}")
-
-            # Add options to question
-            question["options"] = options
-            logger.info(f"Question has {len(options)} options")
-
-            # Process correct answer
-            if correct_answer_line:
-                parts = (
-                    correct_answer_line.split(":", 1)
-                    if ":" in correct_answer_line
-                    else correct_answer_line.split(" ", 2)
-                )
-                logger.debug(f"Split correct answer line into parts: {parts}")
-
-                if len(parts) > 1:
-                    answer_letter = parts[1].strip()
-                    # Handle multi-character answers like "A" or just "A"
-                    answer_letter = answer_letter[0] if answer_letter else ""
-                    logger.info(f"Extracted answer letter: {answer_letter}")
-
-                    # Convert letter to option text
-                    option_index = -1
-
-                    if answer_letter == "A":
-                        option_index = 0
-                    elif answer_letter == "B":
-                        option_index = 1
-                    elif answer_letter == "C":
-                        option_index = 2
-                    elif answer_letter == "D":
-                        option_index = 3
-
-                    if option_index >= 0 and option_index < len(options):
-                        question["correctAnswer"] = options[option_index]
-                        logger.info(
-                            f"Set correct answer to: {question['correctAnswer'][:50]}..."
-                        )
-                    else:
-                        logger.warning(
-                            f"Invalid answer letter: {answer_letter} or options index out of range"
-                        )
-                else:
-                    logger.warning(
-                        f"Could not parse correct answer from: {correct_answer_line}"
-                    )
-            else:
-                logger.warning(f"No correct answer line found for question {i+1}")
-
-            questions.append(question)
-
-    # Create a quiz object with unique ID
-    quiz = {
+    Args:
+        questions (list): Parsed questions, in order
+
+    Returns:
+        dict: Structured quiz object with a title, description and the questions
+    """
+    return {
         "title": "Quiz",
         "description": "Quiz generated from your content",
-        "questions": questions,
+        "questions": list(questions),
     }
 
-    logger.info(f"Finished parsing quiz with {len(questions)} questions")
+
+def parse_quiz_with_diagnostics(raw_quiz, question_type="multipleChoice"):
+    """
+    Parse raw quiz text into structured format, reporting what didn't parse
+
+    Args:
+        raw_quiz (str): Raw quiz text from LLM
+        question_type (str): Type of questions in the quiz
+
+    Returns:
+        tuple: (quiz, diagnostics); diagnostics counts the questions and the
+            lines that were ignored, and lists issues such as missing
+            answers, each with its question number and line
+    """
+    parser = IncrementalQuizParser(question_type)
+    parser.feed(raw_quiz)
+    parser.finish()
+    return parser.quiz(), parser.diagnostics
+
+
+def parse_quiz(raw_quiz, question_type="multipleChoice"):
+    """
+    Parse raw quiz text into structured format
+
+    Args:
+        raw_quiz (str): Raw quiz text from LLM
+        question_type (str): Type of questions in the quiz
+
+    Returns:
+        dict: Structured quiz object with questions, options, and correct answers
+    """
+    quiz, diagnostics = parse_quiz_with_diagnostics(raw_quiz, question_type)
+    logger.info(
+        f"Parsed quiz with {diagnostics['questions']} questions "
+        f"({len(diagnostics['issues'])} issues, {diagnostics['ignoredLines']} lines ignored)"
+    )
+    for issue in diagnostics["issues"]:
+        logger.debug(f"Quiz parse issue: {issue}")
     return quiz
@@ -0,0 +1,524 @@
+import os
+from datetime import datetime
+
+from config.app_config import DATABASE_FOLDER, STATS_LEADERBOARD_SIZE, logger
+from storage.factory import get_storage
+from utils import file_helpers
+
+ACTIVITIES_PATH = os.path.join(DATABASE_FOLDER, "activities.json")
+# Materialized statistics, one record per quiz and per module (written
+# through an event log)
+QUIZ_STATS_PATH = os.path.join(DATABASE_FOLDER, "quiz_stats.json")
+
+QUIZ_SCOPE = "quiz"
+MODULE_SCOPE = "module"
+# Scope of the record noting which STATS_VERSION the records were built for
+META_SCOPE = "meta"
+
+# Bump when the layout of a stats record changes; older records are rebuilt
+STATS_VERSION = 2
+
+# Score histograms have buckets of this many percentage points
+HISTOGRAM_BUCKET_SIZE = 10
+
+
+def _score_percent(result):
+    total_questions = result.get("total_questions") or 0
+    if not total_questions:
+        return None
+    return ((result.get("score") or 0) / total_questions) * 100
+
+
+def quiz_module(quiz_id):
+    """Get the ID of the module a quiz is in, or None"""
+    for activity in file_helpers.load_json_file(ACTIVITIES_PATH, []):
+        if activity.get("quizId") == quiz_id:
+            return activity.get("moduleId")
+    return None
+
+
+def module_quizzes(module_id):
+    """Get the IDs of the quizzes in a module"""
+    return [
+        activity.get("quizId")
+        for activity in file_helpers.load_json_file(ACTIVITIES_PATH, [])
+        if activity.get("moduleId") == module_id and activity.get("quizId")
+    ]
+
+
+def _new_stats(scope, stats_id):
+    stats = {
+        "scope": scope,
+        "id": stats_id,
+        "version": STATS_VERSION,
+        "attempts": 0,
+        "score_total": 0.0,
+        # Results per score percentage (rounded), for the mean, median and histogram
+        "score_counts": {},
+        "leaderboard": [],
+        "updated": datetime.now().isoformat(),
+    }
+    if scope == QUIZ_SCOPE:
+        stats.update(
+            {
+                "quiz_title": None,
+                "module_id": None,
+                # Attempt count of each student's result counted below, so a
+                # result is never counted twice
+                "latest_attempts": {},
+                "questions": {},
+            }
+        )
+    else:
+        stats["quizzes"] = {}
+    return stats
+
+
+def _add_score(stats, score_percent, count=1):
+    stats["score_total"] += score_percent * count
+    key = str(round(score_percent))
+    stats["score_counts"][key] = stats["score_counts"].get(key, 0) + count
+    if not stats["score_counts"][key]:
+        del stats["score_counts"][key]
+
+
+def _rank(entry):
+    # Ties go to whoever got there first
+    return (-entry["score_percent"], entry.get("timestamp") or "")
+
+
+def _add_to_leaderboard(leaderboard, entry, size=STATS_LEADERBOARD_SIZE):
+    """Keep each student's best score on a leaderboard of the top size students"""
+    for existing in leaderboard:
+        if existing["student_id"] == entry["student_id"]:
+            if entry["score_percent"] <= existing["score_percent"]:
+                return
+            leaderboard.remove(existing)
+            break
+    leaderboard.append(entry)
+    leaderboard.sort(key=_rank)
+    del leaderboard[size:]
+
+
+def _replace_on_leaderboard(leaderboard, student_id, entry, size=STATS_LEADERBOARD_SIZE):
+    """
+    Put a student's latest score on a quiz leaderboard in place of the last one
+
+    Returns False when the student drops down a full leaderboard, as then a
+    student who isn't on it may belong there instead.
+    """
+    for existing in leaderboard:
+        if existing["student_id"] == student_id:
+            if len(leaderboard) >= size and (entry is None or _rank(entry) > _rank(existing)):
+                return False
+            leaderboard.remove(existing)
+            break
+    if entry is not None:
+        leaderboard.append(entry)
+        leaderboard.sort(key=_rank)
+        del leaderboard[size:]
+    return True
+
+
+def _leaderboard_entry(result, score_percent):
+    return {
+        "student_id": result.get("student_id"),
+        "student_name": result.get("student_name"),
+        "quiz_id": result.get("quiz_id"),
+        "quiz_title": result.get("quiz_title"),
+        "score": result.get("score"),
+        "total_questions": result.get("total_questions"),
+        "score_percent": round(score_percent, 1),
+        "timestamp": result.get("timestamp"),
+    }
+
+
+def _quiz_summary(stats):
+    scored = sum(stats["score_counts"].values())
+    return {
+        "quiz_title": stats["quiz_title"],
+        "attempts": stats["attempts"],
+        "scored_attempts": scored,
+        "students": len(stats["latest_attempts"]),
+        "mean_score_percent": round(stats["score_total"] / scored, 1) if scored else None,
+    }
+
+
+def _count_result(stats, result, sign):
+    # Add (sign 1) or take back (sign -1) a result's attempts, answers and score
+    stats["attempts"] += sign * result.get("attempts", 1)
+    # A repeated question counts once, as its last answer (as in item_analysis)
+    answers = {str(answer.get("question_id")): answer for answer in result.get("answers") or []}
+    for question_id, answer in answers.items():
+        question = stats["questions"].setdefault(
+            question_id, {"question": answer.get("question"), "answered": 0, "correct": 0}
+        )
+        question["answered"] += sign
+        if answer.get("correct"):
+            question["correct"] += sign
+        if not question["answered"]:
+            del stats["questions"][question_id]
+    score_percent = _score_percent(result)
+    if score_percent is not None:
+        _add_score(stats, score_percent, sign)
+    return score_percent
+
+
+def add_result(stats, result, replaced=None):
+    """
+    Fold a saved quiz result into a quiz's statistics
+
+    Statistics count each student's latest result, as stored: the result
+    it replaced is taken back out, and "attempts" adds up the attempt
+    counts of the latest results. So they come out the same whether kept
+    up to date here or built from history by build_quiz_stats.
+
+    Args:
+        stats (dict): Quiz stats record, updated in place
+        result (dict): Result as stored, with its attempt count
+        replaced (dict): The student's previous result, if any
+
+    Returns:
+        bool: False if the result can't be folded in (the record doesn't
+            hold the replaced result, or the leaderboard needs students it
+            doesn't list), in which case stats must be built again
+    """
+    student_id = result.get("student_id")
+    counted = stats["latest_attempts"].get(student_id)
+    if counted is not None and counted >= result.get("attempts", 1):
+        # Already in the record (built from history after the save)
+        return True
+    if counted != (replaced.get("attempts", 1) if replaced else None):
+        return False
+
+    if replaced:
+        _count_result(stats, replaced, -1)
+    score_percent = _count_result(stats, result, 1)
+    entry = _leaderboard_entry(result, score_percent) if score_percent is not None else None
+    if not _replace_on_leaderboard(stats["leaderboard"], student_id, entry):
+        return False
+
+    stats["latest_attempts"][student_id] = result.get("attempts", 1)
+    stats["quiz_title"] = result.get("quiz_title") or stats["quiz_title"]
+    stats["updated"] = datetime.now().isoformat()
+    return True
+
+
+def build_quiz_stats(quiz_id, module_id, results=None):
+    """
+    Compute a quiz's statistics from the stored results
+
+    Args:
+        quiz_id (str): ID of the quiz
+        module_id (str): ID of the quiz's module, or None
+        results (list): The quiz's stored results (read if not given)
+
+    Returns:
+        dict: Quiz stats record
+    """
+    stats = _new_stats(QUIZ_SCOPE, quiz_id)
+    stats["module_id"] = module_id
+    if results is None:
+        results = get_storage().get_quiz_results(quiz_id=quiz_id)
+    for result in results:
+        stats["quiz_title"] = result.get("quiz_title") or stats["quiz_title"]
+        stats["latest_attempts"][result.get("student_id")] = result.get("attempts", 1)
+        score_percent = _count_result(stats, result, 1)
+        if score_percent is not None:
+            _add_to_leaderboard(stats["leaderboard"], _leaderboard_entry(result, score_percent))
+    return stats
+
+
+def merge_module_stats(module_id, quiz_stats):
+    """
+    Compute a module's statistics by merging the stats of its quizzes
+
+    Args:
+        module_id (str): ID of the module
+        quiz_stats (list): Stats records of the module's quizzes (None for
+            quizzes without any)
+
+    Returns:
+        dict: Module stats record
+    """
+    stats = _new_stats(MODULE_SCOPE, module_id)
+    for quiz in quiz_stats:
+        if not _is_current(quiz) or not quiz["attempts"]:
+            continue
+        stats["attempts"] += quiz["attempts"]
+        stats["score_total"] += quiz["score_total"]
+        for key, count in quiz["score_counts"].items():
+            stats["score_counts"][key] = stats["score_counts"].get(key, 0) + count
+        # A student's best score in the module is on that quiz's leaderboard
+        # unless enough others beat it there to keep it off the module's too
+        for entry in quiz["leaderboard"]:
+            _add_to_leaderboard(stats["leaderboard"], entry)
+        stats["quizzes"][quiz["id"]] = _quiz_summary(quiz)
+    return stats
+
+
+def build_module_stats(module_id, quiz_ids=None):
+    """
+    Compute a module's statistics from the stored stats of its quizzes
+
+    Only reads, so it can run inside an upsert_record update.
+
+    Args:
+        module_id (str): ID of the module
+        quiz_ids (list): IDs of the module's quizzes (looked up in the
+            activities if not given)
+
+    Returns:
+        dict: Module stats record
+    """
+    if quiz_ids is None:
+        quiz_ids = module_quizzes(module_id)
+    return merge_module_stats(module_id, [_find(QUIZ_SCOPE, quiz_id) for quiz_id in quiz_ids])
+
+
+def _find(scope, stats_id):
+    return get_storage().find_record(QUIZ_STATS_PATH, "stats", {"scope": scope, "id": stats_id})
+
+
+def _is_current(stats):
+    return stats is not None and stats.get("version") == STATS_VERSION
+
+
+def _store(stats):
+    get_storage().upsert_record(
+        QUIZ_STATS_PATH, "stats", {"scope": stats["scope"], "id": stats["id"]}, lambda _: stats
+    )
+
+
+def record_result(result, replaced=None):
+    """
+    Update the statistics of a result's quiz and of the quiz's module
+
+    Each update runs inside upsert_record, so concurrent saves are applied
+    one at a time; a record that is missing or can't take the result is
+    built from history there. Otherwise costs O(questions + leaderboard
+    size) for the quiz and O(quizzes in the module) for the module,
+    regardless of how many results are stored.
+
+    Args:
+        result (dict): Result as stored, with its attempt count
+        replaced (dict): The result it replaced (see save_quiz_result)
+    """
+    quiz_id = result.get("quiz_id")
+
+    def update_quiz(existing):
+        if _is_current(existing) and add_result(existing, result, replaced):
+            return existing
+        # The history already holds this result
+        module_id = existing.get("module_id") if _is_current(existing) else quiz_module(quiz_id)
+        return build_quiz_stats(quiz_id, module_id)
+
+    quiz_stats = get_storage().upsert_record(
+        QUIZ_STATS_PATH, "stats", {"scope": QUIZ_SCOPE, "id": quiz_id}, update_quiz
+    )
+
+    module_id = quiz_stats.get("module_id")
+    if module_id is None:
+        return
+
+    def update_module(existing):
+        if not _is_current(existing):
+            return build_module_stats(module_id)
+        quiz_ids = list(existing["quizzes"])
+        if quiz_id not in quiz_ids:
+            quiz_ids.append(quiz_id)
+        return build_module_stats(module_id, quiz_ids)
+
+    get_storage().upsert_record(
+        QUIZ_STATS_PATH, "stats", {"scope": MODULE_SCOPE, "id": module_id}, update_module
+    )
+
+
+def get_quiz_stats(quiz_id):
+    """
+    Get a quiz's stats record
+
+    Only reads: records are kept up to date when results are saved and
+    quizzes deleted, and built by ensure_built.
+
+    Args:
+        quiz_id (str): ID of the quiz
+
+    Returns:
+        dict: Quiz stats record, or None if the quiz has no results
+    """
+    stats = _find(QUIZ_SCOPE, quiz_id)
+    return stats if _is_current(stats) and stats["attempts"] else None
+
+
+def get_module_stats(module_id):
+    """
+    Get a module's stats record
+
+    Only reads, like get_quiz_stats.
+
+    Args:
+        module_id (str): ID of the module
+
+    Returns:
+        dict: Module stats record, or None if none of its quizzes has results
+    """
+    stats = _find(MODULE_SCOPE, module_id)
+    return stats if _is_current(stats) and stats["attempts"] else None
+
+
+def forget_quiz(quiz_id, module_id=None):
+    """
+    Drop the statistics of a deleted quiz
+
+    The module's stats are merged again from its remaining quizzes in the
+    same update.
+
+    Args:
+        quiz_id (str): ID of the quiz
+        module_id (str): ID of the module the quiz was in
+    """
+    def remove(data):
+        records = [
+            stats
+            for stats in data.setdefault("stats", [])
+            if (stats.get("scope"), stats.get("id")) not in ((QUIZ_SCOPE, quiz_id), (MODULE_SCOPE, module_id))
+        ]
+        if module_id is not None:
+            module_quiz_stats = [
+                stats
+                for stats in records
+                if stats.get("scope") == QUIZ_SCOPE and stats.get("module_id") == module_id
+            ]
+            records.append(merge_module_stats(module_id, module_quiz_stats))
+        data["stats"] = records
+
+    file_helpers.update_json_file(QUIZ_STATS_PATH, remove, {"stats": []})
+
+
+def rebuild_all():
+    """
+    Build every quiz and module stats record from the stored results
+
+    Each record is built inside its upsert_record update, so results saved
+    meanwhile are neither lost nor counted twice.
+
+    Returns:
+        int: Number of quizzes with results
+    """
+    storage = get_storage()
+    quiz_ids = {result.get("quiz_id") for result in storage.get_quiz_results()}
+    quiz_modules = {
+        activity.get("quizId"): activity.get("moduleId")
+        for activity in file_helpers.load_json_file(ACTIVITIES_PATH, [])
+        if activity.get("quizId")
+    }
+
+    for quiz_id in quiz_ids:
+        module_id = quiz_modules.get(quiz_id)
+        storage.upsert_record(
+            QUIZ_STATS_PATH,
+            "stats",
+            {"scope": QUIZ_SCOPE, "id": quiz_id},
+            lambda _, quiz_id=quiz_id, module_id=module_id: build_quiz_stats(quiz_id, module_id),
+        )
+
+    for module_id in set(quiz_modules.values()):
+        module_quiz_ids = [quiz_id for quiz_id, module in quiz_modules.items() if module == module_id]
+        storage.upsert_record(
+            QUIZ_STATS_PATH,
+            "stats",
+            {"scope": MODULE_SCOPE, "id": module_id},
+            lambda _, module_id=module_id, quiz_ids=module_quiz_ids: build_module_stats(module_id, quiz_ids),
+        )
+
+    _store({"scope": META_SCOPE, "id": "stats", "version": STATS_VERSION, "updated": datetime.now().isoformat()})
+    return len(quiz_ids)
+
+
+def ensure_built():
+    """
+    Build the stats records if they were never built or STATS_VERSION changed
+
+    Called when a server process starts (see app.warm_up), so the
+    statistics endpoints never have to build anything.
+    """
+    if _is_current(_find(META_SCOPE, "stats")):
+        return
+    quizzes = rebuild_all()
+    logger.info(f"Built statistics of {quizzes} quizzes (stats version {STATS_VERSION})")
+
+
+def _median(score_counts, count):
+    # Middle of the sorted scores, read off the per-percentage counts
+    middle = [(count - 1) // 2, count // 2]
+    values = []
+    seen = 0
+    for score in sorted(score_counts, key=int):
+        seen += score_counts[score]
+        while middle and middle[0] < seen:
+            middle.pop(0)
+            values.append(int(score))
+    return sum(values) / 2
+
+
+def summarize(stats, scope=QUIZ_SCOPE):
+    """
+    Turn a stats record into the response served to teachers
+
+    Args:
+        stats (dict): Quiz or module stats record (None for no results)
+        scope (str): QUIZ_SCOPE or MODULE_SCOPE, for when stats is None
+
+    Returns:
+        dict: Attempts, the latest results with a known score, mean and
+            median score, score histogram, and per question correctness
+            (quizzes) or per quiz summaries (modules), all over each
+            student's latest result
+    """
+    stats = stats or {}
+    score_counts = stats.get("score_counts", {})
+    scored = sum(score_counts.values())
+
+    histogram = []
+    for start in range(0, 100, HISTOGRAM_BUCKET_SIZE):
+        end = start + HISTOGRAM_BUCKET_SIZE - 1
+        if end + 1 >= 100:
+            end = 100
+        histogram.append(
+            {
+                "from": start,
+                "to": end,
+                "count": sum(n for score, n in score_counts.items() if start <= int(score) <= end),
+            }
+        )
+
+    summary = {
+        "attempts": stats.get("attempts", 0),
+        # Latest results with a score, which the mean, median and histogram cover
+        "scored_attempts": scored,
+        "mean_score_percent": round(stats["score_total"] / scored, 1) if scored else None,
+        "median_score_percent": _median(score_counts, scored) if scored else None,
+        "histogram": histogram,
+        "updated": stats.get("updated"),
+    }
+    if stats.get("scope", scope) == MODULE_SCOPE:
+        summary["quizzes"] = [
+            {"quiz_id": quiz_id, **quiz} for quiz_id, quiz in stats.get("quizzes", {}).items()
+        ]
+    else:
+        summary["quiz_title"] = stats.get("quiz_title")
+        summary["students"] = len(stats.get("latest_attempts", {}))
+        summary["questions"] = [
+            {
+                "question_id": question_id,
+                "question": question["question"],
+                "answered": question["answered"],
+                "correct": question["correct"],
+                "correct_rate": round(question["correct"] / question["answered"], 3)
+                if question["answered"]
+                else None,
+            }
+            for question_id, question in stats.get("questions", {}).items()
+        ]
+    return summary
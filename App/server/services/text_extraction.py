@@ -1,26 +1,115 @@
-import fitz  # PyMuPDF for PDF processing
 import logging
-from config.app_config import logger
+import threading
+from concurrent.futures.process import BrokenProcessPool
 
+from config.app_config import (
+    PDF_EXTRACTION_WORKERS,
+    PDF_MAX_PAGES,
+    PDF_PARALLEL_MIN_PAGES,
+    logger,
+)
+from utils.lazy_import import lazy_import
+from utils.process_pool import spawn_process_pool
 
-def extract_text_from_pdf(pdf_path, max_pages=10):
+fitz = lazy_import("fitz")  # PyMuPDF for PDF processing, imported on first use
+
+# Put between the pages of a PDF, so chunking can split at page boundaries
+PAGE_SEPARATOR = "\n\f"
+
+# Worker processes for large PDFs, started on first use and then reused
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = spawn_process_pool(PDF_EXTRACTION_WORKERS)
+        return _pdf_pool
+
+
+def _reset_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+
+def extract_pages(pdf_path, start, stop):
+    """
+    Extract the text of a range of pages
+
+    Runs inside the worker processes, so it opens its own document.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        start (int): First page (zero-based)
+        stop (int): Page after the last one
+
+    Returns:
+        list: Text of each page
+    """
+    with fitz.open(pdf_path) as doc:
+        return [doc[page_num].get_text("text") for page_num in range(start, stop)]
+
+
+def _page_ranges(page_count, chunks):
+    size, extra = divmod(page_count, chunks)
+    ranges = []
+    start = 0
+    for i in range(chunks):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _extract_pages_parallel(pdf_path, page_count):
+    # A few chunks per worker keeps them busy when some pages are heavier
+    ranges = _page_ranges(page_count, PDF_EXTRACTION_WORKERS * 4)
+    pool = _get_pdf_pool()
+    futures = [pool.submit(extract_pages, pdf_path, start, stop) for start, stop in ranges]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_text_from_pdf(pdf_path, max_pages=PDF_MAX_PAGES):
     """
     Extract text content from a PDF file
 
+    PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into page
+    ranges that worker processes extract in parallel.
+
     Args:
         pdf_path (str): Path to the PDF file
-        max_pages (int): Maximum number of pages to process
+        max_pages (int): Maximum number of pages to process (0 or None for all)
 
     Returns:
-        str: Extracted text from the PDF
+        str: Extracted text from the PDF, with pages separated by PAGE_SEPARATOR
     """
     try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page_num in range(min(len(doc), max_pages)):
-            text += doc[page_num].get_text("text") + "\n"
-        doc.close()  # Close the document properly
-        return text.strip()
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+            if max_pages:
+                page_count = min(page_count, max_pages)
+
+            if PDF_EXTRACTION_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+                try:
+                    pages = _extract_pages_parallel(pdf_path, page_count)
+                except BrokenProcessPool as e:
+                    logger.warning(f"PDF worker pool failed, extracting serially: {str(e)}")
+                    _reset_pdf_pool()
+                    pages = [doc[page_num].get_text("text") for page_num in range(page_count)]
+            else:
+                pages = [doc[page_num].get_text("text") for page_num in range(page_count)]
+
+        logger.info(f"Extracted text from {page_count} PDF pages: {pdf_path}")
+        return PAGE_SEPARATOR.join(pages).strip()
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
         raise
@@ -1,15 +1,40 @@
 import os
-import whisper_timestamped as whisper
 import logging
-from config.app_config import logger
+from config.app_config import TRANSCRIPTION_MODE, WHISPER_LANGUAGE, WHISPER_MODEL, logger
+from services.transcription_worker import transcribe_remotely
+from services.whisper_pool import whisper, whisper_pool
 
 
-def transcribe_video(video_path):
+def transcribe_video(video_path, model_name=None, language=None):
+    """
+    Transcribe a video file, in this process or in a transcription worker
+
+    With TRANSCRIPTION_MODE=worker the file is sent to a transcription
+    worker process (see services/transcription_worker.py), so this process
+    never loads Whisper.
+
+    Args:
+        video_path (str): Path to the video file
+        model_name (str): Whisper model size (defaults to WHISPER_MODEL)
+        language (str): Spoken language (defaults to WHISPER_LANGUAGE)
+
+    Returns:
+        str: Transcribed text from the video, or an error message starting
+            with "[VIDEO TRANSCRIPTION ERROR]"
+    """
+    if TRANSCRIPTION_MODE == "worker":
+        return transcribe_remotely(video_path, model_name, language)
+    return transcribe_locally(video_path, model_name, language)
+
+
+def transcribe_locally(video_path, model_name=None, language=None):
     """
     Transcribe a video file using Whisper-Timestamped
 
     Args:
         video_path (str): Path to the video file
+        model_name (str): Whisper model size (defaults to WHISPER_MODEL)
+        language (str): Spoken language (defaults to WHISPER_LANGUAGE)
 
     Returns:
         str: Transcribed text from the video
@@ -26,12 +51,16 @@ def transcribe_video(video_path):
             raise FileNotFoundError(f"Video file not found: {video_path}")
 
         try:
-            # Load Whisper model - using 'base' for a balance of speed and accuracy
-            # Options: 'tiny', 'base', 'small', 'medium', 'large'
-            logger.info("Starting transcription with whisper-timestamped...")
+            # Borrow an already loaded model - 'base' by default for a balance
+            # of speed and accuracy. Options: 'tiny', 'base', 'small', 'medium', 'large'
+            model_name = model_name or WHISPER_MODEL
+            logger.info(f"Starting transcription with whisper-timestamped ({model_name})...")
 
-            # Transcribe the video - whisper-timestamped handles audio extraction automatically
-            result = whisper.transcribe(model="base", audio=video_path, language="en")
+            with whisper_pool.model(model_name) as model:
+                # Transcribe the video - whisper-timestamped handles audio extraction automatically
+                result = whisper.transcribe(
+                    model, video_path, language=language or WHISPER_LANGUAGE
+                )
 
             # Extract the text from segments
             if "segments" in result:
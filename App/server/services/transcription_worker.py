@@ -0,0 +1,284 @@
+"""
+Transcription worker process
+
+Runs Whisper outside the web server. Start one or more workers from the
+server directory, each on its own address:
+
+    python -m services.transcription_worker --address 127.0.0.1:6001
+
+and run the web server with TRANSCRIPTION_MODE=worker and
+TRANSCRIPTION_WORKER_ADDRESSES listing the workers. Workers receive file
+paths, so they must run on the same machine as the web server.
+
+Messages are pickled, so anyone who can connect to a worker can run code
+in it. Workers and the server must share a secret TRANSCRIPTION_WORKER_AUTHKEY
+and neither starts without one; bind workers to 127.0.0.1 only.
+"""
+import os
+import time
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from config.app_config import (
+    TRANSCRIPTION_MODE,
+    TRANSCRIPTION_WORKER_ADDRESSES,
+    TRANSCRIPTION_WORKER_AUTHKEY,
+    TRANSCRIPTION_WORKER_TIMEOUT,
+    WHISPER_PRELOAD,
+    logger,
+)
+
+ERROR_PREFIX = "[VIDEO TRANSCRIPTION ERROR]"
+
+# Seconds to wait for a worker's answer to a stats request
+STATS_TIMEOUT = 2
+
+
+def require_authkey(authkey):
+    """
+    Check that a key for worker connections is configured
+
+    Args:
+        authkey (bytes): Key from TRANSCRIPTION_WORKER_AUTHKEY
+
+    Raises:
+        RuntimeError: If the key is empty
+    """
+    if not authkey:
+        raise RuntimeError(
+            "TRANSCRIPTION_WORKER_AUTHKEY must be set to a shared secret to use transcription workers"
+        )
+
+
+def _request(address, message, timeout, authkey):
+    # One connection per request; transcriptions take far longer than connecting
+    with Client(address, authkey=authkey) as connection:
+        connection.send(message)
+        if not connection.poll(timeout):
+            raise TimeoutError(f"No answer from transcription worker within {timeout:.0f}s")
+        return connection.recv()
+
+
+class TranscriptionWorkerClient:
+    """
+    Sends transcriptions to worker processes
+
+    Each request goes to the worker with the fewest requests in flight from
+    this process; a worker that can't be reached is skipped and the next
+    one tried. A request that times out is not retried elsewhere.
+    """
+
+    def __init__(
+        self,
+        addresses=TRANSCRIPTION_WORKER_ADDRESSES,
+        timeout=TRANSCRIPTION_WORKER_TIMEOUT,
+        authkey=TRANSCRIPTION_WORKER_AUTHKEY,
+    ):
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        self.authkey = authkey
+        self._in_flight = {address: 0 for address in self.addresses}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def _pick(self, tried):
+        with self._lock:
+            candidates = [address for address in self.addresses if address not in tried]
+            if not candidates:
+                return None
+            # Rotate the starting point so idle workers share the load
+            self._next = (self._next + 1) % len(candidates)
+            candidates = candidates[self._next :] + candidates[: self._next]
+            address = min(candidates, key=lambda candidate: self._in_flight[candidate])
+            self._in_flight[address] += 1
+            return address
+
+    def transcribe(self, video_path, model_name=None, language=None):
+        """
+        Transcribe a file in a worker process
+
+        Args:
+            video_path (str): Path to the video or audio file
+            model_name (str): Whisper model size (defaults to the worker's WHISPER_MODEL)
+            language (str): Spoken language (defaults to the worker's WHISPER_LANGUAGE)
+
+        Returns:
+            str: Transcribed text, or an error message starting with
+                "[VIDEO TRANSCRIPTION ERROR]"
+        """
+        message = {
+            "op": "transcribe",
+            "path": os.path.abspath(video_path),
+            "model": model_name,
+            "language": language,
+        }
+        with self._lock:
+            self.requests += 1
+
+        tried = set()
+        last_error = "no transcription workers configured"
+        while True:
+            address = self._pick(tried)
+            if address is None:
+                break
+            tried.add(address)
+            try:
+                start = time.perf_counter()
+                reply = _request(address, message, self.timeout, self.authkey)
+            except TimeoutError as e:
+                # The worker is still transcribing, so sending the file to
+                # another one would only do the work twice
+                last_error = f"{address[0]}:{address[1]}: {str(e)}"
+                logger.error(f"Transcription worker {last_error}")
+                break
+            except (OSError, EOFError, AuthenticationError) as e:
+                # OSError covers refused connections; AuthenticationError a
+                # worker with a different key
+                last_error = f"{address[0]}:{address[1]}: {str(e)}"
+                logger.warning(f"Transcription worker {last_error}")
+                continue
+            finally:
+                with self._lock:
+                    self._in_flight[address] -= 1
+
+            logger.info(
+                f"Transcription worker {address[0]}:{address[1]} finished "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+            if reply.get("ok"):
+                return reply["text"]
+            last_error = reply.get("error", "unknown error")
+            break
+
+        with self._lock:
+            self.failures += 1
+        return f"{ERROR_PREFIX} Transcription worker failed: {last_error}"
+
+    def stats(self):
+        """
+        Ask every worker for its status
+
+        Returns:
+            dict: Request counters and, per worker address, its Whisper
+                pool statistics or the error reaching it
+        """
+        workers = {}
+        for address in self.addresses:
+            name = f"{address[0]}:{address[1]}"
+            try:
+                reply = _request(address, {"op": "stats"}, STATS_TIMEOUT, self.authkey)
+                workers[name] = {"reachable": True, **reply.get("stats", {})}
+            except (OSError, EOFError, AuthenticationError) as e:
+                workers[name] = {"reachable": False, "error": str(e)}
+            with self._lock:
+                workers[name]["in_flight"] = self._in_flight[address]
+        with self._lock:
+            return {"requests": self.requests, "failures": self.failures, "workers": workers}
+
+
+# Shared client used when TRANSCRIPTION_MODE is "worker"; the server
+# refuses to start in that mode without a key
+if TRANSCRIPTION_MODE == "worker":
+    require_authkey(TRANSCRIPTION_WORKER_AUTHKEY)
+transcription_workers = TranscriptionWorkerClient()
+
+
+def transcribe_remotely(video_path, model_name=None, language=None):
+    """Transcribe a file in a worker process (see TranscriptionWorkerClient.transcribe)"""
+    return transcription_workers.transcribe(video_path, model_name, language)
+
+
+def _handle(connection, state):
+    # Imported here: the web server imports this module without Whisper
+    from services.transcription import transcribe_locally
+    from services.whisper_pool import whisper_pool
+
+    with connection:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+
+        op = message.get("op")
+        if op == "transcribe":
+            with state["lock"]:
+                state["active"] += 1
+            try:
+                text = transcribe_locally(message["path"], message.get("model"), message.get("language"))
+                reply = {"ok": True, "text": text}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            finally:
+                with state["lock"]:
+                    state["active"] -= 1
+                    state["completed"] += 1
+        elif op == "stats":
+            with state["lock"]:
+                reply = {
+                    "ok": True,
+                    "stats": {
+                        "pid": os.getpid(),
+                        "active": state["active"],
+                        "completed": state["completed"],
+                        "models": whisper_pool.stats(),
+                    },
+                }
+        else:
+            reply = {"ok": False, "error": f"Unknown operation: {op}"}
+
+        try:
+            connection.send(reply)
+        except (OSError, EOFError):
+            logger.warning("Client went away before the transcription finished")
+
+
+def serve(address, authkey=TRANSCRIPTION_WORKER_AUTHKEY):
+    """
+    Accept transcription requests until the process is stopped
+
+    Each connection is handled on its own thread; the Whisper pool limits
+    how many transcriptions actually run at once (WHISPER_POOL_SIZE).
+
+    Args:
+        address (tuple): (host, port) to listen on
+        authkey (bytes): Key clients must present
+
+    Raises:
+        RuntimeError: If no key is configured
+    """
+    require_authkey(authkey)
+    if WHISPER_PRELOAD:
+        from services.whisper_pool import whisper_pool
+
+        whisper_pool.warm_up()
+
+    state = {"active": 0, "completed": 0, "lock": threading.Lock()}
+    with Listener(address, authkey=authkey) as listener:
+        logger.info(f"Transcription worker {os.getpid()} listening on {address[0]}:{address[1]}")
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                # e.g. a client with the wrong key
+                logger.warning(f"Rejected transcription worker connection: {str(e)}")
+                continue
+            threading.Thread(target=_handle, args=(connection, state), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a transcription worker")
+    default = TRANSCRIPTION_WORKER_ADDRESSES[0] if TRANSCRIPTION_WORKER_ADDRESSES else ("127.0.0.1", 6001)
+    parser.add_argument(
+        "--address",
+        default=f"{default[0]}:{default[1]}",
+        help="host:port to listen on (default: first of TRANSCRIPTION_WORKER_ADDRESSES)",
+    )
+    args = parser.parse_args()
+    if not TRANSCRIPTION_WORKER_AUTHKEY:
+        parser.error("set TRANSCRIPTION_WORKER_AUTHKEY to a shared secret (see README)")
+    host, _, port = args.address.rpartition(":")
+    serve((host, int(port)))
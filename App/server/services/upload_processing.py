@@ -0,0 +1,189 @@
+import re
+
+from config.app_config import (
+    EXTRACTION_CACHE_FOLDER,
+    EXTRACTION_CACHE_MAX_BYTES,
+    PDF_MAX_PAGES,
+    WHISPER_LANGUAGE,
+    WHISPER_MODEL,
+    logger,
+)
+from services.content_preparation import normalize_content
+from services.text_extraction import PAGE_SEPARATOR, extract_text_from_pdf, extract_text_from_file
+from services.transcription import transcribe_video
+from utils.disk_cache import DiskCache, file_sha256, make_cache_key
+
+VIDEO_EXTENSIONS = {"mp4", "mov", "avi", "webm"}
+AUDIO_EXTENSIONS = {"mp3", "wav", "ogg", "m4a"}
+
+YOUTUBE_URL_PATTERNS = [
+    re.compile(r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/watch\?v=([^&]+)'),
+    re.compile(r'(?:https?:\/\/)?(?:www\.)?youtu\.be\/([^?]+)'),
+]
+
+# Text extracted from uploads, so re-uploading the same file is instant
+extraction_cache = DiskCache(
+    EXTRACTION_CACHE_FOLDER, EXTRACTION_CACHE_MAX_BYTES, name="extraction cache"
+)
+
+
+def cached_extraction(file_path, extractor, params, extract, cacheable=None):
+    """
+    Run an extractor on a file, reusing an earlier result for the same contents
+
+    Args:
+        file_path (str): Path of the file
+        extractor (str): Name of the extractor (e.g. "whisper")
+        params (dict): Settings that change the extractor's output
+        extract (callable): Produces the text when it isn't cached
+        cacheable (callable): Decides whether a fresh result may be stored
+            (e.g. not error messages); defaults to storing everything
+
+    Returns:
+        str: The extracted text
+    """
+    key = make_cache_key(file_sha256(file_path), extractor, params)
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        logger.info(f"Using cached {extractor} output for: {file_path}")
+        return cached
+
+    text = extract()
+    if cacheable is None or cacheable(text):
+        extraction_cache.set(key, text)
+    return text
+
+
+def is_transcription_error(text):
+    """Check whether transcribe_video returned an error message"""
+    return text.startswith("[VIDEO TRANSCRIPTION ERROR]") or text.startswith("[AUDIO TRANSCRIPTION ERROR]")
+
+
+def extract_youtube_video_id(url):
+    """
+    Extract the video ID from a YouTube URL
+
+    Args:
+        url (str): youtube.com/watch or youtu.be URL
+
+    Returns:
+        str: Video ID, or None if the URL isn't recognised
+    """
+    for pattern in YOUTUBE_URL_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def process_youtube_url(url):
+    """
+    Fetch the transcript of a YouTube video
+
+    Args:
+        url (str): YouTube URL
+
+    Returns:
+        dict: File info with the transcript as "content"; if the transcript
+            can't be fetched, a fallback text and the "error"
+    """
+    video_id = extract_youtube_video_id(url)
+    if not video_id:
+        raise ValueError(f"Could not extract video ID from YouTube URL: {url}")
+
+    logger.info(f"Processing YouTube video: {video_id}")
+    info = {
+        "filename": f"youtube_{video_id}.txt",
+        "type": "youtube",
+        "videoId": video_id,
+        "url": url,
+    }
+
+    try:
+        from youtube_transcript_api import YouTubeTranscriptApi
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+
+        # Format the transcript
+        transcript_text = f"YouTube Video Transcript (ID: {video_id}):\n\n"
+        transcript_text += "".join(f"{item['text']} " for item in transcript_list)
+
+        info["content"] = normalize_content(transcript_text)
+        logger.info(f"Successfully processed YouTube transcript for video {video_id}")
+    except Exception as e:
+        logger.error(f"Error fetching YouTube transcript: {str(e)}")
+        # Fallback message when transcript can't be fetched
+        info["content"] = f"[YouTube video content from: {url}] - Transcript unavailable. The quiz generator will consider the video title and description only."
+        info["error"] = str(e)
+
+    return info
+
+
+def process_uploaded_file(file_path, filename):
+    """
+    Extract the text content of a saved upload
+
+    Videos and audio are transcribed, PDFs and text files are read.
+
+    Args:
+        file_path (str): Path of the saved file
+        filename (str): Secure name of the file
+
+    Returns:
+        dict: File info with the extracted text as "content"; a failed
+            transcription also sets "error" (e.g. "Video transcription
+            failed") and "message"
+    """
+    file_extension = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+    info = {"filename": filename, "path": file_path}
+
+    if file_extension in VIDEO_EXTENSIONS or file_extension in AUDIO_EXTENSIONS:
+        kind = "video" if file_extension in VIDEO_EXTENSIONS else "audio"
+        logger.info(f"Starting {kind} transcription for: {filename}")
+        content = cached_extraction(
+            file_path,
+            "whisper",
+            {"model": WHISPER_MODEL, "language": WHISPER_LANGUAGE},
+            lambda: transcribe_video(file_path),
+            cacheable=lambda text: not is_transcription_error(text),
+        )
+        logger.info(f"Transcribed {len(content)} characters from {kind}: {filename}")
+
+        # Check if transcription failed and contains an error message
+        if is_transcription_error(content):
+            info["error"] = f"{kind.capitalize()} transcription failed"
+            info["message"] = content
+    elif file_extension == "pdf":
+        content = cached_extraction(
+            file_path,
+            "pdf",
+            {"max_pages": PDF_MAX_PAGES, "page_separator": PAGE_SEPARATOR},
+            lambda: extract_text_from_pdf(file_path, PDF_MAX_PAGES),
+        )
+    elif file_extension in ["doc", "docx"]:
+        # For simplicity, assuming .doc/.docx files are handled elsewhere or by a library
+        content = "Document content (processing not shown in this example)"
+    else:
+        # For text files, read directly
+        try:
+            content = extract_text_from_file(file_path)
+        except Exception:
+            content = f"Failed to extract content from {filename}"
+
+    info["content"] = content
+    return info
+
+
+def summarize_content(info):
+    """
+    Shorten the content of a file info dict for API responses
+
+    Args:
+        info (dict): File info from process_uploaded_file/process_youtube_url
+
+    Returns:
+        dict: Copy with "content" cut to 200 characters
+    """
+    content = info.get("content", "")
+    summary = dict(info)
+    summary["content"] = content[:200] + "..." if len(content) > 200 else content
+    return summary
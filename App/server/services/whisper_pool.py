@@ -0,0 +1,154 @@
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+from config.app_config import WHISPER_DEVICE, WHISPER_MODEL, WHISPER_POOL_SIZE, logger
+from utils.lazy_import import lazy_import
+
+# Imported on first use, as it pulls in torch
+whisper = lazy_import("whisper_timestamped")
+
+
+class _ModelSlot:
+    """Loaded instances of one model size, plus their counters"""
+
+    def __init__(self, size):
+        self.idle = queue.LifoQueue()
+        self.size = size
+        self.loaded = 0
+        self.load_seconds = 0.0
+        self.acquisitions = 0
+        self.reuses = 0
+        self.waits = 0
+
+
+class WhisperModelPool:
+    """
+    Keeps loaded Whisper models in memory and lends them out to requests
+
+    Each model size is loaded from disk the first time it is needed and then
+    reused. A Whisper model must not transcribe two files at once, so each
+    size has up to pool_size instances; a request that finds them all busy
+    waits for one to be returned.
+    """
+
+    def __init__(self, pool_size=WHISPER_POOL_SIZE, device=WHISPER_DEVICE, loader=None):
+        self.pool_size = max(1, pool_size)
+        self.device = device
+        self._loader = loader
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, model_name):
+        with self._lock:
+            slot = self._slots.get(model_name)
+            if slot is None:
+                slot = self._slots[model_name] = _ModelSlot(self.pool_size)
+            return slot
+
+    def _load(self, model_name, slot):
+        logger.info(f"Loading Whisper model '{model_name}'...")
+        start = time.perf_counter()
+        try:
+            loader = self._loader or whisper.load_model
+            model = loader(model_name, device=self.device)
+        except BaseException:
+            with self._lock:
+                slot.loaded -= 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            slot.load_seconds += elapsed
+        logger.info(f"Loaded Whisper model '{model_name}' in {elapsed:.2f}s")
+        return model
+
+    @contextmanager
+    def model(self, model_name=None):
+        """
+        Borrow a loaded model for the duration of a with block
+
+        Args:
+            model_name (str): Whisper model size (defaults to WHISPER_MODEL)
+
+        Yields:
+            The loaded Whisper model, reserved for the caller
+        """
+        model_name = model_name or WHISPER_MODEL
+        slot = self._slot(model_name)
+
+        model = None
+        waited = False
+        with self._lock:
+            slot.acquisitions += 1
+
+        while model is None:
+            with self._lock:
+                try:
+                    model = slot.idle.get_nowait()
+                    slot.reuses += 1
+                    break
+                except queue.Empty:
+                    pass
+                if slot.loaded < slot.size:
+                    # Reserve the instance, then load it outside the lock
+                    slot.loaded += 1
+                    load = True
+                else:
+                    load = False
+                    if not waited:
+                        slot.waits += 1
+                        waited = True
+
+            if load:
+                model = self._load(model_name, slot)
+                break
+
+            # All instances are busy; the timeout lets us take over a slot
+            # freed by a failed load
+            try:
+                model = slot.idle.get(timeout=0.5)
+                with self._lock:
+                    slot.reuses += 1
+            except queue.Empty:
+                pass
+
+        try:
+            yield model
+        finally:
+            slot.idle.put(model)
+
+    def warm_up(self, model_name=None):
+        """
+        Load a model ahead of the first request that needs it
+
+        Args:
+            model_name (str): Whisper model size (defaults to WHISPER_MODEL)
+        """
+        with self.model(model_name):
+            pass
+
+    def stats(self):
+        """
+        Report load time and reuse counters for each model size
+
+        Returns:
+            dict: Counters keyed by model size
+        """
+        with self._lock:
+            return {
+                name: {
+                    "instances": slot.loaded,
+                    "idle": slot.idle.qsize(),
+                    "max_instances": slot.size,
+                    "load_seconds": round(slot.load_seconds, 3),
+                    "acquisitions": slot.acquisitions,
+                    "reuses": slot.reuses,
+                    "waits": slot.waits,
+                }
+                for name, slot in self._slots.items()
+            }
+
+
+# Shared pool used by the transcription service
+whisper_pool = WhisperModelPool()
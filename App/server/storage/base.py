@@ -0,0 +1,238 @@
+import os
+
+from config.app_config import DATABASE_FOLDER
+
+# Documents with a dedicated row layout in table-based backends
+QUIZZES_DOCUMENT = "quizzes.json"
+ACTIVITIES_DOCUMENT = "activities.json"
+STUDENT_RESULTS_DOCUMENT = "student_results.json"
+# Completion streams, mapped to the key of their record list
+COMPLETION_DOCUMENTS = {
+    "completions.json": "completions",
+    "activity_completions.json": "completions",
+    "quiz_completions.json": "quiz_completions",
+}
+
+
+def document_name(filepath):
+    """
+    Get the name of a document relative to DATABASE_FOLDER
+
+    Args:
+        filepath (str): Path to the JSON document
+
+    Returns:
+        str: Relative name using forward slashes (e.g. "forum/module-1.json"),
+            or None if the file lives outside DATABASE_FOLDER
+    """
+    relative = os.path.relpath(os.path.abspath(filepath), DATABASE_FOLDER)
+    if relative.startswith(os.pardir):
+        return None
+    return relative.replace(os.sep, "/")
+
+
+def forum_module_id(name):
+    """
+    Get the module ID of a forum posts document
+
+    Args:
+        name (str): Document name relative to DATABASE_FOLDER
+
+    Returns:
+        str: Module ID, or None if the document is not a list of forum posts
+    """
+    if not name or not name.startswith("forum/") or not name.endswith(".json"):
+        return None
+    module_id = name[len("forum/"):-len(".json")]
+    if "/" in module_id or module_id.endswith("status"):
+        return None
+    return module_id
+
+
+def completion_stream(name):
+    """
+    Get the stream name of a completions document
+
+    Args:
+        name (str): Document name relative to DATABASE_FOLDER
+
+    Returns:
+        str: Stream name (e.g. "activity_completions"), or None
+    """
+    if name in COMPLETION_DOCUMENTS:
+        return name[: -len(".json")]
+    return None
+
+
+class StorageBackend:
+    """
+    Interface shared by all storage backends
+
+    Whole-document access (load_document/save_document) backs the
+    load_json_file/save_json_file API in utils.file_helpers. The row-level
+    methods let hot write paths touch only the affected records.
+    """
+
+    name = "base"
+
+    def load_document(self, filepath, default_value=None):
+        """
+        Load a whole JSON document
+
+        Args:
+            filepath (str): Path to the JSON document
+            default_value: Value to return if the document doesn't exist
+
+        Returns:
+            object: Parsed document or default value
+        """
+        raise NotImplementedError
+
+    def save_document(self, filepath, data, indent=2):
+        """
+        Replace a whole JSON document
+
+        Args:
+            filepath (str): Path to the JSON document
+            data: Document to store
+            indent (int): JSON indentation level (file-based backends only)
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        raise NotImplementedError
+
+    def update_document(self, filepath, update, default_value=None):
+        """
+        Run a read-modify-write cycle on a document atomically
+
+        The document is loaded, passed to update (which mutates it in place)
+        and saved, without any other writer interleaving. If update raises,
+        nothing is saved and the exception propagates.
+
+        Args:
+            filepath (str): Path to the JSON document
+            update (callable): Function taking the document and returning a
+                result for the caller
+            default_value: Document to start from if it doesn't exist
+
+        Returns:
+            object: Whatever update returned
+        """
+        raise NotImplementedError
+
+    def save_quiz_result(self, result):
+        """
+        Store a quiz result, replacing the student's previous result for the
+        same quiz and incrementing its attempt counter
+
+        Args:
+            result (dict): Quiz result with student_id and quiz_id
+
+        Returns:
+            tuple: (the result as stored, with its attempts count; the
+                result it replaced, or None)
+        """
+        raise NotImplementedError
+
+    def get_quiz_results(self, student_id=None, quiz_id=None, newest_first=False, limit=None):
+        """
+        Get stored quiz results, optionally filtered
+
+        Args:
+            student_id (str): Only return results for this student
+            quiz_id (str): Only return results for this quiz
+            newest_first (bool): Order by timestamp, newest first, instead of
+                storage order
+            limit (int): Return at most this many results
+
+        Returns:
+            list: Matching quiz results
+        """
+        raise NotImplementedError
+
+    def append_record(self, filepath, list_key, record):
+        """
+        Append a single record to a list inside a document
+
+        Args:
+            filepath (str): Path to the JSON document
+            list_key (str): Key of the record list (e.g. "completions")
+            record (dict): Record to append
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        raise NotImplementedError
+
+    def upsert_record(self, filepath, list_key, match, update):
+        """
+        Create or replace the first record of a list matching some field values
+
+        Args:
+            filepath (str): Path to the JSON document
+            list_key (str): Key of the record list
+            match (dict): Field values identifying the record
+            update (callable): Receives a copy of the existing record (or
+                None) and returns the record to store, or None to leave the
+                list unchanged
+
+        Returns:
+            dict: The stored record, or None if nothing was written
+        """
+        raise NotImplementedError
+
+    def find_record(self, filepath, list_key, match):
+        """
+        Get the first record of a list matching some field values
+
+        Args:
+            filepath (str): Path to the JSON document
+            list_key (str): Key of the record list
+            match (dict): Field values identifying the record
+
+        Returns:
+            dict: Copy of the record, or None if there is none
+        """
+        raise NotImplementedError
+
+    def count_records(self, filepath, list_key):
+        """
+        Count the records of a list inside a document
+
+        Args:
+            filepath (str): Path to the JSON document
+            list_key (str): Key of the record list
+
+        Returns:
+            int: Number of records
+        """
+        raise NotImplementedError
+
+    def add_forum_post(self, module_id, post):
+        """
+        Add a post to a module's forum
+
+        Args:
+            module_id (str): ID of the module
+            post (dict): Post to add
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        raise NotImplementedError
+
+    def add_forum_comment(self, module_id, post_id, comment):
+        """
+        Add a comment to a forum post
+
+        Args:
+            module_id (str): ID of the module
+            post_id (str): ID of the post
+            comment (dict): Comment to add
+
+        Returns:
+            bool: True if successful, False if saving failed, or None if the
+                post doesn't exist
+        """
+        raise NotImplementedError
@@ -0,0 +1,364 @@
+import os
+import json
+import threading
+
+from config.app_config import EVENT_LOG_COMPACT_EVERY, EVENT_LOG_FSYNC, logger
+from storage.record_index import RecordIndex
+from utils.document_cache import copy_json_value, document_cache, file_signature
+from utils.file_lock import file_lock
+
+# Key in the snapshot recording the last event folded into it, so events
+# still in the log after an interrupted compaction are not applied twice
+SEQUENCE_KEY = "_event_sequence"
+
+
+class EventLog:
+    """
+    Append-only JSONL log of changes to one record list, plus its snapshot
+
+    The snapshot is the regular JSON document (e.g. student_results.json).
+    Every write appends one event line to "<name>.events.jsonl" instead of
+    rewriting the document, so a write costs O(1) regardless of history size.
+    The current state is the snapshot with the log replayed on top; it is
+    kept in memory and caught up from the log's tail on every read, so all
+    processes see every committed event. Once the log holds
+    EVENT_LOG_COMPACT_EVERY events it is folded into a new snapshot.
+
+    Events are either {"op": "append", "record": ...} or
+    {"op": "set", "index": i, "record": ...}, each with a sequence number.
+
+    The in-memory state keeps a RecordIndex for the upsert key and for each
+    of index_fields, updated as events are applied.
+    """
+
+    def __init__(
+        self,
+        snapshot_path,
+        list_key,
+        key_fields=(),
+        index_fields=(),
+        compact_every=EVENT_LOG_COMPACT_EVERY,
+    ):
+        self.snapshot_path = snapshot_path
+        self.log_path = os.path.splitext(snapshot_path)[0] + ".events.jsonl"
+        self.list_key = list_key
+        self.key_fields = tuple(key_fields)
+        self.compact_every = compact_every
+
+        self._indexes = {}
+        for fields in (self.key_fields, *index_fields):
+            if fields:
+                self._indexes[tuple(fields)] = RecordIndex(fields)
+
+        self._lock = threading.RLock()
+        self._data = None
+        self._sequence = 0
+        self._snapshot_signature = None
+        self._log_offset = 0
+        self._log_events = 0
+
+    # State maintenance
+
+    def _rebuild_indexes(self):
+        for index in self._indexes.values():
+            index.rebuild(self._data[self.list_key])
+
+    def _load_snapshot(self):
+        signature = file_signature(self.snapshot_path)
+        data = {self.list_key: []}
+        if signature is not None and signature[1] > 0:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Unreadable snapshot {self.snapshot_path}: {e}")
+            if not isinstance(data, dict):
+                raise ValueError(f"Snapshot {self.snapshot_path} is not a JSON object")
+            data.setdefault(self.list_key, [])
+
+        self._sequence = data.pop(SEQUENCE_KEY, 0)
+        self._data = data
+        self._rebuild_indexes()
+        self._snapshot_signature = signature
+        self._log_offset = 0
+        self._log_events = 0
+
+    def _apply(self, event):
+        records = self._data[self.list_key]
+        record = event["record"]
+
+        if event["op"] == "set" and event["index"] < len(records):
+            position = event["index"]
+            previous = records[position]
+            records[position] = record
+            for index in self._indexes.values():
+                index.replace(position, previous, record)
+        else:
+            records.append(record)
+            for index in self._indexes.values():
+                index.add(len(records) - 1, record)
+
+    def _read_log_tail(self):
+        """Apply complete events written since the last read; False if the log shrank"""
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            size = 0
+
+        if size < self._log_offset:
+            return False
+        if size == self._log_offset:
+            return True
+
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            chunk = f.read(size - self._log_offset)
+
+        # A line without its newline is an append still in progress (or cut
+        # short by a crash); leave it for later
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event.get("seq", 0) <= self._sequence:
+                continue  # already folded into the snapshot
+            self._apply(event)
+            self._sequence = event["seq"]
+            self._log_events += 1
+
+        self._log_offset += end
+        return True
+
+    def _refresh(self):
+        if self._data is None or file_signature(self.snapshot_path) != self._snapshot_signature:
+            self._load_snapshot()
+        if not self._read_log_tail():
+            self._load_snapshot()
+            self._read_log_tail()
+
+    def _is_current(self):
+        if self._data is None:
+            return False
+        if file_signature(self.snapshot_path) != self._snapshot_signature:
+            return False
+        try:
+            return os.path.getsize(self.log_path) == self._log_offset
+        except OSError:
+            return self._log_offset == 0
+
+    def _document(self):
+        return copy_json_value(self._data)
+
+    # Writing
+
+    def _write_event(self, op, record, index=None):
+        # Drop a partial line left behind by a crashed writer
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self._log_offset:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(self._log_offset)
+
+        event = {"seq": self._sequence + 1, "op": op, "record": copy_json_value(record)}
+        if index is not None:
+            event["index"] = index
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+        with open(self.log_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            if EVENT_LOG_FSYNC:
+                os.fsync(f.fileno())
+
+        self._apply(event)
+        self._sequence = event["seq"]
+        self._log_offset += len(line)
+        self._log_events += 1
+
+        if self._log_events >= self.compact_every:
+            self._write_snapshot(self._data)
+
+    def _write_snapshot(self, data):
+        # Imported here: the JSON backend imports this module
+        from storage.json_backend import write_json_atomic
+
+        data = dict(data)
+        data.setdefault(self.list_key, [])
+        data[SEQUENCE_KEY] = self._sequence
+        write_json_atomic(self.snapshot_path, data)
+        # Any event left in the log now has seq <= SEQUENCE_KEY and is skipped
+        with open(self.log_path, "wb"):
+            pass
+
+        data.pop(SEQUENCE_KEY)
+        self._data = data
+        self._rebuild_indexes()
+        self._snapshot_signature = file_signature(self.snapshot_path)
+        self._log_offset = 0
+        self._log_events = 0
+        document_cache.invalidate(self.snapshot_path)
+        logger.info(f"Compacted event log into {self.snapshot_path}")
+
+    # Public API
+
+    def _catch_up(self):
+        if not self._is_current():
+            with file_lock(self.snapshot_path):
+                self._refresh()
+
+    def view(self):
+        """
+        Get the current document (snapshot plus replayed events)
+
+        Returns:
+            dict: Copy of the document
+        """
+        with self._lock:
+            self._catch_up()
+            return self._document()
+
+    def count(self):
+        """
+        Count the records in the current document
+
+        Returns:
+            int: Number of records
+        """
+        with self._lock:
+            self._catch_up()
+            return len(self._data[self.list_key])
+
+    def find(self, match=None, newest_first=False, limit=None):
+        """
+        Get the records matching some field values
+
+        Uses the index on exactly the matched fields if there is one, and
+        scans the list otherwise.
+
+        Args:
+            match (dict): Field values to match (None for all records)
+            newest_first (bool): Order by timestamp, descending, instead of
+                storage order
+            limit (int): Return at most this many records
+
+        Returns:
+            list: Copies of the matching records
+        """
+        match = {k: v for k, v in (match or {}).items() if v is not None}
+        with self._lock:
+            self._catch_up()
+            records = self._data[self.list_key]
+
+            index = next(
+                (i for fields, i in self._indexes.items() if set(fields) == set(match)),
+                None,
+            )
+
+            if index is not None:
+                key = tuple(match[field] for field in index.key_fields)
+                positions = index.positions(key, newest_first)
+            else:
+                positions = [
+                    i
+                    for i, record in enumerate(records)
+                    if all(record.get(k) == v for k, v in match.items())
+                ]
+                if newest_first:
+                    positions.sort(
+                        key=lambda i: records[i].get("timestamp") or "", reverse=True
+                    )
+
+            if limit is not None:
+                positions = positions[:limit]
+            return [copy_json_value(records[i]) for i in positions]
+
+    def append(self, record):
+        """
+        Append a record to the list
+
+        Args:
+            record (dict): Record to append
+        """
+        with self._lock, file_lock(self.snapshot_path):
+            self._refresh()
+            self._write_event("append", record)
+
+    def upsert(self, match, update):
+        """
+        Create or replace the first record matching some field values
+
+        Args:
+            match (dict): Field values identifying the record
+            update (callable): Receives a copy of the existing record (or
+                None) and returns the record to store, or None to leave the
+                list unchanged
+
+        Returns:
+            dict: The stored record, or None if nothing was written
+        """
+        with self._lock, file_lock(self.snapshot_path):
+            self._refresh()
+            records = self._data[self.list_key]
+
+            if self.key_fields and set(match) == set(self.key_fields):
+                index = self._indexes[self.key_fields].first(
+                    tuple(match[field] for field in self.key_fields)
+                )
+            else:
+                index = next(
+                    (
+                        i
+                        for i, record in enumerate(records)
+                        if all(record.get(k) == v for k, v in match.items())
+                    ),
+                    None,
+                )
+
+            existing = copy_json_value(records[index]) if index is not None else None
+            record = update(existing)
+            if record is None:
+                return None
+
+            if index is None:
+                self._write_event("append", record)
+            else:
+                self._write_event("set", record, index)
+            return copy_json_value(record)
+
+    def update(self, update):
+        """
+        Run a read-modify-write cycle over the whole document
+
+        Used for rare bulk changes (e.g. deleting all results of a quiz);
+        the result is written as a new snapshot.
+
+        Args:
+            update (callable): Mutates the document in place and returns a
+                result for the caller
+
+        Returns:
+            object: Whatever update returned
+        """
+        with self._lock, file_lock(self.snapshot_path):
+            self._refresh()
+            data = self._document()
+            result = update(data)
+            self._write_snapshot(data)
+            return result
+
+    def replace(self, data):
+        """
+        Replace the whole document with a new snapshot
+
+        Args:
+            data (dict): New document
+        """
+        self.update(lambda document: (document.clear(), document.update(copy_json_value(data))))
+
+    def compact(self):
+        """
+        Fold all logged events into a new snapshot
+        """
+        with self._lock, file_lock(self.snapshot_path):
+            self._refresh()
+            if self._log_events:
+                self._write_snapshot(self._data)
@@ -0,0 +1,44 @@
+import threading
+
+from config.app_config import STORAGE_BACKEND, logger
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    """
+    Create a storage backend by name
+
+    Args:
+        backend (str): Backend name ("json" or "sqlite")
+
+    Returns:
+        StorageBackend: New backend instance
+    """
+    if backend == "sqlite":
+        from storage.sqlite_backend import SqliteStorage
+
+        return SqliteStorage()
+    if backend != "json":
+        logger.warning(f"Unknown storage backend '{backend}', using JSON files")
+
+    from storage.json_backend import JsonStorage
+
+    return JsonStorage()
+
+
+def get_storage():
+    """
+    Get the process-wide storage backend configured by STORAGE_BACKEND
+
+    Returns:
+        StorageBackend: Shared backend instance
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+                logger.info(f"Using {_storage.name} storage backend")
+    return _storage
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import tempfile
+import threading
+
+from config.app_config import DATABASE_FOLDER, FORUM_FOLDER, JSON_WRITE_RETRIES, logger
+from storage.base import (
+    StorageBackend,
+    COMPLETION_DOCUMENTS,
+    STUDENT_RESULTS_DOCUMENT,
+    document_name,
+)
+from storage.event_log import EventLog
+from utils.document_cache import document_cache, file_signature
+from utils.file_lock import file_lock
+
+
+def write_json_atomic(filepath, data, indent=2):
+    """
+    Write a JSON file so that readers only ever see the old or the new version
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and renamed over the target, so a crash mid-write leaves the previous
+    file intact.
+
+    Args:
+        filepath (str): Path to the JSON file
+        data: Data to save
+        indent (int): JSON indentation level
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    # Persist the rename itself (not supported for directories on Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+# Append-heavy documents written through an event log, mapped to the key of
+# their record list, the fields identifying a record for upserts and any
+# further fields to keep an in-memory index on
+EVENT_LOG_DOCUMENTS = {
+    STUDENT_RESULTS_DOCUMENT: (
+        "quiz_history",
+        ("student_id", "quiz_id"),
+        (("student_id",), ("quiz_id",)),
+    ),
+    "activity_completions.json": ("completions", ("activity_id", "student_id"), ()),
+    "badge_progress.json": ("students", ("student_id",), ()),
+    "quiz_stats.json": ("stats", ("scope", "id"), ()),
+    **{
+        name: (list_key, (), ())
+        for name, list_key in COMPLETION_DOCUMENTS.items()
+        if name != "activity_completions.json"
+    },
+}
+
+
+class JsonStorage(StorageBackend):
+    """
+    Storage backend that keeps every document as a JSON file on disk
+
+    Quiz results and completions are written through an append-only event
+    log (see storage.event_log), so recording one event doesn't rewrite the
+    whole file. Their documents are still read through load_document.
+    """
+
+    name = "json"
+
+    def __init__(self):
+        self._event_logs = {}
+        self._event_logs_lock = threading.Lock()
+
+    def event_log(self, filepath):
+        """
+        Get the event log backing a document
+
+        Args:
+            filepath (str): Path to the JSON document
+
+        Returns:
+            EventLog: The document's event log, or None if it has none
+        """
+        name = document_name(filepath)
+        if name not in EVENT_LOG_DOCUMENTS:
+            return None
+
+        with self._event_logs_lock:
+            log = self._event_logs.get(name)
+            if log is None:
+                list_key, key_fields, index_fields = EVENT_LOG_DOCUMENTS[name]
+                log = self._event_logs[name] = EventLog(
+                    os.path.join(DATABASE_FOLDER, name), list_key, key_fields, index_fields
+                )
+            return log
+
+    def load_document(self, filepath, default_value=None):
+        log = self.event_log(filepath)
+        if log is not None:
+            try:
+                return log.view()
+            except (ValueError, UnicodeDecodeError) as e:
+                logger.error(f"Error reading event log for {filepath}: {str(e)}")
+                return default_value if default_value is not None else []
+
+        if not os.path.exists(filepath):
+            return default_value if default_value is not None else []
+
+        cached = document_cache.get(filepath)
+        if cached is not None:
+            return cached
+
+        try:
+            signature = file_signature(filepath)
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            document_cache.put(filepath, data, signature)
+            return data
+        except json.JSONDecodeError:
+            logger.error(f"Error reading JSON file: {filepath}")
+            return default_value if default_value is not None else []
+        except UnicodeDecodeError:
+            logger.error(f"Character encoding error in file: {filepath}")
+            return default_value if default_value is not None else []
+
+    def save_document(self, filepath, data, indent=2):
+        try:
+            log = self.event_log(filepath)
+            if log is not None:
+                log.replace(data)
+                return True
+            with file_lock(filepath):
+                write_json_atomic(filepath, data, indent)
+                document_cache.put(filepath, data)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving JSON file {filepath}: {str(e)}")
+            document_cache.invalidate(filepath)
+            return False
+
+    def update_document(self, filepath, update, default_value=None):
+        log = self.event_log(filepath)
+        for attempt in range(JSON_WRITE_RETRIES + 1):
+            try:
+                if log is not None:
+                    return log.update(update)
+                with file_lock(filepath):
+                    data = self._load_for_update(filepath, default_value)
+                    result = update(data)
+                    write_json_atomic(filepath, data)
+                    document_cache.put(filepath, data)
+                    return result
+            except OSError as e:
+                # Lock timeouts and transient I/O errors: reload and try again
+                document_cache.invalidate(filepath)
+                if attempt == JSON_WRITE_RETRIES:
+                    logger.error(f"Giving up updating JSON file {filepath}: {str(e)}")
+                    raise
+                logger.warning(f"Retrying update of JSON file {filepath}: {str(e)}")
+                time.sleep(0.05 * (2 ** attempt))
+
+    def _load_for_update(self, filepath, default_value):
+        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+            return default_value if default_value is not None else []
+
+        cached = document_cache.get(filepath)
+        if cached is not None:
+            return cached
+
+        # Unlike load_document, never fall back to the default here: saving
+        # it would silently overwrite whatever is in the unreadable file
+        signature = file_signature(filepath)
+        with open(filepath, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Refusing to update unreadable JSON file {filepath}: {e}")
+        document_cache.put(filepath, data, signature)
+        return data
+
+    def save_quiz_result(self, result):
+        replaced = []
+
+        def apply(existing):
+            if existing is not None:
+                result["attempts"] = existing.get("attempts", 1) + 1
+                replaced.append(existing)
+            return result
+
+        self.upsert_record(
+            self.student_results_path(),
+            "quiz_history",
+            {"student_id": result.get("student_id"), "quiz_id": result.get("quiz_id")},
+            apply,
+        )
+        return result, (replaced[-1] if replaced else None)
+
+    def get_quiz_results(self, student_id=None, quiz_id=None, newest_first=False, limit=None):
+        log = self.event_log(self.student_results_path())
+        try:
+            return log.find(
+                {"student_id": student_id, "quiz_id": quiz_id}, newest_first, limit
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error(f"Error reading quiz results: {str(e)}")
+            return []
+
+    def append_record(self, filepath, list_key, record):
+        try:
+            log = self.event_log(filepath)
+            if log is not None:
+                log.append(record)
+            else:
+                self.update_document(
+                    filepath,
+                    lambda data: data.setdefault(list_key, []).append(record),
+                    {list_key: []},
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error appending record to {filepath}: {str(e)}")
+            return False
+
+    def upsert_record(self, filepath, list_key, match, update):
+        log = self.event_log(filepath)
+        if log is not None:
+            return log.upsert(match, update)
+
+        def apply(data):
+            records = data.setdefault(list_key, [])
+            for i, existing in enumerate(records):
+                if all(existing.get(k) == v for k, v in match.items()):
+                    record = update(dict(existing))
+                    if record is not None:
+                        records[i] = record
+                    return record
+            record = update(None)
+            if record is not None:
+                records.append(record)
+            return record
+
+        return self.update_document(filepath, apply, {list_key: []})
+
+    def find_record(self, filepath, list_key, match):
+        log = self.event_log(filepath)
+        if log is not None:
+            records = log.find(match, limit=1)
+            return records[0] if records else None
+        for record in self.load_document(filepath, {list_key: []}).get(list_key, []):
+            if all(record.get(k) == v for k, v in match.items()):
+                return record
+        return None
+
+    def count_records(self, filepath, list_key):
+        log = self.event_log(filepath)
+        if log is not None:
+            return log.count()
+        return len(self.load_document(filepath, {list_key: []}).get(list_key, []))
+
+    def add_forum_post(self, module_id, post):
+        try:
+            self.update_document(self.forum_path(module_id), lambda posts: posts.append(post), [])
+            return True
+        except Exception as e:
+            logger.error(f"Error adding forum post to {module_id}: {str(e)}")
+            return False
+
+    def add_forum_comment(self, module_id, post_id, comment):
+        def apply(posts):
+            for post in posts:
+                if post.get("id") == post_id:
+                    post.setdefault("comments", []).append(comment)
+                    return
+            raise LookupError(post_id)
+
+        try:
+            self.update_document(self.forum_path(module_id), apply, [])
+            return True
+        except LookupError:
+            return None
+        except Exception as e:
+            logger.error(f"Error adding comment to post {post_id}: {str(e)}")
+            return False
+
+    @staticmethod
+    def student_results_path():
+        return os.path.join(DATABASE_FOLDER, STUDENT_RESULTS_DOCUMENT)
+
+    @staticmethod
+    def forum_path(module_id):
+        return os.path.join(FORUM_FOLDER, f"{module_id}.json")
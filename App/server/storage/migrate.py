@@ -0,0 +1,126 @@
+"""
+One-shot import of the JSON database files into the SQLite backend
+
+Usage (from the server directory):
+    python -m storage.migrate [--sqlite-path PATH] [--force]
+"""
+import os
+import sys
+import json
+import argparse
+
+from config.app_config import DATABASE_FOLDER, SQLITE_DATABASE_PATH, logger
+from storage.json_backend import JsonStorage
+from storage.sqlite_backend import SqliteStorage
+
+
+def find_json_documents(folder=DATABASE_FOLDER):
+    """
+    Find every JSON document below the database folder
+
+    Args:
+        folder (str): Folder to search
+
+    Returns:
+        list: Sorted list of file paths
+    """
+    documents = []
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            if filename.endswith(".json"):
+                documents.append(os.path.join(root, filename))
+    return sorted(documents)
+
+
+def read_json_document(source, filepath):
+    """
+    Read a JSON document, failing instead of falling back to a default
+
+    JsonStorage.load_document returns an empty list for a file it can't
+    read, which would be imported as if the document were empty.
+
+    Args:
+        source (JsonStorage): Storage the document belongs to
+        filepath (str): Path of the document
+
+    Returns:
+        The document's data, or None if it can't be read
+    """
+    try:
+        log = source.event_log(filepath)
+        if log is not None:
+            return log.view()
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        logger.error(f"Error reading {filepath}: {str(e)}")
+        return None
+
+
+def migrate_json_to_sqlite(sqlite_path=SQLITE_DATABASE_PATH, force=False):
+    """
+    Import all JSON documents into an SQLite database
+
+    Args:
+        sqlite_path (str): Path of the SQLite database to create
+        force (bool): Overwrite an existing database
+
+    Returns:
+        dict: Number of imported documents, paths of the documents skipped
+            because they couldn't be read, and the database path
+    """
+    if os.path.exists(sqlite_path) and not force:
+        raise FileExistsError(
+            f"{sqlite_path} already exists, pass --force to import again"
+        )
+    if force:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(sqlite_path + suffix):
+                os.remove(sqlite_path + suffix)
+
+    source = JsonStorage()
+    target = SqliteStorage(sqlite_path)
+    imported = 0
+    skipped = []
+
+    for filepath in find_json_documents():
+        data = read_json_document(source, filepath)
+        if data is None:
+            logger.warning(f"Skipping unreadable document: {filepath}")
+            skipped.append(filepath)
+            continue
+        if not target.save_document(filepath, data):
+            raise RuntimeError(f"Failed to import {filepath}")
+        imported += 1
+        logger.info(f"Imported {filepath}")
+
+    return {"documents": imported, "skipped": skipped, "database": sqlite_path}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sqlite-path", default=SQLITE_DATABASE_PATH)
+    parser.add_argument("--force", action="store_true", help="overwrite an existing database")
+    args = parser.parse_args(argv)
+
+    try:
+        result = migrate_json_to_sqlite(args.sqlite_path, args.force)
+    except FileExistsError as e:
+        logger.error(str(e))
+        return 1
+
+    logger.info(
+        f"Imported {result['documents']} documents into {result['database']}. "
+        "Start the server with STORAGE_BACKEND=sqlite to use it."
+    )
+    if result["skipped"]:
+        logger.warning(
+            f"{len(result['skipped'])} unreadable documents were not imported: "
+            + ", ".join(result["skipped"])
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
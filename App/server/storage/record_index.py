@@ -0,0 +1,122 @@
+from bisect import bisect_left, insort
+
+
+class _Bucket:
+    """Positions of the records sharing one key"""
+
+    __slots__ = ("positions", "ordered")
+
+    def __init__(self):
+        # Ascending list positions, i.e. storage order
+        self.positions = []
+        # (sort value, -position) ascending, so reversing it gives newest
+        # first with ties kept in storage order
+        self.ordered = []
+
+
+class RecordIndex:
+    """
+    Secondary index over a list of records, keyed by one or more fields
+
+    Records are referred to by their position in the list. Positions never
+    move: records are only appended or replaced in place, and anything else
+    rebuilds the index. Each key keeps its positions both in storage order
+    and sorted by a field (the timestamp by default), so lookups cost
+    O(matches) instead of a scan and sort of the whole list.
+    """
+
+    def __init__(self, key_fields, sort_field="timestamp"):
+        self.key_fields = tuple(key_fields)
+        self.sort_field = sort_field
+        self._buckets = {}
+
+    def key(self, record):
+        return tuple(record.get(field) for field in self.key_fields)
+
+    def _sort_entry(self, position, record):
+        return (record.get(self.sort_field) or "", -position)
+
+    def rebuild(self, records):
+        """
+        Index a whole list of records
+
+        Args:
+            records (list): Records to index
+        """
+        self._buckets = {}
+        for position, record in enumerate(records):
+            bucket = self._buckets.setdefault(self.key(record), _Bucket())
+            bucket.positions.append(position)
+            bucket.ordered.append(self._sort_entry(position, record))
+        for bucket in self._buckets.values():
+            bucket.ordered.sort()
+
+    def add(self, position, record):
+        """
+        Index a record appended at the end of the list
+
+        Args:
+            position (int): Position of the record
+            record (dict): The record
+        """
+        bucket = self._buckets.setdefault(self.key(record), _Bucket())
+        bucket.positions.append(position)
+        insort(bucket.ordered, self._sort_entry(position, record))
+
+    def replace(self, position, old_record, new_record):
+        """
+        Re-index a record replaced in place
+
+        Args:
+            position (int): Position of the record
+            old_record (dict): Record previously at that position
+            new_record (dict): Record now at that position
+        """
+        old_key = self.key(old_record)
+        new_key = self.key(new_record)
+        old_entry = self._sort_entry(position, old_record)
+        new_entry = self._sort_entry(position, new_record)
+        if old_key == new_key and old_entry == new_entry:
+            return
+
+        bucket = self._buckets[old_key]
+        del bucket.ordered[bisect_left(bucket.ordered, old_entry)]
+        if old_key != new_key:
+            del bucket.positions[bisect_left(bucket.positions, position)]
+            if not bucket.positions:
+                del self._buckets[old_key]
+            bucket = self._buckets.setdefault(new_key, _Bucket())
+            insort(bucket.positions, position)
+        insort(bucket.ordered, new_entry)
+
+    def first(self, key):
+        """
+        Get the position of the first record with a key
+
+        Args:
+            key (tuple): Values of the key fields
+
+        Returns:
+            int: Position, or None if no record has this key
+        """
+        bucket = self._buckets.get(key)
+        return bucket.positions[0] if bucket else None
+
+    def positions(self, key, newest_first=False):
+        """
+        Get the positions of all records with a key
+
+        Args:
+            key (tuple): Values of the key fields
+            newest_first (bool): Order by the sort field, descending, instead
+                of storage order
+
+        Returns:
+            list: Positions of the matching records
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return []
+        if newest_first:
+            return [-entry[1] for entry in reversed(bucket.ordered)]
+        return list(bucket.positions)
@@ -0,0 +1,444 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config.app_config import SQLITE_DATABASE_PATH, logger
+from storage.base import (
+    StorageBackend,
+    QUIZZES_DOCUMENT,
+    ACTIVITIES_DOCUMENT,
+    STUDENT_RESULTS_DOCUMENT,
+    COMPLETION_DOCUMENTS,
+    document_name,
+    forum_module_id,
+    completion_stream,
+)
+from storage.json_backend import JsonStorage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quizzes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quizzes_id ON quizzes (id);
+
+CREATE TABLE IF NOT EXISTS activities (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT,
+    module_id TEXT,
+    quiz_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_activities_module ON activities (module_id);
+CREATE INDEX IF NOT EXISTS idx_activities_quiz ON activities (quiz_id);
+
+CREATE TABLE IF NOT EXISTS quiz_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT,
+    quiz_id TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quiz_history_student_quiz ON quiz_history (student_id, quiz_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_history_quiz ON quiz_history (quiz_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS completions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    stream TEXT NOT NULL,
+    student_id TEXT,
+    module_id TEXT,
+    activity_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_completions_student ON completions (stream, student_id);
+CREATE INDEX IF NOT EXISTS idx_completions_module ON completions (stream, module_id);
+CREATE INDEX IF NOT EXISTS idx_completions_activity ON completions (stream, activity_id);
+
+CREATE TABLE IF NOT EXISTS forum_posts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    module_id TEXT NOT NULL,
+    id TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_forum_posts_module ON forum_posts (module_id, id);
+
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _first(record, *keys):
+    """Get the first present value among several spellings of a field"""
+    for key in keys:
+        if record.get(key) is not None:
+            return str(record.get(key))
+    return None
+
+
+class SqliteStorage(StorageBackend):
+    """
+    Storage backend that keeps documents as rows in an SQLite database
+
+    Quizzes, activities, quiz history, completions and forum posts get their
+    own indexed tables so row-level writes only touch the affected rows. Any
+    other document is stored whole in the documents table. The database runs
+    in WAL mode so readers never block the single writer.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, database_path=SQLITE_DATABASE_PATH):
+        self.database_path = database_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # Files outside DATABASE_FOLDER are still read and written as JSON
+        self._files = JsonStorage()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
+            connection = sqlite3.connect(
+                self.database_path, timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    # Row layout of the dedicated tables
+
+    @staticmethod
+    def _quiz_row(record):
+        return (_first(record, "id"), _dumps(record))
+
+    @staticmethod
+    def _activity_row(record):
+        return (
+            _first(record, "id"),
+            _first(record, "moduleId", "module_id"),
+            _first(record, "quizId", "quiz_id"),
+            _dumps(record),
+        )
+
+    @staticmethod
+    def _quiz_history_row(record):
+        return (
+            _first(record, "student_id"),
+            _first(record, "quiz_id"),
+            _first(record, "timestamp"),
+            _dumps(record),
+        )
+
+    @staticmethod
+    def _completion_row(stream, record):
+        return (
+            stream,
+            _first(record, "student_id", "studentId"),
+            _first(record, "module_id", "moduleId"),
+            _first(record, "activity_id", "activityId", "quiz_id"),
+            _dumps(record),
+        )
+
+    @staticmethod
+    def _forum_post_row(module_id, record):
+        return (module_id, _first(record, "id"), _first(record, "timestamp"), _dumps(record))
+
+    def _select(self, query, params=()):
+        rows = self._connection().execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def load_document(self, filepath, default_value=None):
+        name = document_name(filepath)
+        if name is None:
+            return self._files.load_document(filepath, default_value)
+
+        if name == QUIZZES_DOCUMENT:
+            return self._select("SELECT data FROM quizzes ORDER BY seq")
+        if name == ACTIVITIES_DOCUMENT:
+            return self._select("SELECT data FROM activities ORDER BY seq")
+        if name == STUDENT_RESULTS_DOCUMENT:
+            return {"quiz_history": self._select("SELECT data FROM quiz_history ORDER BY seq")}
+        if name in COMPLETION_DOCUMENTS:
+            records = self._select(
+                "SELECT data FROM completions WHERE stream = ? ORDER BY seq",
+                (completion_stream(name),),
+            )
+            return {COMPLETION_DOCUMENTS[name]: records}
+        module_id = forum_module_id(name)
+        if module_id is not None:
+            return self._select(
+                "SELECT data FROM forum_posts WHERE module_id = ? ORDER BY seq",
+                (module_id,),
+            )
+
+        row = (
+            self._connection()
+            .execute("SELECT data FROM documents WHERE name = ?", (name,))
+            .fetchone()
+        )
+        if row is None:
+            return default_value if default_value is not None else []
+        return json.loads(row[0])
+
+    def save_document(self, filepath, data, indent=2):
+        name = document_name(filepath)
+        if name is None:
+            return self._files.save_document(filepath, data, indent)
+
+        try:
+            with self._transaction() as connection:
+                self._replace_document(connection, name, data)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving document {name} to SQLite: {str(e)}")
+            return False
+
+    def update_document(self, filepath, update, default_value=None):
+        name = document_name(filepath)
+        if name is None:
+            return self._files.update_document(filepath, update, default_value)
+
+        with self._transaction() as connection:
+            data = self.load_document(filepath, default_value)
+            result = update(data)
+            self._replace_document(connection, name, data)
+        return result
+
+    def _replace_document(self, connection, name, data):
+        if name == QUIZZES_DOCUMENT:
+            connection.execute("DELETE FROM quizzes")
+            connection.executemany(
+                "INSERT INTO quizzes (id, data) VALUES (?, ?)",
+                [self._quiz_row(record) for record in data],
+            )
+        elif name == ACTIVITIES_DOCUMENT:
+            connection.execute("DELETE FROM activities")
+            connection.executemany(
+                "INSERT INTO activities (id, module_id, quiz_id, data) VALUES (?, ?, ?, ?)",
+                [self._activity_row(record) for record in data],
+            )
+        elif name == STUDENT_RESULTS_DOCUMENT:
+            connection.execute("DELETE FROM quiz_history")
+            connection.executemany(
+                "INSERT INTO quiz_history (student_id, quiz_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                [self._quiz_history_row(record) for record in data.get("quiz_history", [])],
+            )
+        elif name in COMPLETION_DOCUMENTS:
+            stream = completion_stream(name)
+            connection.execute("DELETE FROM completions WHERE stream = ?", (stream,))
+            connection.executemany(
+                "INSERT INTO completions (stream, student_id, module_id, activity_id, data) VALUES (?, ?, ?, ?, ?)",
+                [
+                    self._completion_row(stream, record)
+                    for record in data.get(COMPLETION_DOCUMENTS[name], [])
+                ],
+            )
+        elif forum_module_id(name) is not None:
+            module_id = forum_module_id(name)
+            connection.execute("DELETE FROM forum_posts WHERE module_id = ?", (module_id,))
+            connection.executemany(
+                "INSERT INTO forum_posts (module_id, id, timestamp, data) VALUES (?, ?, ?, ?)",
+                [self._forum_post_row(module_id, record) for record in data],
+            )
+        else:
+            connection.execute(
+                "INSERT OR REPLACE INTO documents (name, data) VALUES (?, ?)",
+                (name, _dumps(data)),
+            )
+
+    def save_quiz_result(self, result):
+        with self._transaction() as connection:
+            existing = connection.execute(
+                "SELECT seq, data FROM quiz_history WHERE student_id = ? AND quiz_id = ? "
+                "ORDER BY seq LIMIT 1",
+                (result.get("student_id"), result.get("quiz_id")),
+            ).fetchone()
+
+            replaced = json.loads(existing[1]) if existing else None
+            if existing:
+                result["attempts"] = replaced.get("attempts", 1) + 1
+                connection.execute(
+                    "UPDATE quiz_history SET timestamp = ?, data = ? WHERE seq = ?",
+                    (result.get("timestamp"), _dumps(result), existing[0]),
+                )
+            else:
+                connection.execute(
+                    "INSERT INTO quiz_history (student_id, quiz_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                    self._quiz_history_row(result),
+                )
+        return result, replaced
+
+    def get_quiz_results(self, student_id=None, quiz_id=None, newest_first=False, limit=None):
+        conditions = []
+        params = []
+        if student_id is not None:
+            conditions.append("student_id = ?")
+            params.append(student_id)
+        if quiz_id is not None:
+            conditions.append("quiz_id = ?")
+            params.append(quiz_id)
+
+        query = "SELECT data FROM quiz_history"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, seq" if newest_first else " ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._select(query, params)
+
+    def append_record(self, filepath, list_key, record):
+        name = document_name(filepath)
+        stream = completion_stream(name)
+        if stream is None:
+            # Not a completions stream, fall back to rewriting the document
+            data = self.load_document(filepath, {list_key: []})
+            data.setdefault(list_key, []).append(record)
+            return self.save_document(filepath, data)
+
+        try:
+            with self._transaction() as connection:
+                connection.execute(
+                    "INSERT INTO completions (stream, student_id, module_id, activity_id, data) VALUES (?, ?, ?, ?, ?)",
+                    self._completion_row(stream, record),
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error appending record to {name}: {str(e)}")
+            return False
+
+    def upsert_record(self, filepath, list_key, match, update):
+        stream = completion_stream(document_name(filepath))
+        if stream is None:
+            def apply(data):
+                records = data.setdefault(list_key, [])
+                for i, existing in enumerate(records):
+                    if all(existing.get(k) == v for k, v in match.items()):
+                        record = update(dict(existing))
+                        if record is not None:
+                            records[i] = record
+                        return record
+                record = update(None)
+                if record is not None:
+                    records.append(record)
+                return record
+
+            return self.update_document(filepath, apply, {list_key: []})
+
+        conditions = " AND ".join("json_extract(data, ?) = ?" for _ in match)
+        params = [stream]
+        for field, value in match.items():
+            params.extend([f"$.{field}", value])
+
+        with self._transaction() as connection:
+            existing = connection.execute(
+                f"SELECT seq, data FROM completions WHERE stream = ? AND {conditions} "
+                "ORDER BY seq LIMIT 1",
+                params,
+            ).fetchone()
+
+            record = update(json.loads(existing[1]) if existing else None)
+            if record is None:
+                return None
+
+            row = self._completion_row(stream, record)
+            if existing:
+                connection.execute(
+                    "UPDATE completions SET student_id = ?, module_id = ?, activity_id = ?, data = ? "
+                    "WHERE seq = ?",
+                    row[1:] + (existing[0],),
+                )
+            else:
+                connection.execute(
+                    "INSERT INTO completions (stream, student_id, module_id, activity_id, data) VALUES (?, ?, ?, ?, ?)",
+                    row,
+                )
+        return record
+
+    def find_record(self, filepath, list_key, match):
+        stream = completion_stream(document_name(filepath))
+        if stream is None:
+            for record in self.load_document(filepath, {list_key: []}).get(list_key, []):
+                if all(record.get(k) == v for k, v in match.items()):
+                    return record
+            return None
+
+        conditions = "".join(" AND json_extract(data, ?) = ?" for _ in match)
+        params = [stream]
+        for field, value in match.items():
+            params.extend([f"$.{field}", value])
+        records = self._select(
+            f"SELECT data FROM completions WHERE stream = ?{conditions} ORDER BY seq LIMIT 1",
+            params,
+        )
+        return records[0] if records else None
+
+    def count_records(self, filepath, list_key):
+        stream = completion_stream(document_name(filepath))
+        if stream is None:
+            return len(self.load_document(filepath, {list_key: []}).get(list_key, []))
+        row = (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM completions WHERE stream = ?", (stream,))
+            .fetchone()
+        )
+        return row[0]
+
+    def add_forum_post(self, module_id, post):
+        try:
+            with self._transaction() as connection:
+                connection.execute(
+                    "INSERT INTO forum_posts (module_id, id, timestamp, data) VALUES (?, ?, ?, ?)",
+                    self._forum_post_row(module_id, post),
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error adding forum post to {module_id}: {str(e)}")
+            return False
+
+    def add_forum_comment(self, module_id, post_id, comment):
+        try:
+            with self._transaction() as connection:
+                row = connection.execute(
+                    "SELECT seq, data FROM forum_posts WHERE module_id = ? AND id = ? LIMIT 1",
+                    (module_id, post_id),
+                ).fetchone()
+                if row is None:
+                    return None
+
+                post = json.loads(row[1])
+                post.setdefault("comments", []).append(comment)
+                connection.execute(
+                    "UPDATE forum_posts SET data = ? WHERE seq = ?", (_dumps(post), row[0])
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error adding comment to post {post_id}: {str(e)}")
+            return False
@@ -0,0 +1,143 @@
+import pytest
+
+from services.badge_rules import (
+    COMPLETION_EVENT,
+    RESULT_EVENT,
+    BadgeRules,
+    compile_rule,
+    criteria_to_rule,
+)
+
+
+def evaluate(rule, events):
+    # Fold (event, record) pairs into fresh metric states and check the rule
+    metrics = {}
+    check = compile_rule(rule, metrics)
+    states = {key: metric.initial(params) for key, (metric, params) in metrics.items()}
+    for event, record in events:
+        for key, (metric, params) in metrics.items():
+            if metric.event == event:
+                states[key], _ = metric.update(states[key], record, params)
+    return check(states)
+
+
+def completions(*scores):
+    return [(COMPLETION_EVENT, {"score_percent": score, "score": score, "total_questions": 100}) for score in scores]
+
+
+@pytest.mark.parametrize(
+    "comparison, target, expected",
+    [
+        ("at_least", 3, True),
+        ("at_least", 4, False),
+        ("at_most", 3, True),
+        ("more_than", 3, False),
+        ("less_than", 4, True),
+        ("equals", 3, True),
+    ],
+)
+def test_comparisons(comparison, target, expected):
+    met, _ = evaluate({"metric": "completions", comparison: target}, completions(50, 60, 70))
+
+    assert met is expected
+
+
+def test_parameters_select_a_separate_metric_state():
+    metrics = {}
+    compile_rule(
+        {
+            "all": [
+                {"metric": "best_streak", "at_least": 2},
+                {"metric": "best_streak", "min_score_percent": 80, "at_least": 2},
+            ]
+        },
+        metrics,
+    )
+
+    assert sorted(metrics) == ["best_streak:min_score_percent=0", "best_streak:min_score_percent=80"]
+
+
+def test_streak_rule_uses_its_minimum_score():
+    rule = {"metric": "best_streak", "min_score_percent": 80, "at_least": 2}
+
+    assert evaluate(rule, completions(90, 50, 90, 95))[0] is True
+    assert evaluate(rule, completions(90, 50, 90, 50))[0] is False
+
+
+def test_all_any_and_not():
+    events = completions(100, 40)
+    perfect = {"metric": "perfect_scores", "at_least": 1}
+    many = {"metric": "completions", "at_least": 5}
+
+    assert evaluate({"all": [perfect, many]}, events)[0] is False
+    assert evaluate({"any": [perfect, many]}, events)[0] is True
+    assert evaluate({"not": many}, events)[0] is True
+    assert evaluate({"all": []}, events)[0] is True
+    assert evaluate({"any": []}, events)[0] is False
+
+
+def test_context_comes_from_the_rules_that_were_met():
+    record = {
+        "quiz_id": "q1",
+        "quiz_title": "Fractions",
+        "score": 9,
+        "total_questions": 10,
+        "start_timestamp": "2025-03-01T12:00:00Z",
+        "timestamp": "2025-03-01T12:00:20Z",
+    }
+    rule = {"any": [{"metric": "fastest_completion", "at_most": 30}, {"metric": "completions", "at_least": 1}]}
+
+    met, context = evaluate(rule, [(RESULT_EVENT, record)])
+
+    assert met is True
+    assert context == {"quiz_id": "q1", "quiz_title": "Fractions", "completion_time": 20.0, "score_percent": 90.0}
+
+
+@pytest.mark.parametrize(
+    "rule, message",
+    [
+        ([], "must be an object"),
+        ({"all": {"metric": "completions"}}, "take a list"),
+        ({"metric": "logins", "at_least": 1}, "Unknown metric"),
+        ({"metric": "completions"}, "exactly one of"),
+        ({"metric": "completions", "at_least": 1, "at_most": 3}, "exactly one of"),
+        ({"metric": "completions", "at_least": 1, "min_score_percent": 80}, "Unknown parameter"),
+        ({"not": {"metric": "completions", "at_least": 1, "quiz": "x"}}, "Unknown parameter"),
+    ],
+)
+def test_malformed_rules_raise_value_error(rule, message):
+    with pytest.raises(ValueError, match=message):
+        compile_rule(rule, {})
+
+
+def test_criteria_to_rule():
+    rule = criteria_to_rule({"quiz_streak": 3, "min_score_percent": 80, "quiz_perfect_score": True})
+
+    assert rule == {
+        "any": [
+            {"metric": "perfect_scores", "at_least": 1},
+            {"metric": "best_streak", "min_score_percent": 80, "at_least": 3},
+        ]
+    }
+    assert criteria_to_rule({}) == {"any": []}
+
+
+def test_badge_rules_index_badges_by_metric_and_skip_invalid_ones():
+    badges = [
+        {"badge_id": "first", "rule": {"metric": "completions", "at_least": 1}},
+        {"badge_id": "broken", "rule": {"metric": "nope", "at_least": 1}},
+        {"badge_id": "persistent", "criteria": {"same_quiz_attempts": 3}},
+        {"badge_id": "regular", "criteria": {"quiz_completions": 10}},
+    ]
+
+    rules = BadgeRules(badges)
+
+    assert [compiled.badge["badge_id"] for compiled in rules.badges] == ["first", "persistent", "regular"]
+    assert rules.event_metrics == {COMPLETION_EVENT: ["completions"], RESULT_EVENT: ["max_attempts"]}
+
+    states = rules.initial_states()
+    changed = rules.apply(states, COMPLETION_EVENT, {"score_percent": 100})
+    assert changed == {"completions"}
+    assert [compiled.badge["badge_id"] for compiled in rules.affected_by(changed)] == ["first", "regular"]
+    assert rules.badges[0].check(states) == (True, None)
+    assert rules.badges[2].check(states) == (False, None)
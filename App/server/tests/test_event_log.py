@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from storage.event_log import SEQUENCE_KEY, EventLog
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "student_results.json")
+
+
+def make_log(snapshot_path, **kwargs):
+    return EventLog(snapshot_path, "quiz_history", key_fields=("student_id", "quiz_id"), **kwargs)
+
+
+def read_events(log):
+    with open(log.log_path, "rb") as f:
+        return [json.loads(line) for line in f.read().splitlines() if line.strip()]
+
+
+def test_writes_are_seen_by_another_instance(snapshot_path):
+    writer = make_log(snapshot_path)
+    reader = make_log(snapshot_path)
+
+    writer.append({"student_id": "1", "quiz_id": "a", "score": 1})
+    writer.upsert({"student_id": "1", "quiz_id": "a"}, lambda existing: {**existing, "score": 3})
+    writer.upsert({"student_id": "2", "quiz_id": "a"}, lambda existing: {"student_id": "2", "quiz_id": "a", "score": 2})
+
+    assert reader.view()["quiz_history"] == [
+        {"student_id": "1", "quiz_id": "a", "score": 3},
+        {"student_id": "2", "quiz_id": "a", "score": 2},
+    ]
+    assert reader.find({"student_id": "2", "quiz_id": "a"}) == [{"student_id": "2", "quiz_id": "a", "score": 2}]
+    assert [event["seq"] for event in read_events(writer)] == [1, 2, 3]
+
+
+def test_upsert_returning_none_writes_nothing(snapshot_path):
+    log = make_log(snapshot_path)
+    log.append({"student_id": "1", "quiz_id": "a"})
+
+    assert log.upsert({"student_id": "1", "quiz_id": "a"}, lambda existing: None) is None
+    assert len(read_events(log)) == 1
+
+
+def test_partial_line_is_ignored_and_truncated_by_the_next_write(snapshot_path):
+    log = make_log(snapshot_path)
+    log.append({"student_id": "1", "quiz_id": "a"})
+
+    # A writer that crashed halfway through its line
+    with open(log.log_path, "ab") as f:
+        f.write(b'{"seq": 2, "op": "append", "record": {"student_id": "2"')
+
+    reader = make_log(snapshot_path)
+    assert reader.count() == 1
+
+    reader.append({"student_id": "3", "quiz_id": "a"})
+    assert [event["record"]["student_id"] for event in read_events(reader)] == ["1", "3"]
+    assert [record["student_id"] for record in make_log(snapshot_path).view()["quiz_history"]] == ["1", "3"]
+
+
+def test_events_already_in_the_snapshot_are_skipped(snapshot_path):
+    # A compaction that wrote its snapshot but died before emptying the log
+    with open(snapshot_path, "w", encoding="utf-8") as f:
+        json.dump({"quiz_history": [{"student_id": "1"}, {"student_id": "2"}], SEQUENCE_KEY: 2}, f)
+    log_path = snapshot_path.replace(".json", ".events.jsonl")
+    with open(log_path, "w", encoding="utf-8") as f:
+        for seq, student_id in ((1, "1"), (2, "2"), (3, "3")):
+            f.write(json.dumps({"seq": seq, "op": "append", "record": {"student_id": student_id}}) + "\n")
+
+    log = make_log(snapshot_path)
+    assert [record["student_id"] for record in log.view()["quiz_history"]] == ["1", "2", "3"]
+
+    log.append({"student_id": "4"})
+    assert read_events(log)[-1]["seq"] == 4
+
+
+def test_compaction_folds_the_log_into_the_snapshot(snapshot_path):
+    log = make_log(snapshot_path, compact_every=3)
+    for student_id in ("1", "2", "3"):
+        log.append({"student_id": student_id, "quiz_id": "a"})
+
+    assert read_events(log) == []
+    with open(snapshot_path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot[SEQUENCE_KEY] == 3
+    assert len(snapshot["quiz_history"]) == 3
+
+    log.append({"student_id": "4", "quiz_id": "a"})
+    assert read_events(log)[0]["seq"] == 4
+    assert make_log(snapshot_path).count() == 4
@@ -0,0 +1,63 @@
+import pytest
+
+from services.quiz_generation import allocate_questions, merge_chunks, split_content_into_chunks
+
+
+@pytest.mark.parametrize(
+    "lengths, num_questions, expected",
+    [
+        ([100, 100], 4, [2, 2]),
+        ([300, 100], 4, [3, 1]),
+        ([100, 100, 100], 2, [1, 1, 0]),
+        ([100, 200], 0, [0, 0]),
+        ([0, 0], 3, [0, 0]),
+        ([], 3, []),
+    ],
+)
+def test_allocate_questions(lengths, num_questions, expected):
+    assert allocate_questions(lengths, num_questions) == expected
+
+
+def test_allocate_questions_gives_remainders_to_the_largest_share():
+    counts = allocate_questions([500, 300, 200], 7)
+
+    assert sum(counts) == 7
+    assert counts == [4, 2, 1]
+
+
+def test_split_keeps_paragraphs_together_and_respects_the_limit():
+    paragraphs = [f"Paragraph {i} " + "word " * 20 for i in range(10)]
+    content = "\n\n".join(paragraphs)
+
+    chunks = split_content_into_chunks(content, 300)
+
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert "\n\n".join(chunks).split("\n\n") == [paragraph.strip() for paragraph in paragraphs]
+
+
+def test_split_breaks_on_pages_and_long_paragraphs():
+    long_paragraph = "This is a sentence. " * 30
+    content = "First page\n\fSecond page\n\n" + long_paragraph
+
+    chunks = split_content_into_chunks(content, 200)
+
+    assert chunks[0].startswith("First page\n\nSecond page")
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks[1:])
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 7])
+def test_merge_chunks_keeps_every_chunk_in_order(count):
+    chunks = [f"chunk {i} " + "x" * (10 * (i % 3 + 1)) for i in range(7)]
+
+    merged = merge_chunks(chunks, count)
+
+    assert len(merged) == count
+    assert "\n\n".join(merged) == "\n\n".join(chunks)
+    assert all(merged)
+
+
+def test_merge_chunks_balances_lengths():
+    merged = merge_chunks(["a" * 100] * 8, 4)
+
+    assert [len(chunk) for chunk in merged] == [202] * 4
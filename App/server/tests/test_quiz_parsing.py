@@ -0,0 +1,90 @@
+import pytest
+
+from services.quiz_parsing import IncrementalQuizParser, parse_quiz, parse_quiz_with_diagnostics
+
+MULTIPLE_CHOICE = """Here is your quiz:
+
+1. What is the capital of France?
+A) Berlin
+B) Paris
+C) Rome
+D) Madrid
+Correct answer: B
+
+2. Which planet is known as the red planet?
+A) Mars
+B) Venus
+C) Jupiter
+D) Saturn
+Correct answer: A) Mars
+"""
+
+FLASHCARDS = """1. Photosynthesis
+Flip side: How plants turn light into chemical energy
+
+2. Mitosis
+Flip side: Cell division into two identical cells
+"""
+
+
+def stream(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 1000])
+@pytest.mark.parametrize(
+    "text, question_type", [(MULTIPLE_CHOICE, "multipleChoice"), (FLASHCARDS, "flashcards")]
+)
+def test_streamed_text_parses_like_the_whole_text(text, question_type, size):
+    parser = IncrementalQuizParser(question_type)
+    emitted = []
+    for fragment in stream(text, size):
+        emitted.extend(parser.feed(fragment))
+    emitted.extend(parser.finish())
+
+    expected = parse_quiz(text, question_type)
+    assert parser.quiz() == expected
+    assert emitted == expected["questions"]
+    assert parser.text == text
+
+
+def test_question_is_emitted_when_its_answer_line_completes():
+    parser = IncrementalQuizParser()
+
+    assert parser.feed("1. What is 2 + 2?\nA) 3\nB) 4\nC) 5\nD) 6\nCorrect answer: ") == []
+    completed = parser.feed("B\n")
+
+    assert completed == [
+        {"id": "q1", "question": "What is 2 + 2?", "options": ["3", "4", "5", "6"], "correctAnswer": "4"}
+    ]
+    assert parser.finish() == []
+
+
+def test_question_without_answer_is_emitted_when_the_next_one_starts():
+    parser = IncrementalQuizParser("shortAnswer")
+
+    assert parser.feed("1. Name a prime number\n") == []
+    completed = parser.feed("2. Name an even number\nCorrect answer: 2\n")
+
+    assert [question["id"] for question in completed] == ["q1", "q2"]
+    assert completed[0]["correctAnswer"] == ""
+    assert parser.diagnostics["issues"] == [{"question": 1, "line": 1, "message": "No correct answer line"}]
+
+
+def test_diagnostics_report_ignored_lines_and_bad_answers():
+    quiz, diagnostics = parse_quiz_with_diagnostics(
+        "Intro line\n1. Pick one\nA) x\nB) y\nCorrect answer: E\n", "trueFalse"
+    )
+
+    assert quiz["questions"][0]["correctAnswer"] == ""
+    assert diagnostics["questions"] == 1
+    assert diagnostics["ignoredLines"] == 1
+    assert [issue["message"] for issue in diagnostics["issues"]] == ["Correct answer 'E' doesn't match an option"]
+    assert diagnostics["issues"][0]["line"] == 5
+
+
+def test_unknown_question_type_is_read_as_multiple_choice():
+    quiz, diagnostics = parse_quiz_with_diagnostics(MULTIPLE_CHOICE, "essay")
+
+    assert quiz == parse_quiz(MULTIPLE_CHOICE, "multipleChoice")
+    assert "Unknown question type 'essay'" in diagnostics["issues"][0]["message"]
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from services.quiz_stats import add_result, build_quiz_stats, merge_module_stats, summarize
+
+
+def make_result(student_id, attempts, score, timestamp):
+    return {
+        "student_id": student_id,
+        "student_name": f"Student {student_id}",
+        "quiz_id": "quiz",
+        "quiz_title": "Fractions",
+        "score": score,
+        "total_questions": 0 if score is None else 4,
+        "attempts": attempts,
+        "timestamp": timestamp,
+        "answers": [{"question_id": i, "question": f"Q{i}", "correct": i < (score or 0)} for i in range(4)],
+    }
+
+
+def comparable(stats):
+    stats = dict(stats)
+    del stats["updated"]
+    stats["score_total"] = pytest.approx(stats["score_total"])
+    return stats
+
+
+def test_incremental_stats_match_stats_built_from_history():
+    rng = random.Random(7)
+    latest = {}
+    stats = build_quiz_stats("quiz", "module", [])
+    rebuilds = 0
+
+    for step in range(300):
+        student_id = str(rng.randrange(15))
+        replaced = latest.get(student_id)
+        result = make_result(
+            student_id,
+            replaced["attempts"] + 1 if replaced else 1,
+            rng.choice([0, 1, 2, 3, 4, None]),
+            f"2025-03-01T12:{step // 60:02d}:{step % 60:02d}",
+        )
+        latest[student_id] = result
+        if not add_result(stats, result, replaced):
+            rebuilds += 1
+            stats = build_quiz_stats("quiz", "module", list(latest.values()))
+
+    assert comparable(stats) == comparable(build_quiz_stats("quiz", "module", list(latest.values())))
+    # Only a student dropping down a full leaderboard needs the history
+    assert 0 < rebuilds < 300
+
+
+def test_a_result_already_counted_is_not_counted_again():
+    first = make_result("1", 1, 2, "2025-03-01T12:00:00")
+    second = make_result("1", 2, 4, "2025-03-01T12:05:00")
+    # Built after both saves, before the second one's update ran
+    stats = build_quiz_stats("quiz", "module", [second])
+
+    assert add_result(stats, second, first) is True
+    assert comparable(stats) == comparable(build_quiz_stats("quiz", "module", [second]))
+
+
+def test_a_record_missing_the_replaced_result_asks_for_a_rebuild():
+    stats = build_quiz_stats("quiz", "module", [])
+
+    assert add_result(stats, make_result("1", 3, 2, "2025-03-01T12:00:00"), make_result("1", 2, 1, "")) is False
+
+
+def test_summary_counts_latest_results():
+    results = [make_result("1", 3, 4, "2025-03-01T12:00:00"), make_result("2", 1, None, "2025-03-01T12:01:00")]
+
+    summary = summarize(build_quiz_stats("quiz", "module", results))
+
+    assert summary["attempts"] == 4
+    assert summary["scored_attempts"] == 1
+    assert summary["students"] == 2
+    assert summary["mean_score_percent"] == 100.0
+    assert summary["questions"][0] == {
+        "question_id": "0",
+        "question": "Q0",
+        "answered": 2,
+        "correct": 1,
+        "correct_rate": 0.5,
+    }
+
+
+def test_module_stats_merge_their_quizzes():
+    first = build_quiz_stats("a", "module", [make_result("1", 2, 4, "2025-03-01T12:00:00")])
+    second = build_quiz_stats("b", "module", [make_result("1", 1, 2, "2025-03-01T12:00:00")])
+
+    module = merge_module_stats("module", [first, None, second])
+
+    assert module["attempts"] == 3
+    assert list(module["quizzes"]) == ["a", "b"]
+    assert [entry["score_percent"] for entry in module["leaderboard"]] == [100.0]
+
+
+def test_correctness_matches_item_analysis_difficulty():
+    from services import item_analysis
+
+    results = [make_result(str(i), i % 3 + 1, i % 5, f"2025-03-01T12:00:{i:02d}") for i in range(12)]
+    # A question answered twice in one result counts once, as its last answer
+    results[0]["answers"].append({"question_id": 0, "question": "Q0", "correct": True})
+
+    matrix = item_analysis.build_matrix(results, lambda result, answer: str(answer.get("question_id")))
+    difficulty = dict(zip(matrix["items"], item_analysis._round(item_analysis.analyze_matrix(matrix)["difficulty"])))
+    summary = summarize(build_quiz_stats("quiz", "module", results))
+
+    assert {question["question_id"]: question["correct_rate"] for question in summary["questions"]} == difficulty
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from config.app_config import logger
+from storage.json_backend import write_json_atomic
+
+ENTRY_SUFFIX = ".entry"
+
+
+def make_cache_key(*parts):
+    """
+    Build a cache key from JSON-serialisable parts
+
+    Args:
+        *parts: Values identifying the cached computation
+
+    Returns:
+        str: Hex SHA-256 of the parts
+    """
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def file_sha256(filepath, chunk_size=1024 * 1024):
+    """
+    Hash a file's contents without reading it into memory at once
+
+    Args:
+        filepath (str): Path to the file
+        chunk_size (int): Bytes read per step
+
+    Returns:
+        str: Hex SHA-256 of the file
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Size-bounded cache of JSON values stored as files in a folder
+
+    Each entry is one file named after its key. A hit touches the file's
+    mtime, so when the folder grows past max_bytes the least recently used
+    entries are removed first. Entries older than ttl seconds (if set) count
+    as misses. The folder can be shared between server processes.
+    """
+
+    def __init__(self, folder, max_bytes, ttl=None, name="cache"):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.folder, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """
+        Look up a cached value
+
+        Args:
+            key (str): Cache key (see make_cache_key)
+
+        Returns:
+            object: The cached value, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("stored_at", 0) > self.ttl:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry.get("value")
+
+    def set(self, key, value):
+        """
+        Store a value, evicting old entries if the cache is over its size
+
+        Args:
+            key (str): Cache key (see make_cache_key)
+            value: JSON-serialisable value
+        """
+        if self.max_bytes <= 0:
+            return
+
+        path = self._path(key)
+        try:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            write_json_atomic(path, {"stored_at": time.time(), "value": value}, indent=None)
+            size = os.path.getsize(path) - previous
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write {self.name} entry: {str(e)}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry_size for _, _, entry_size in self._entries())
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                if not filename.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        # Rescan, as other processes share the folder; trim to 90% so that
+        # eviction doesn't run again on the very next write
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                self.evictions += 1
+        self._total_bytes = total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        with self._lock:
+            for _, path, _ in self._entries():
+                self._remove(path)
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Report hit/miss counters and disk usage
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
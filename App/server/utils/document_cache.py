@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import OrderedDict
+
+from config.app_config import JSON_CACHE_MAX_ENTRIES
+
+
+def copy_json_value(value):
+    """
+    Copy a parsed JSON value (dicts, lists and scalars only)
+
+    This is considerably cheaper than copy.deepcopy because it does not need
+    to handle arbitrary objects or reference cycles.
+
+    Args:
+        value: Parsed JSON value
+
+    Returns:
+        object: An independent copy of the value
+    """
+    if isinstance(value, dict):
+        return {key: copy_json_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_json_value(item) for item in value]
+    return value
+
+
+def file_signature(filepath):
+    """
+    Get the (mtime, size, inode) signature used to revalidate cached documents
+
+    Args:
+        filepath (str): Path to the file
+
+    Returns:
+        tuple: Signature of the file, or None if it doesn't exist
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class DocumentCache:
+    """
+    Bounded LRU cache of parsed JSON documents keyed on file path
+
+    Entries are revalidated against the file's stat signature on every lookup,
+    so edits made by other processes (or by hand) are picked up on the next
+    read. Callers always receive a copy, so mutating a loaded document never
+    leaks into the cache.
+    """
+
+    def __init__(self, max_entries=JSON_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, filepath):
+        """
+        Look up a document, returning None if it is missing or stale
+
+        Args:
+            filepath (str): Path to the JSON file
+
+        Returns:
+            object: Copy of the cached document, or None on a miss
+        """
+        key = os.path.abspath(filepath)
+        signature = file_signature(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or signature is None or entry[0] != signature:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            document = entry[1]
+
+        return copy_json_value(document)
+
+    def put(self, filepath, data, signature=None):
+        """
+        Store a document under the file's stat signature
+
+        Args:
+            filepath (str): Path to the JSON file
+            data: Parsed document as it is on disk
+            signature (tuple): Signature taken before the file was read;
+                defaults to the file's current signature
+        """
+        if self.max_entries <= 0:
+            return
+
+        key = os.path.abspath(filepath)
+        if signature is None:
+            signature = file_signature(key)
+        if signature is None:
+            return
+
+        document = copy_json_value(data)
+        with self._lock:
+            self._entries[key] = (signature, document)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, filepath=None):
+        """
+        Drop one document (or all documents) from the cache
+
+        Args:
+            filepath (str): Path to drop, or None to clear the whole cache
+        """
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(filepath), None)
+
+    def stats(self):
+        """
+        Get hit/miss counters for the cache
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared cache used by utils.file_helpers
+document_cache = DocumentCache()
@@ -1,13 +1,18 @@
 import os
 import time
-import json
+import uuid
 from werkzeug.utils import secure_filename
 from config.app_config import UPLOAD_FOLDER, DATABASE_FOLDER, DATABASE_FOLDER, logger
+from storage.factory import get_storage
+from utils.document_cache import document_cache
 
 
 def generate_unique_filename(filename):
     """
-    Generate a unique filename by adding a timestamp
+    Generate a unique filename by adding a timestamp and a random suffix
+
+    The suffix keeps files of the same name uploaded within the same second
+    apart.
 
     Args:
         filename (str): Original filename
@@ -17,7 +22,7 @@ def generate_unique_filename(filename):
     """
     base_name, ext = os.path.splitext(filename)
     timestamp = int(time.time())
-    return f"{base_name}_{timestamp}{ext}"
+    return f"{base_name}_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
 
 
 def save_file(file, folder=UPLOAD_FOLDER):
@@ -49,6 +54,10 @@ def load_json_file(filepath, default_value=None):
     """
     Load data from a JSON file
 
+    The document is read through the configured storage backend. With the
+    JSON backend, parsed documents are served from the shared document cache
+    as long as the file's mtime/size signature is unchanged.
+
     Args:
         filepath (str): Path to the JSON file
         default_value: Value to return if file doesn't exist or is invalid
@@ -56,18 +65,7 @@ def load_json_file(filepath, default_value=None):
     Returns:
         object: Parsed JSON data or default value
     """
-    if not os.path.exists(filepath):
-        return default_value if default_value is not None else []
-
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        logger.error(f"Error reading JSON file: {filepath}")
-        return default_value if default_value is not None else []
-    except UnicodeDecodeError:
-        logger.error(f"Character encoding error in file: {filepath}")
-        return default_value if default_value is not None else []
+    return get_storage().load_document(filepath, default_value)
 
 
 def save_json_file(filepath, data, indent=2):
@@ -82,14 +80,34 @@ def save_json_file(filepath, data, indent=2):
     Returns:
         bool: True if successful, False otherwise
     """
-    try:
-        directory = os.path.dirname(filepath)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+    return get_storage().save_document(filepath, data, indent)
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=indent, ensure_ascii=False)
-        return True
-    except Exception as e:
-        logger.error(f"Error saving JSON file {filepath}: {str(e)}")
-        return False
+
+def update_json_file(filepath, update, default_value=None):
+    """
+    Atomically load, modify and save a JSON file
+
+    The whole cycle runs under the file's cross-process lock, so concurrent
+    requests (or gunicorn workers) can't overwrite each other's changes.
+    Failed cycles are retried from a fresh read.
+
+    Args:
+        filepath (str): Path to the JSON file
+        update (callable): Function that mutates the loaded data in place and
+            returns a result; raising inside it aborts without saving
+        default_value: Data to start from if the file doesn't exist
+
+    Returns:
+        object: Whatever update returned
+    """
+    return get_storage().update_document(filepath, update, default_value)
+
+
+def get_json_cache_stats():
+    """
+    Get statistics for the shared JSON document cache
+
+    Returns:
+        dict: Entry count and hit/miss counters
+    """
+    return document_cache.stats()
@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialised
+    fcntl = None
+
+from config.app_config import FILE_LOCK_TIMEOUT
+
+# Per-path thread locks, so threads of one process queue up before the
+# (process-wide) fcntl lock and a thread may re-enter a lock it already holds
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def lock_path_for(filepath):
+    """
+    Get the path of the lock file guarding a data file
+
+    Args:
+        filepath (str): Path to the data file
+
+    Returns:
+        str: Path to a hidden ".<name>.lock" file next to the data file
+    """
+    directory, filename = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, f".{filename}.lock")
+
+
+class _PathLock:
+    """Thread lock for one lock file, plus the file handle while it is held"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.handle = None
+
+
+def _path_lock(lock_path):
+    with _thread_locks_guard:
+        path_lock = _thread_locks.get(lock_path)
+        if path_lock is None:
+            path_lock = _thread_locks[lock_path] = _PathLock()
+        return path_lock
+
+
+@contextmanager
+def file_lock(filepath, timeout=FILE_LOCK_TIMEOUT):
+    """
+    Hold an exclusive cross-process lock on a data file
+
+    The lock is re-entrant within a thread. Other threads and processes
+    (e.g. gunicorn workers) block until it is released.
+
+    Args:
+        filepath (str): Path to the data file to lock
+        timeout (float): Seconds to wait before giving up
+
+    Raises:
+        TimeoutError: If the lock could not be acquired in time
+    """
+    lock_path = lock_path_for(filepath)
+    path_lock = _path_lock(lock_path)
+
+    if not path_lock.lock.acquire(timeout=timeout):
+        raise TimeoutError(f"Timed out waiting for lock on {filepath}")
+
+    try:
+        # Only the outermost acquisition in this thread takes the file lock
+        if path_lock.handle is not None:
+            yield
+            return
+
+        path_lock.handle = _acquire_file_lock(lock_path, filepath, timeout)
+        try:
+            yield
+        finally:
+            handle, path_lock.handle = path_lock.handle, None
+            _release_file_lock(handle)
+    finally:
+        path_lock.lock.release()
+
+
+def _acquire_file_lock(lock_path, filepath, timeout):
+    if fcntl is None:
+        return True
+
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    handle = open(lock_path, "a+")
+    deadline = time.monotonic() + timeout
+    delay = 0.005
+
+    while True:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return handle
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                handle.close()
+                raise TimeoutError(f"Timed out waiting for lock on {filepath}")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+def _release_file_lock(handle):
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
@@ -0,0 +1,111 @@
+import sys
+import time
+import importlib
+import importlib.util
+import threading
+from contextlib import contextmanager
+
+from config.app_config import logger
+
+# Seconds spent importing, by module name and phase ("startup" or "lazy")
+_import_times = {"startup": {}, "lazy": {}}
+_lock = threading.Lock()
+
+# Modules worth reporting whether they have been loaded
+HEAVY_MODULES = ("torch", "numba", "whisper_timestamped", "fitz", "numpy", "bs4", "youtube_transcript_api")
+
+
+def _record(phase, name, seconds):
+    with _lock:
+        _import_times[phase][name] = round(seconds, 4)
+
+
+@contextmanager
+def import_timer(name):
+    """
+    Time the imports in a with block and add them to the import report
+
+    Args:
+        name (str): Label for the report (usually the module imported)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record("startup", name, time.perf_counter() - start)
+
+
+class LazyModule:
+    """
+    Stands in for a module that is only imported when first used
+
+    Attribute access imports the module (once, thread-safely) and forwards
+    to it, so "fitz = lazy_import('fitz')" can replace "import fitz" at the
+    top of a file without changing the code that uses it. A missing module
+    raises ImportError at first use instead of at server startup.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    elapsed = time.perf_counter() - start
+                    _record("lazy", self._name, elapsed)
+                    logger.info(f"Imported {self._name} on first use in {elapsed:.2f}s")
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Get a module that is imported when first used (see LazyModule)
+
+    Args:
+        name (str): Module name, e.g. "whisper_timestamped"
+
+    Returns:
+        LazyModule: Proxy for the module
+    """
+    return LazyModule(name)
+
+
+def is_available(name):
+    """Check whether a module could be imported, without importing it"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def import_report():
+    """
+    Report import times and which heavy modules are loaded
+
+    Returns:
+        dict: Seconds per import at startup and on first use, and for each
+            heavy module whether it is loaded in this process
+    """
+    with _lock:
+        report = {phase: dict(times) for phase, times in _import_times.items()}
+    report["loaded"] = {name: name in sys.modules for name in HEAVY_MODULES}
+    return report
@@ -0,0 +1,21 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def spawn_process_pool(max_workers):
+    """
+    Create a process pool whose workers are spawned rather than forked
+
+    The server process runs other threads (request threads and the job
+    queue's workers), and a forked child only inherits the thread that
+    forked it, along with any locks the others held at that moment. A
+    spawned worker starts a fresh interpreter instead, so it can't deadlock
+    on such a lock; it imports its modules on startup.
+
+    Args:
+        max_workers (int): Number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: New process pool
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,85 @@
+import threading
+
+
+class _Call:
+    """One in-flight computation and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it runs wait and receive the same result (or exception).
+    Once it has finished, the next call with that key runs it again, so this
+    only deduplicates work that overlaps in time.
+    """
+
+    def __init__(self, name="single flight"):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.duplicates = 0
+
+    def do(self, key, fn):
+        """
+        Run fn, or wait for the run already in progress for key
+
+        Args:
+            key (str): Identifies calls that would compute the same thing
+            fn (callable): Computes the result
+
+        Returns:
+            object: The result of fn
+
+        Raises:
+            Exception: Whatever fn raised, in every caller sharing the run
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.duplicates += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """
+        Report how many calls ran and how many were collapsed into them
+
+        Returns:
+            dict: Counters and calls currently in flight
+        """
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "duplicates": self.duplicates,
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+            }